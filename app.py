@@ -502,16 +502,36 @@ def simplify_response(response_text):
     # For non-JSON responses, return the full response
     return response_text
 
-def call_chatbot_api(query, context=None):
+@st.cache_resource
+def get_shared_chatbot():
+    """Create the EDGAR and LLM clients once per process.
+    
+    Every browser session reuses them, so connection pools, the ticker index
+    and in-memory filing indexes stay warm between messages and reruns.
+    """
+    return SECChatbot()
+
+def get_chatbot():
+    """Return this browser session's chatbot, with its own conversation history."""
+    if 'chatbot' not in st.session_state:
+        st.session_state.chatbot = get_shared_chatbot().for_session()
+    return st.session_state.chatbot
+
+def call_chatbot_api(query, context=None, stream=False, progress=None):
     """Call the chatbot API endpoint."""
     try:
         # For local testing, use the chatbot service directly
-        chatbot = SECChatbot()
-        return chatbot.process_query(query, context or {})
+        return get_chatbot().process_query(query, context or {}, stream=stream, progress=progress)
     
     except Exception as e:
         return {"error": f"Unexpected error: {str(e)}"}
 
+def format_timings(timings):
+    """Format per-stage timings, e.g. "Resolving company 0.12s · Calling model 3.40s"."""
+    stages = " · ".join(f"{t['label']} {t['seconds']:.2f}s" for t in timings)
+    total = sum(t['seconds'] for t in timings)
+    return f"⏱️ {stages} (total {total:.2f}s)"
+
 def display_message(message, is_user=False):
     """Display a chat message with appropriate styling."""
     if is_user:
@@ -652,8 +672,7 @@ def main():
         # Status
         st.markdown("### 🔧 Status")
         try:
-            chatbot = SECChatbot()
-            if chatbot.llm_analyzer:
+            if get_shared_chatbot().llm_analyzer:
                 st.markdown('<div class="status-indicator status-success">✅ AI Active</div>', unsafe_allow_html=True)
             else:
                 st.markdown('<div class="status-indicator status-warning">⚠️ Demo Mode</div>', unsafe_allow_html=True)
@@ -667,6 +686,8 @@ def main():
     # Display chat history
     for message in st.session_state.messages:
         display_message(message['content'], message['is_user'])
+        if message.get('timings'):
+            st.caption(format_timings(message['timings']))
     
     # Chat input
     user_input = st.text_input(
@@ -688,6 +709,7 @@ def main():
         test_button = st.button("Test", disabled=st.session_state.processing)
     with col_btn3:
         if st.button("Clear Chat"):
+            get_chatbot().clear_history()
             st.session_state.messages = []
             st.session_state.context = {}
             st.session_state.processing = False
@@ -723,18 +745,36 @@ def main():
                 'timestamp': datetime.now()
             })
             
-            # Show loading spinner with nice message and delay
-            with st.spinner("🤖 Analyzing SEC filing..."):
+            # Show each stage live as the chatbot reaches it
+            status = st.status("🤖 Working on your question...", expanded=True)
+            
+            def show_progress(event):
+                if event['stage'] != 'done':
+                    status.update(label=f"🤖 {event['label']}...")
+                    status.write(f"{event['label']} (at {event['elapsed']:.2f}s)")
+            
+            try:
+                # Call chatbot API
+                response = call_chatbot_api(user_input, st.session_state.context, stream=True, progress=show_progress)
+                
+            except Exception as e:
+                response = {"error": f"Failed to process query: {str(e)}"}
+            
+            # Render model output as it is generated instead of waiting for the full reply
+            if response.get('stream'):
                 try:
-                    # Add a small delay to make it feel more realistic
-                    time.sleep(2)  # 2 second delay for better UX
-                    
-                    # Call chatbot API
-                    response = call_chatbot_api(user_input, st.session_state.context)
-                    
+                    st.write_stream(response['stream'])
                 except Exception as e:
                     response = {"error": f"Failed to process query: {str(e)}"}
             
+            timings = response.get('timings') or []
+            if timings:
+                status.write(format_timings(timings))
+            if response.get('error'):
+                status.update(label="❌ Failed", state="error", expanded=False)
+            else:
+                status.update(label="✅ Done", state="complete", expanded=False)
+            
             # Simplify bot response
             if response.get('error'):
                 bot_message = f"❌ Error: {response['error']}"
@@ -757,7 +797,8 @@ def main():
             st.session_state.messages.append({
                 'content': bot_message,
                 'is_user': False,
-                'timestamp': datetime.now()
+                'timestamp': datetime.now(),
+                'timings': timings
             })
             
             # Add a prompt for the next question
@@ -0,0 +1,164 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from requests.adapters import HTTPAdapter
+import config
+from edgar_client import EdgarClient
+from tracing import propagate
+from xbrl_facts import FactsTable
+
+
+class AsyncEdgarClient:
+    """Asyncio interface to EdgarClient for fetching EDGAR data concurrently.
+
+    Every method mirrors the EdgarClient method of the same name as a coroutine.
+    Blocking calls run on a bounded worker pool whose size matches the HTTP
+    connection pool, so concurrent coroutines reuse keep-alive connections and
+    never open more than max_connections sockets to SEC at once. The disk caches
+    and ticker index behind EdgarClient are shared and thread-safe.
+    """
+
+    def __init__(self, edgar_client: Optional[EdgarClient] = None,
+                 max_connections: int = config.EDGAR_MAX_CONNECTIONS):
+        self.client = edgar_client or EdgarClient()
+        self.max_connections = max_connections
+
+        adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+        self.client.session.mount('https://', adapter)
+        self.client.session.mount('http://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix='edgar')
+
+    def run_sync(self, coroutine):
+        """Run a coroutine to completion from synchronous code and return its result.
+
+        asyncio.run cannot be called from a thread whose event loop is already
+        running (an async Lambda handler, a notebook), so in that case the
+        coroutine gets its own loop on a short-lived thread instead.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coroutine)
+        # Not the worker pool: its threads are what the coroutine awaits
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='edgar-loop') as executor:
+            return executor.submit(propagate(asyncio.run), coroutine).result()
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # Worker threads run in the calling task's trace context so their spans nest under it
+        return await loop.run_in_executor(self._executor, propagate(functools.partial(func, *args, **kwargs)))
+
+    async def search_company(self, company_name: str) -> List[Dict]:
+        """Search for a company by name and return basic information."""
+        return await self._run(self.client.search_company, company_name)
+
+    async def get_company_overview(self, cik: str) -> Optional[Dict]:
+        """Get comprehensive company overview including recent filings and key metrics."""
+        return await self._run(self.client.get_company_overview, cik)
+
+    async def get_company_facts(self, cik: str) -> Optional[Dict]:
+        """Get company facts data for a given CIK."""
+        return await self._run(self.client.get_company_facts, cik)
+
+    async def get_facts_table(self, cik: str) -> Optional[FactsTable]:
+        """Get company facts as a columnar table for numeric queries."""
+        return await self._run(self.client.get_facts_table, cik)
+
+    async def get_recent_filings(self, cik: str, form_type: str = "10-K") -> List[Dict]:
+        """Get recent filings for a company."""
+        return await self._run(self.client.get_recent_filings, cik, form_type)
+
+    async def get_filing_content(self, cik: str, accession_number: str, primary_document: str) -> Optional[str]:
+        """Retrieve the content of a specific filing."""
+        return await self._run(self.client.get_filing_content, cik, accession_number, primary_document)
+
+    async def get_filing_sections(self, cik: str, accession_number: str, primary_document: str,
+                                  keys: Optional[List[str]] = None) -> Dict[str, str]:
+        """Retrieve Item sections of a filing by key."""
+        return await self._run(self.client.get_filing_sections, cik, accession_number, primary_document, keys)
+
+    async def search_and_analyze(self, company_name: str, form_type: str = "10-K",
+                                 include_overview: bool = True, include_facts: bool = True,
+                                 include_facts_table: bool = False) -> Dict:
+        """Complete workflow with the overview, XBRL facts and filing document fetched concurrently.
+
+        include_facts adds the raw companyfacts JSON under "facts";
+        include_facts_table adds it as a FactsTable under "facts_table".
+        """
+        results = {
+            'company_name': company_name,
+            'companies_found': [],
+            'filings': [],
+            'content': None,
+            'error': None
+        }
+
+        try:
+            # Search for company
+            companies = await self.search_company(company_name)
+            results['companies_found'] = companies
+
+            if not companies:
+                results['error'] = "No companies found"
+                return results
+
+            # Use first company found
+            company = companies[0]
+            cik = company['cik']
+
+            # Get recent filings
+            filings = await self.get_recent_filings(cik, form_type)
+            results['filings'] = filings
+
+            if not filings:
+                results['error'] = f"No {form_type} filings found"
+                return results
+
+            # Fetch the filing document alongside the overview and facts
+            latest_filing = filings[0]
+            tasks = [self._run(
+                self.client._load_filing,
+                cik,
+                latest_filing['accessionNumber'],
+                latest_filing['primaryDocument']
+            )]
+            if include_overview:
+                tasks.append(self.get_company_overview(cik))
+            if include_facts:
+                tasks.append(self.get_company_facts(cik))
+            if include_facts_table:
+                tasks.append(self.get_facts_table(cik))
+
+            fetched = await asyncio.gather(*tasks)
+            filing = fetched.pop(0)
+            if include_overview:
+                results['overview'] = fetched.pop(0)
+            if include_facts:
+                results['facts'] = fetched.pop(0)
+            if include_facts_table:
+                results['facts_table'] = fetched.pop(0)
+
+            results['content'] = filing['content']
+            results['section_index'] = filing['sections']
+            results['selected_company'] = company
+            results['selected_filing'] = latest_filing
+
+        except Exception as e:
+            results['error'] = str(e)
+
+        return results
+
+    async def search_and_analyze_many(self, company_names: List[str], form_type: str = "10-K",
+                                      include_overview: bool = True, include_facts: bool = True,
+                                      include_facts_table: bool = False) -> List[Dict]:
+        """Run search_and_analyze for several companies at once, in input order."""
+        return await asyncio.gather(*[
+            self.search_and_analyze(name, form_type, include_overview, include_facts, include_facts_table)
+            for name in company_names
+        ])
+
+    def close(self):
+        """Stop the worker pool and close pooled connections."""
+        self._executor.shutdown(wait=False)
+        self.client.session.close()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Benchmark filing HTML extraction across document sizes and backends.
+
+Feeds synthetic 10-K documents (and any real filings given) through each
+extraction backend and records wall time, Python allocations (tracemalloc)
+and peak RSS, then writes the results as JSON for trend tracking.
+
+    python bench_extraction.py --sizes 0.1,1,10,50 --json extraction.json
+    python bench_extraction.py --files aapl-20230930.htm --backends lxml-stream,bs4
+
+Backends:
+    lxml-stream  the production path: iter_text_blocks over 64 KB chunks
+    lxml-tree    the whole document parsed into an lxml tree, for comparison
+    bs4          the BeautifulSoup extraction used before the streaming
+                 extractor (only when beautifulsoup4 is installed)
+
+Each case runs in a fresh process so peak RSS belongs to that case alone;
+tracemalloc only sees Python allocations, not libxml2's, so both are kept.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+import config
+from benchmark import make_filing_html, peak_rss_mb
+from filing_extractor import SKIP_TAGS, iter_text_blocks
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:  # The bs4 backend is skipped
+    BeautifulSoup = None
+
+
+def extract_stream(path: str) -> str:
+    """Stream the file through the incremental extractor, as get_filing_content does."""
+    with open(path, 'rb') as f:
+        chunks = iter(lambda: f.read(config.EDGAR_STREAM_CHUNK_SIZE), b'')
+        return '\n'.join(iter_text_blocks(chunks))
+
+
+def extract_tree(path: str) -> str:
+    """Parse the whole file into an lxml tree and join the text of its lines."""
+    from lxml import etree
+
+    with open(path, 'rb') as f:
+        root = etree.fromstring(f.read(), etree.HTMLParser(huge_tree=True))
+    if root is None:
+        return ''
+    for element in root.iter(*[tag for tag in SKIP_TAGS if ':' not in tag]):
+        element.text = None
+    lines = (line.strip() for line in ''.join(root.itertext()).split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+
+def extract_bs4(path: str) -> str:
+    """Extract text with BeautifulSoup's html.parser, as filings were parsed before lxml."""
+    with open(path, 'rb') as f:
+        soup = BeautifulSoup(f.read(), 'html.parser')
+    for script in soup(["script", "style"]):
+        script.decompose()
+    lines = (line.strip() for line in soup.get_text().split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+
+BACKENDS: Dict[str, Callable[[str], str]] = {
+    'lxml-stream': extract_stream,
+    'lxml-tree': extract_tree
+}
+if BeautifulSoup is not None:
+    BACKENDS['bs4'] = extract_bs4
+
+
+def run_case(path: str, backend: str, repeat: int = 3) -> Dict:
+    """Time one backend on one file, then rerun it under tracemalloc.
+
+    Peak RSS is read after the timed runs, before tracemalloc's own
+    bookkeeping is added, and is only meaningful in a fresh process.
+    """
+    extract = BACKENDS[backend]
+    rss_before = peak_rss_mb()
+    times = []
+    text_chars = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        text_chars = len(extract(path))
+        times.append(time.perf_counter() - started)
+    rss_after = peak_rss_mb()
+
+    tracemalloc.start()
+    try:
+        extract(path)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    input_mb = os.path.getsize(path) / (1024 * 1024)
+    best = min(times)
+    return {
+        'backend': backend,
+        'file': os.path.basename(path),
+        'input_mb': round(input_mb, 3),
+        'text_chars': text_chars,
+        'repeat': repeat,
+        'best_s': round(best, 4),
+        'median_s': round(sorted(times)[len(times) // 2], 4),
+        'mb_per_s': round(input_mb / best, 2) if best else None,
+        'tracemalloc_peak_mb': round(peak / (1024 * 1024), 2),
+        'tracemalloc_retained_mb': round(retained / (1024 * 1024), 2),
+        'peak_rss_mb': round(rss_after, 1) if rss_after is not None else None,
+        'rss_growth_mb': round(rss_after - rss_before, 1) if rss_after is not None else None
+    }
+
+
+def _run_isolated(args: tuple) -> Dict:
+    return run_case(*args)
+
+
+def run_benchmarks(paths: List[str], backends: List[str], repeat: int = 3, isolate: bool = True) -> List[Dict]:
+    """Run every backend on every file, each case in a fresh process when isolate is set."""
+    cases = [(path, backend, repeat) for path in paths for backend in backends]
+    if not isolate:
+        return [run_case(*case) for case in cases]
+
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for case in cases:
+        # One process per case, so each peak RSS starts from the same baseline
+        with context.Pool(1) as pool:
+            results.append(pool.apply(_run_isolated, (case,)))
+        print(f"  {case[1]} on {os.path.basename(case[0])}: {results[-1]['best_s']:.3f} s", file=sys.stderr)
+    return results
+
+
+def write_synthetic_filings(directory: str, sizes_mb: List[float]) -> List[str]:
+    """Write a generated 10-K of each size to directory and return their paths."""
+    paths = []
+    for i, size in enumerate(sizes_mb):
+        path = os.path.join(directory, f"synthetic-{size:g}mb.htm")
+        with open(path, 'wb') as f:
+            f.write(make_filing_html(int(size * 1024 * 1024), "Example Corp", seed=i))
+        paths.append(path)
+    return paths
+
+
+def print_table(results: List[Dict]):
+    columns = ('input_mb', 'best_s', 'mb_per_s', 'tracemalloc_peak_mb', 'rss_growth_mb', 'text_chars')
+    print(f"{'backend':<14}{'file':<28}" + "".join(f"{column:>22}" for column in columns))
+    for result in results:
+        print(f"{result['backend']:<14}{result['file'][:27]:<28}"
+              + "".join(f"{str(result[column]):>22}" for column in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark filing HTML extraction across sizes and backends.")
+    parser.add_argument("--sizes", default="0.1,1,10,50",
+                        help="comma-separated sizes in MB of generated filings (default: 0.1,1,10,50)")
+    parser.add_argument("--files", nargs="*", default=[], help="real filing documents to include")
+    parser.add_argument("--backends", default=",".join(BACKENDS),
+                        help=f"comma-separated backends to compare (default: {','.join(BACKENDS)})")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case; the best is reported (default: 3)")
+    parser.add_argument("--no-isolate", action="store_true",
+                        help="run every case in this process (faster, but peak RSS only ever grows)")
+    parser.add_argument("--json", dest="json_path", help="write the results to this JSON file, or - for stdout")
+    args = parser.parse_args()
+
+    backends = [backend.strip() for backend in args.backends.split(",") if backend.strip()]
+    unknown = [backend for backend in backends if backend not in BACKENDS]
+    if unknown:
+        parser.error(f"unknown or unavailable backends: {', '.join(unknown)} (choose from {', '.join(BACKENDS)})")
+
+    sizes = [float(size) for size in args.sizes.split(",") if size.strip()]
+    with tempfile.TemporaryDirectory(prefix='sec-chatbot-extraction-') as directory:
+        paths = write_synthetic_filings(directory, sizes) + args.files
+        results = run_benchmarks(paths, backends, args.repeat, isolate=not args.no_isolate)
+
+    report = {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'chunk_size': config.EDGAR_STREAM_CHUNK_SIZE,
+            'isolated': not args.no_isolate,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        },
+        'results': results
+    }
+    if args.json_path == '-':
+        json.dump(report, sys.stdout, indent=2)
+        return
+    print_table(results)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
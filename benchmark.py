@@ -0,0 +1,620 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of EDGAR lookups, filing parsing, LLM analysis and full chat flows.
+
+Serves EDGAR and OpenRouter responses from a local fixture server, points
+the clients at it and reports latency percentiles, throughput and peak RSS
+for search_company, get_filing_content, analyze_document and process_query.
+Nothing leaves the machine, so it runs on a laptop before every deploy.
+
+    python benchmark.py --iterations 20 --json results.json
+    python benchmark.py --fixtures recorded/ --llm-latency 0.5
+
+Without --fixtures, synthetic responses are generated: a ticker file, a
+submissions and companyfacts document per company, and 10-K documents of
+--filing-sizes megabytes. Recorded responses can be replayed instead from a
+directory laid out like the URLs they were fetched from:
+
+    recorded/company_tickers.json
+    recorded/submissions/CIK0000320193.json
+    recorded/companyfacts/CIK0000320193.json
+    recorded/archives/320193/000032019323000106/aapl-20230930.htm
+    recorded/completions/*.txt     (canned model replies, used in turn)
+
+Caches live in a temporary directory, so each run starts cold; the first
+call of every operation is reported separately as first_ms.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+import numpy as np
+import config
+
+try:
+    import resource
+except ImportError:  # Peak RSS is not reported on Windows
+    resource = None
+
+# Companies generated when no recorded fixtures are given
+COMPANIES = [
+    ("320193", "AAPL", "Apple Inc."),
+    ("789019", "MSFT", "MICROSOFT CORP"),
+    ("1318605", "TSLA", "Tesla, Inc."),
+    ("1018724", "AMZN", "AMAZON COM INC"),
+    ("1045810", "NVDA", "NVIDIA CORP")
+]
+
+# Share of a generated 10-K taken by each Item, in filing order
+FILING_ITEMS = [
+    ("Item 1.", "Business", 0.15),
+    ("Item 1A.", "Risk Factors", 0.20),
+    ("Item 1B.", "Unresolved Staff Comments", 0.01),
+    ("Item 2.", "Properties", 0.01),
+    ("Item 3.", "Legal Proceedings", 0.02),
+    ("Item 5.", "Market for Registrant's Common Equity", 0.02),
+    ("Item 7.", "Management's Discussion and Analysis of Financial Condition and Results of Operations", 0.24),
+    ("Item 7A.", "Quantitative and Qualitative Disclosures About Market Risk", 0.02),
+    ("Item 8.", "Financial Statements and Supplementary Data", 0.30),
+    ("Item 9A.", "Controls and Procedures", 0.03)
+]
+
+WORDS = (
+    "the company revenue net sales operating income customers products services markets "
+    "competition supply chain manufacturing regulatory risk results fiscal year increase "
+    "decrease compared prior period primarily due higher lower demand pricing costs margin "
+    "cash flows liquidity capital expenditures investments foreign currency exchange rates "
+    "interest tax provision segment geographic americas europe china japan research development"
+).split()
+
+ANALYSIS_COMPLETION = json.dumps({
+    "executive_summary": "The company grew revenue on strong product demand while margins held steady.",
+    "financial_highlights": {"revenue": "$394.3 billion", "net_income": "$99.8 billion", "key_metrics": ["Gross margin 43%"]},
+    "business_risks": ["Supply chain concentration", "Foreign exchange exposure", "Intense competition"],
+    "growth_opportunities": ["Services expansion", "Emerging markets"],
+    "key_insights": ["Services mix is rising"],
+    "investment_recommendation": "Stable outlook with moderate growth.",
+    "confidence_score": 80
+})
+
+COMPARISON_COMPLETION = json.dumps({
+    "comparison_summary": "The larger company leads on scale and margins.",
+    "financial_comparison": "Revenue and net margin favour the first company.",
+    "risk_comparison": "All face supply chain and regulatory risks.",
+    "growth_comparison": "The smaller companies grow faster.",
+    "recommendations": ["Compare margins over several years"],
+    "winner": "The first company"
+})
+
+NOTES_COMPLETION = "- Revenue grew on product demand\n- Supply chain concentration is the main risk"
+
+ANSWER_COMPLETION = "The main risks are supply chain concentration, competition and currency exposure."
+
+
+def _paragraph(rng: random.Random, words: int = 80) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def make_filing_html(target_bytes: int, company: str = "Example Corp", seed: int = 0) -> bytes:
+    """Generate an inline XBRL 10-K of about target_bytes, shaped like EDGAR's documents.
+
+    Items carry styled div/span paragraphs as SEC filing tools emit them, with
+    financial tables of ix:nonFraction facts in Item 8 and a hidden ix:header.
+    """
+    rng = random.Random(seed)
+    parts = [
+        '<?xml version="1.0" encoding="utf-8"?>\n<html xmlns="http://www.w3.org/1999/xhtml" '
+        'xmlns:ix="http://www.xbrl.org/2013/inlineXBRL"><head><title>10-K</title>'
+        '<style>div { font-family: Times New Roman; } .tbl td { padding: 2px; }</style></head><body>',
+        '<div style="display:none"><ix:header><ix:hidden><ix:nonNumeric name="dei:DocumentType">10-K'
+        '</ix:nonNumeric></ix:hidden></ix:header></div>',
+        f'<div style="text-align:center"><span style="font-weight:700">{company}</span></div>'
+        '<div style="text-align:center"><span>ANNUAL REPORT PURSUANT TO SECTION 13 OR 15(d) '
+        'OF THE SECURITIES EXCHANGE ACT OF 1934</span></div>',
+        '<div><span style="font-weight:700">TABLE OF CONTENTS</span></div><table>'
+    ]
+    for number, title, _ in FILING_ITEMS:
+        parts.append(f'<tr><td><span>{number}</span></td><td><span>{title}</span></td><td><span>{rng.randint(3, 90)}</span></td></tr>')
+    parts.append('</table>')
+    size = sum(len(part) for part in parts)
+
+    for number, title, share in FILING_ITEMS:
+        parts.append(f'<div style="margin-top:12pt"><span style="font-weight:700">{number} {title}</span></div>')
+        budget = size + int(target_bytes * share)
+        while size < budget:
+            if number == "Item 8." and rng.random() < 0.6:
+                rows = []
+                for _ in range(12):
+                    value = f"{rng.randint(1, 999):,},{rng.randint(100, 999)}"
+                    rows.append(
+                        f'<tr><td style="width:60%"><span>{_paragraph(rng, 4)}</span></td>'
+                        f'<td><span>$</span></td><td style="text-align:right"><span>'
+                        f'<ix:nonFraction name="us-gaap:Revenues" contextRef="FY" unitRef="usd" decimals="-6" scale="6">'
+                        f'{value}</ix:nonFraction></span></td></tr>'
+                    )
+                block = '<table class="tbl" style="border-collapse:collapse">' + ''.join(rows) + '</table>'
+            else:
+                block = (f'<div style="margin-top:6pt;text-align:justify"><span style="font-family:Times New Roman;'
+                         f'font-size:10pt">{_paragraph(rng)}</span></div>')
+            parts.append(block)
+            size += len(block)
+
+    parts.append('</body></html>')
+    return ''.join(parts).encode('utf-8')
+
+
+def _submissions(title: str, ticker: str, accession: str, document: str) -> Dict:
+    return {
+        "name": title,
+        "tickers": [ticker],
+        "exchanges": ["Nasdaq"],
+        "sicDescription": "Electronic Computers",
+        "filings": {"recent": {
+            "form": ["10-Q", "8-K", "10-K"],
+            "filingDate": ["2024-02-02", "2023-11-15", "2023-11-03"],
+            "reportDate": ["2023-12-30", "2023-11-15", "2023-09-30"],
+            "accessionNumber": [accession.replace("-23-", "-24-"), accession.replace("106", "107"), accession],
+            "primaryDocument": ["q1.htm", "8k.htm", document]
+        }}
+    }
+
+
+def _companyfacts(title: str, seed: int, extra_concepts: int) -> Dict:
+    rng = random.Random(seed)
+
+    def annual(base, duration=True):
+        facts = []
+        for year in range(2019, 2024):
+            fact = {"end": f"{year}-09-30", "val": int(base * (1 + 0.08 * (year - 2019))), "fy": year,
+                    "fp": "FY", "form": "10-K", "accn": f"acc-{year}", "filed": f"{year}-11-01"}
+            if duration:
+                fact["start"] = f"{year - 1}-10-01"
+            facts.append(fact)
+        return facts
+
+    revenue = rng.randint(50, 400) * 10 ** 9
+    facts = {
+        "Revenues": {"units": {"USD": annual(revenue)}},
+        "NetIncomeLoss": {"units": {"USD": annual(revenue // 4)}},
+        "OperatingIncomeLoss": {"units": {"USD": annual(revenue // 3)}},
+        "Assets": {"units": {"USD": annual(revenue * 1.2, duration=False)}},
+        "Liabilities": {"units": {"USD": annual(revenue * 0.8, duration=False)}}
+    }
+    # Real companyfacts documents run to several megabytes of other concepts
+    for i in range(extra_concepts):
+        facts[f"OtherConcept{i}"] = {"units": {"USD": annual(rng.randint(1, 10 ** 9))}}
+    return {"entityName": title, "facts": {"us-gaap": facts}}
+
+
+def generate_fixtures(filing_sizes_mb: List[float], facts_concepts: int = 300) -> Dict:
+    """Generate EDGAR responses for COMPANIES, keyed by fixture path, plus canned completions."""
+    files = {"company_tickers.json": json.dumps({
+        str(i): {"cik_str": int(cik), "ticker": ticker, "title": title}
+        for i, (cik, ticker, title) in enumerate(COMPANIES)
+    }).encode()}
+    for i, (cik, ticker, title) in enumerate(COMPANIES):
+        accession = f"{cik.zfill(10)}-23-000106"
+        document = f"{ticker.lower()}-10k.htm"
+        padded = cik.zfill(10)
+        files[f"submissions/CIK{padded}.json"] = json.dumps(_submissions(title, ticker, accession, document)).encode()
+        files[f"companyfacts/CIK{padded}.json"] = json.dumps(_companyfacts(title, i, facts_concepts)).encode()
+        size = int(filing_sizes_mb[i % len(filing_sizes_mb)] * 1024 * 1024)
+        files[f"archives/{cik}/{accession.replace('-', '')}/{document}"] = make_filing_html(size, title, seed=i)
+    return {"files": files, "completions": None}
+
+
+def load_fixtures(directory: str) -> Dict:
+    """Load recorded responses from a directory laid out as described in the module docstring."""
+    files = {}
+    completions = []
+    for root, _, names in os.walk(directory):
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, directory).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                body = f.read()
+            if relative.startswith('completions/'):
+                completions.append(body.decode('utf-8'))
+            else:
+                files[relative] = body
+    return {"files": files, "completions": completions or None}
+
+
+def _fixture_key(path: str) -> Optional[str]:
+    """Map a request path on the fixture server to a fixture file name."""
+    for prefix, folder in (("/files/", ""), ("/submissions/", "submissions/"),
+                           ("/api/xbrl/companyfacts/", "companyfacts/"), ("/Archives/edgar/data/", "archives/")):
+        if path.startswith(prefix):
+            rest = path[len(prefix):]
+            if folder == "archives/":
+                # EDGAR accepts the CIK with or without leading zeros
+                cik, _, rest = rest.partition('/')
+                rest = f"{cik.lstrip('0')}/{rest}"
+            return folder + rest
+    return None
+
+
+class FixtureServer:
+    """Local HTTP server that replays EDGAR documents and answers OpenRouter chat completions.
+
+    Completions are the canned replies in turn, or, for generated fixtures,
+    a reply shaped like the request (analysis JSON, comparison JSON, map
+    notes or a plain answer). llm_latency seconds are slept per completion
+    to stand in for model time.
+    """
+
+    def __init__(self, files: Dict[str, bytes], completions: Optional[List[str]] = None,
+                 llm_latency: float = 0.0):
+        self.files = {name: body for name, body in files.items()}
+        for name in list(self.files):
+            if name.startswith('archives/'):
+                cik, _, rest = name[len('archives/'):].partition('/')
+                self.files[f"archives/{cik.lstrip('0')}/{rest}"] = self.files.pop(name)
+        self.completions = completions
+        self.llm_latency = llm_latency
+        self.requests = 0
+        self._count_lock = threading.Lock()
+        self._completion_index = 0
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FixtureServer':
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def completion(self, prompt: str) -> str:
+        with self._count_lock:
+            self._completion_index += 1
+            index = self._completion_index
+        if self.completions:
+            return self.completions[index % len(self.completions)]
+        if "Compare the following companies" in prompt:
+            return COMPARISON_COMPLETION
+        if "Extract the key points" in prompt:
+            return NOTES_COMPLETION
+        if "Question:" in prompt or "question" in prompt.lower():
+            return ANSWER_COMPLETION
+        return ANALYSIS_COMPLETION
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; without this, delayed ACKs add ~40 ms per reply
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str = "application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                with server._count_lock:
+                    server.requests += 1
+                key = _fixture_key(self.path.split('?', 1)[0])
+                body = server.files.get(key) if key else None
+                if body is None:
+                    self._send(404, b'{"error": "not found"}')
+                    return
+                content_type = "text/html" if key.startswith("archives/") else "application/json"
+                self._send(200, body, content_type)
+
+            def do_POST(self):
+                with server._count_lock:
+                    server.requests += 1
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.endswith("/chat/completions"):
+                    self._send(404, b'{"error": "not found"}')
+                    return
+
+                prompt = "\n".join(message.get("content", "") for message in payload.get("messages", []))
+                content = server.completion(prompt)
+                if server.llm_latency:
+                    time.sleep(server.llm_latency)
+                usage = {"total_tokens": len(prompt) // 4 + len(content) // 4}
+
+                if payload.get("stream"):
+                    events = [{"choices": [{"delta": {"content": content[i:i + 24]}}]} for i in range(0, len(content), 24)]
+                    events.append({"choices": [], "usage": usage})
+                    body = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+                    self._send(200, body.encode(), "text/event-stream")
+                    return
+                body = {"choices": [{"message": {"role": "assistant", "content": content}}], "usage": usage}
+                self._send(200, json.dumps(body).encode())
+
+        return Handler
+
+
+# Module-level singletons built on first use from config, as (module, attribute)
+SHARED_STATE = [
+    ('filing_cache', '_shared_cache'),
+    ('filing_index', '_shared_store'),
+    ('http_cache', '_shared_cache'),
+    ('llm_analyzer', '_shared_session'),
+    ('llm_cache', '_shared_cache'),
+    ('rate_limiter', '_shared_limiter'),
+    ('ticker_index', '_shared_index'),
+    ('xbrl_facts', '_shared_store')
+]
+
+
+def reset_shared_state():
+    """Drop the process-wide caches, ticker index, rate limiter and LLM session.
+
+    They are rebuilt from the current config on next use, so a run in a
+    process that already used them starts cold and against the right server.
+    """
+    for module_name, attribute in SHARED_STATE:
+        module = importlib.import_module(module_name)
+        with module._shared_lock:
+            setattr(module, attribute, None)
+
+
+# Settings configure() overrides, restored when a run finishes
+CONFIGURED = ("EDGAR_TICKERS_URL", "EDGAR_SUBMISSIONS_URL", "EDGAR_BASE_URL", "EDGAR_ARCHIVES_URL",
+              "OPENROUTER_BASE_URL", "OPENROUTER_API_KEY", "CACHE_DIR", "EDGAR_RATE_LIMIT", "TRACE_EXPORT_PATH")
+
+
+def configure(server_url: str, cache_dir: str, rate_limit: float):
+    """Point EDGAR and OpenRouter settings at the fixture server and caches at cache_dir.
+
+    Shared state built under the previous settings is reset, but clients
+    created earlier keep theirs, so create them afterwards.
+    """
+    config.EDGAR_TICKERS_URL = f"{server_url}/files/company_tickers.json"
+    config.EDGAR_SUBMISSIONS_URL = f"{server_url}/submissions"
+    config.EDGAR_BASE_URL = f"{server_url}/api/xbrl/companyfacts"
+    config.EDGAR_ARCHIVES_URL = f"{server_url}/Archives/edgar/data"
+    config.OPENROUTER_BASE_URL = f"{server_url}/api/v1"
+    config.OPENROUTER_API_KEY = "benchmark"
+    config.CACHE_DIR = cache_dir
+    config.EDGAR_RATE_LIMIT = rate_limit
+    config.TRACE_EXPORT_PATH = None
+    reset_shared_state()
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Return the peak resident set size of this process so far, in megabytes."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measure(name: str, func: Callable[[int], object], iterations: int, concurrency: int = 1) -> Dict:
+    """Call func(i) iterations times, concurrency at once, and summarize the latencies."""
+    latencies = [0.0] * iterations
+    errors = []
+
+    def run(i):
+        started = time.perf_counter()
+        try:
+            func(i)
+        except Exception as e:
+            errors.append(str(e))
+        latencies[i] = (time.perf_counter() - started) * 1000
+
+    rss_before = peak_rss_mb()
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(run, range(iterations)))
+    else:
+        for i in range(iterations):
+            run(i)
+    elapsed = time.perf_counter() - started
+    rss_after = peak_rss_mb()
+
+    values = np.array(latencies)
+    return {
+        'operation': name,
+        'iterations': iterations,
+        'concurrency': concurrency,
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'first_ms': round(latencies[0], 3),
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p90_ms': round(float(np.percentile(values, 90)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+        'max_ms': round(float(values.max()), 3),
+        'throughput_per_s': round(iterations / elapsed, 2) if elapsed else None,
+        'peak_rss_mb': round(rss_after, 1) if rss_after is not None else None,
+        'peak_rss_growth_mb': round(rss_after - rss_before, 1) if rss_after is not None else None
+    }
+
+
+def run_benchmarks(fixtures: Dict, iterations: int = 10, concurrency: int = 1,
+                   llm_latency: float = 0.0, rate_limit: float = 1000.0,
+                   llm_cache: bool = False, operations: Optional[List[str]] = None) -> Dict:
+    """Start a fixture server, run every benchmark against it and return the results."""
+    server = FixtureServer(fixtures["files"], fixtures["completions"], llm_latency).start()
+    cache_dir = tempfile.mkdtemp(prefix='sec-chatbot-benchmark-')
+    saved = {name: getattr(config, name) for name in CONFIGURED}
+    configure(server.url, cache_dir, rate_limit)
+
+    # Imported after configure() so clients and shared caches pick up the fixture settings
+    from chatbot_service import SECChatbot
+    from edgar_client import EdgarClient
+    from filing_cache import FilingCache
+    from llm_analyzer import ANALYSIS_SECTIONS, LLMAnalyzer
+    from llm_cache import ResponseCache
+
+    try:
+        analyzer = LLMAnalyzer()
+        if not llm_cache:
+            # A negative TTL makes every lookup miss, so each call reaches the model
+            analyzer.cache = ResponseCache(os.path.join(cache_dir, 'llm_disabled.sqlite'), ttl=-1)
+        shared = SECChatbot(llm_analyzer=analyzer)
+        client = shared.edgar_client
+
+        tickers = json.loads(fixtures["files"]["company_tickers.json"])
+        companies = [entry["title"] for entry in tickers.values()
+                     if f"submissions/CIK{str(entry['cik_str']).zfill(10)}.json" in fixtures["files"]]
+        if not companies:
+            raise ValueError("fixtures have no company with a submissions document")
+
+        filings = []
+        for name in companies:
+            company = client.search_company(name)[0]
+            filing = client.get_recent_filings(company["cik"], "10-K")[0]
+            filings.append((company, filing))
+        filing_bytes = [len(fixtures["files"].get(
+            f"archives/{company['cik'].lstrip('0')}/{filing['accessionNumber'].replace('-', '')}/{filing['primaryDocument']}", b""))
+            for company, filing in filings]
+
+        def filing_args(i):
+            company, filing = filings[i % len(filings)]
+            return company["cik"], filing["accessionNumber"], filing["primaryDocument"]
+
+        def client_with_cache(name):
+            # Its own client, so concurrent calls never swap the filing cache under each other
+            cached_client = EdgarClient()
+            cached_client.filing_cache = FilingCache(os.path.join(cache_dir, name))
+            return cached_client
+
+        def get_filing_cold(i):
+            # A fresh filing cache forces the download, extraction and segmentation every call
+            return client_with_cache(f'filings-cold-{i}.sqlite').get_filing_content(*filing_args(i))
+
+        def analyze(i):
+            args = filing_args(i)
+            sections = client.get_filing_sections(*args, ANALYSIS_SECTIONS["comprehensive"])
+            return analyzer.analyze_document(client.get_filing_content(*args), "comprehensive", sections=sections)
+
+        def chat(query_for: Callable[[int], str], with_context: bool = False):
+            def run(i):
+                chatbot = shared.for_session()
+                context = {}
+                if with_context:
+                    company, filing = filings[i % len(filings)]
+                    context = {"company": company, "filing": filing}
+                response = chatbot.process_query(query_for(i), context)
+                if response.get("error"):
+                    raise RuntimeError(response["error"])
+                return response
+            return run
+
+        benchmarks = [
+            ("search_company", lambda i: client.search_company(companies[i % len(companies)])),
+            ("get_filing_content (cold)", get_filing_cold),
+            ("get_filing_content (cached)", None),
+            ("analyze_document", analyze),
+            ("process_query: analyze", chat(lambda i: f"Analyze {companies[i % len(companies)]}")),
+            ("process_query: question", chat(lambda i: "What are the main risks described in this filing?", with_context=True)),
+            ("process_query: compare", chat(lambda i: "Compare " + ", ".join(
+                companies[(i + k) % len(companies)] for k in range(min(3, len(companies))))))
+        ]
+
+        results = []
+        for name, func in benchmarks:
+            if operations and not any(name.startswith(op) for op in operations):
+                continue
+            if func is None:
+                warm_client = client_with_cache('filings-warm.sqlite')
+                for i in range(len(filings)):
+                    warm_client.get_filing_content(*filing_args(i))
+                func = lambda i: warm_client.get_filing_content(*filing_args(i))
+            results.append(measure(name, func, iterations, concurrency))
+            print(f"  {name}: p50 {results[-1]['p50_ms']:.1f} ms", file=sys.stderr)
+
+        return {
+            'environment': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'companies': len(companies),
+                'filing_mb': [round(size / (1024 * 1024), 2) for size in filing_bytes],
+                'iterations': iterations,
+                'concurrency': concurrency,
+                'llm_latency_s': llm_latency,
+                'llm_cache': llm_cache,
+                'rate_limit_per_s': rate_limit
+            },
+            'fixture_requests': server.requests,
+            'peak_rss_mb': peak_rss_mb(),
+            'results': results
+        }
+    finally:
+        server.stop()
+        # Leave the process as it was found: settings restored, caches rebuilt from them on next use
+        for name, value in saved.items():
+            setattr(config, name, value)
+        reset_shared_state()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def print_table(report: Dict):
+    columns = ('p50_ms', 'p90_ms', 'p99_ms', 'first_ms', 'throughput_per_s', 'peak_rss_mb', 'errors')
+    print(f"{'operation':<30}" + "".join(f"{column:>18}" for column in columns))
+    for result in report['results']:
+        print(f"{result['operation']:<30}" + "".join(f"{str(result[column]):>18}" for column in columns))
+    print(f"\nFilings (MB): {report['environment']['filing_mb']}  Peak RSS: {report['peak_rss_mb']} MB  "
+          f"Fixture requests: {report['fixture_requests']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SEC chatbot offline against a local fixture server.")
+    parser.add_argument("--fixtures", help="directory of recorded responses (default: generate synthetic ones)")
+    parser.add_argument("--filing-sizes", default="1,5,10",
+                        help="comma-separated sizes in MB of generated 10-K documents (default: 1,5,10)")
+    parser.add_argument("--facts-concepts", type=int, default=300,
+                        help="extra concepts per generated companyfacts document (default: 300)")
+    parser.add_argument("--iterations", type=int, default=10, help="calls per operation (default: 10)")
+    parser.add_argument("--concurrency", type=int, default=1, help="calls in flight at once (default: 1)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds the fake model takes per completion")
+    parser.add_argument("--rate-limit", type=float, default=1000.0,
+                        help="EDGAR requests per second allowed by the client limiter (default: 1000)")
+    parser.add_argument("--llm-cache", action="store_true", help="keep the LLM response cache enabled")
+    parser.add_argument("--only", action="append", dest="operations",
+                        help="only run operations starting with this name (repeatable)")
+    parser.add_argument("--json", dest="json_path", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.fixtures:
+        fixtures = load_fixtures(args.fixtures)
+    else:
+        sizes = [float(size) for size in args.filing_sizes.split(",") if size.strip()]
+        fixtures = generate_fixtures(sizes, args.facts_concepts)
+
+    report = run_benchmarks(fixtures, args.iterations, args.concurrency, args.llm_latency,
+                            args.rate_limit, args.llm_cache, args.operations)
+    print_table(report)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
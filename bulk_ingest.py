@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Bulk offline ingest of SEC's nightly EDGAR archives.
+
+Streams companyfacts.zip and submissions.zip member by member (nothing is
+extracted to disk) into the local HTTP cache and facts store, so that
+EdgarClient.get_company_overview, get_recent_filings and get_company_facts
+are served without calling data.sec.gov.
+
+    python bulk_ingest.py --companyfacts companyfacts.zip --submissions submissions.zip
+
+The archives are published at
+https://www.sec.gov/Archives/edgar/daily-index/bulkdata/submissions.zip and
+https://www.sec.gov/Archives/edgar/daily-index/xbrl/companyfacts.zip.
+Set EDGAR_CACHE_MAX_BYTES high enough for everything ingested, otherwise the
+least recently used entries are evicted.
+"""
+
+import argparse
+import json
+import re
+import zipfile
+from typing import Dict, Iterable, Optional
+import config
+from http_cache import HttpCache, get_shared_cache
+from xbrl_facts import FactsStore, FactsTable, get_shared_facts_store
+
+# Members are named like the API resources they mirror: CIK0000320193.json
+# or, for older submissions pages, CIK0000320193-submissions-001.json
+MEMBER_RE = re.compile(r"^CIK(\d{10})(-submissions-\d+)?\.json$")
+
+# Ingested data is refreshed by the next nightly run, not by revalidation
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+
+BATCH_SIZE = 200
+
+
+def _iter_members(path: str, ciks: Optional[set] = None) -> Iterable[tuple]:
+    """Yield (member name, cik, body) for each CIK document in a bulk archive."""
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            match = MEMBER_RE.match(info.filename.rsplit('/', 1)[-1])
+            if not match or (ciks and match.group(1) not in ciks):
+                continue
+            with archive.open(info) as member:
+                yield match.group(0), match.group(1), member.read()
+
+
+def ingest_archive(path: str, base_url: str, http_cache: HttpCache,
+                   facts_store: Optional[FactsStore] = None, ciks: Optional[set] = None,
+                   max_age: int = DEFAULT_MAX_AGE) -> Dict:
+    """Load every CIK document of a bulk archive into the HTTP cache under base_url.
+
+    When facts_store is given, each document is also flattened into a
+    FactsTable (for companyfacts.zip).
+    """
+    stats = {'documents': 0, 'tables': 0, 'errors': 0}
+    batch = []
+
+    def flush():
+        stats['documents'] += http_cache.put_many(batch, max_age=max_age)
+        batch.clear()
+
+    for name, cik, body in _iter_members(path, ciks):
+        batch.append((f"{base_url}/{name}", body))
+        if facts_store is not None:
+            try:
+                facts_store.put(cik, FactsTable.from_companyfacts(json.loads(body)))
+                stats['tables'] += 1
+            except Exception as e:
+                print(f"Error building facts table for CIK{cik}: {e}")
+                stats['errors'] += 1
+        if len(batch) >= BATCH_SIZE:
+            flush()
+
+    flush()
+    return stats
+
+
+def ingest(companyfacts: Optional[str] = None, submissions: Optional[str] = None,
+           ciks: Optional[Iterable[str]] = None, max_age: int = DEFAULT_MAX_AGE,
+           http_cache: Optional[HttpCache] = None, facts_store: Optional[FactsStore] = None) -> Dict:
+    """Ingest the companyfacts and/or submissions archives into the local stores."""
+    http_cache = http_cache or get_shared_cache()
+    facts_store = facts_store or get_shared_facts_store()
+    ciks = {str(cik).zfill(10) for cik in ciks} if ciks else None
+
+    results = {}
+    if companyfacts:
+        results['companyfacts'] = ingest_archive(
+            companyfacts, config.EDGAR_BASE_URL, http_cache, facts_store, ciks, max_age
+        )
+    if submissions:
+        results['submissions'] = ingest_archive(
+            submissions, config.EDGAR_SUBMISSIONS_URL, http_cache, None, ciks, max_age
+        )
+    results['cache'] = http_cache.stats()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest SEC bulk archives into the local EDGAR caches.")
+    parser.add_argument("--companyfacts", help="path to companyfacts.zip")
+    parser.add_argument("--submissions", help="path to submissions.zip")
+    parser.add_argument("--cik", action="append", dest="ciks", help="only ingest this CIK (repeatable)")
+    parser.add_argument("--max-age", type=int, default=DEFAULT_MAX_AGE,
+                        help="seconds ingested documents are served without revalidation")
+    args = parser.parse_args()
+
+    if not args.companyfacts and not args.submissions:
+        parser.error("pass --companyfacts and/or --submissions")
+
+    results = ingest(args.companyfacts, args.submissions, args.ciks, args.max_age)
+    for archive, stats in results.items():
+        print(f"{archive}: {stats}")
+    if results['cache']['bytes'] >= results['cache']['max_bytes']:
+        print("⚠️ The HTTP cache is full; raise EDGAR_CACHE_MAX_BYTES to keep every ingested document.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,87 @@
+import asyncio
 import json
+import re
+import threading
 import time
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
+from async_edgar_client import AsyncEdgarClient
 from edgar_client import EdgarClient
-from llm_analyzer import LLMAnalyzer
+from llm_analyzer import ANALYSIS_SECTIONS, COMPARISON_SECTIONS, LLMAnalyzer
+from progress import StageTimer
+from ticker_index import tokenize
+from tracing import Trace, propagate_iter, start_trace
+from xbrl_facts import common_fiscal_year, company_metrics, format_metrics_table, format_value, match_metric
 import config
 
+# Separators between company names in "compare Apple, Microsoft and Tesla" or "Apple vs Microsoft"
+COMPARISON_SPLIT_RE = re.compile(r"\s*,\s*(?:and\s+)?|\s+(?:and|vs\.?|versus|with|against|to)\s+", re.IGNORECASE)
+# The comparison verb, which may follow the first company: "How does Apple compare to Microsoft?"
+COMPARISON_VERB_RE = re.compile(r"\b(?:compare[sd]?|comparing|comparison(?:\s+of)?)\b\s*(?:between\s+)?", re.IGNORECASE)
+# Words asking the question rather than naming a company, before the verb
+COMPARISON_FILLER_RE = re.compile(
+    r"^(?:(?:how|does|do|did|can|could|would|will|should|you|please|i|we|want|to|let's|lets|me|help)(?:\s+|$))*",
+    re.IGNORECASE
+)
+# A separator left at the start of the text after the verb, as in "compare to Microsoft"
+COMPARISON_LEADING_SEPARATOR_RE = re.compile(r"^(?:to|with|and|against|vs\.?|versus)\s+", re.IGNORECASE)
+
+# Words that end a company name, as in "Apple's latest 10-K" or "Tesla revenue"
+COMPARISON_STOP_WORDS = {
+    "latest", "recent", "last", "10-k", "10-q", "filing", "filings", "annual", "quarterly", "report",
+    "reports", "financials", "financial", "performance", "results", "revenue", "revenues", "earnings",
+    "profitability", "growth", "metrics", "risks", "stock", "in", "on", "for", "over", "by"
+}
+
 class SECChatbot:
     """Main chatbot service that integrates EDGAR API and LLM analysis."""
     
-    def __init__(self):
-        self.edgar_client = EdgarClient()
+    def __init__(self, edgar_client: Optional[EdgarClient] = None, llm_analyzer: Optional[LLMAnalyzer] = None,
+                 async_edgar_client: Optional[AsyncEdgarClient] = None):
+        """Create a chatbot, optionally reusing clients shared with other chatbots.
+        
+        The clients (and the caches and connection pools behind them) are
+        thread-safe; only the conversation history belongs to this instance.
+        """
+        self.edgar_client = edgar_client or EdgarClient()
         # Initialize LLM analyzer with OpenRouter API key
-        if config.OPENROUTER_API_KEY and config.OPENROUTER_API_KEY != "your_openrouter_api_key_here":
+        if llm_analyzer is not None:
+            self.llm_analyzer = llm_analyzer
+        elif config.OPENROUTER_API_KEY and config.OPENROUTER_API_KEY != "your_openrouter_api_key_here":
             self.llm_analyzer = LLMAnalyzer()
         else:
             self.llm_analyzer = None
+        self.async_edgar_client = async_edgar_client
+        self._async_lock = threading.Lock()
         self.conversation_history = []
     
-    def process_query(self, user_query: str, context: Dict = None) -> Dict:
-        """Process user query and return appropriate response."""
+    def for_session(self) -> 'SECChatbot':
+        """Return a chatbot with its own conversation history that shares this one's clients."""
+        return SECChatbot(self.edgar_client, self.llm_analyzer, self._get_async_client())
+    
+    def _get_async_client(self) -> AsyncEdgarClient:
+        """Return the async EDGAR client, creating its worker pool on first use."""
+        if self.async_edgar_client is None:
+            with self._async_lock:
+                if self.async_edgar_client is None:
+                    self.async_edgar_client = AsyncEdgarClient(self.edgar_client)
+        return self.async_edgar_client
+    
+    def process_query(self, user_query: str, context: Dict = None, stream: bool = False,
+                      progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Process user query and return appropriate response.
+        
+        With stream=True, replies generated by the LLM are returned as a generator
+        of text chunks under response["stream"]; response["response"] and
+        response["data"] are filled in once the generator is exhausted.
+        
+        progress, if given, is called with an event dict as each stage starts
+        (resolving company, fetching filing, parsing filing, calling model);
+        see progress.StageTimer. Per-stage timings end up in response["timings"].
+        
+        response["trace"] holds the request's nested spans (see tracing.py);
+        for streamed replies it is filled in once the stream is exhausted.
+        """
+        timer = StageTimer(progress)
         
         response = {
             "query": user_query,
@@ -28,37 +91,56 @@ class SECChatbot:
             "error": None
         }
         
-        try:
-            # Parse the query to determine intent
-            intent = self._parse_intent(user_query)
-            response["intent"] = intent
-            
-            if intent == "search_company":
-                response = self._handle_company_search(user_query, response)
-            elif intent == "analyze_filing":
-                response = self._handle_filing_analysis(user_query, response, context)
-            elif intent == "ask_question":
-                response = self._handle_question(user_query, response, context)
-            elif intent == "compare_companies":
-                response = self._handle_comparison(user_query, response, context)
-            elif intent == "get_summary":
-                response = self._handle_summary(user_query, response, context)
-            else:
-                # If no LLM analyzer available, provide demo response
-                if not self.llm_analyzer:
-                    response["response"] = "🤖 **Demo Mode Active**\n\nI can help you explore SEC filings! Try these demo queries:\n\n• **Search for Apple Inc** - Find company information\n• **Analyze Microsoft's latest 10-K** - Get filing analysis\n• **What are Tesla's main business risks?** - Risk assessment\n• **Summarize Amazon's financial performance** - Financial summary\n\n*Note: This is demo mode with sample data. For real-time SEC analysis, please configure your OpenRouter API key.*"
+        # Every HTTP call, parse, prompt build and LLM call below is timed as a span of this trace
+        with start_trace("chat.process_query", query=user_query[:200], stream=stream) as trace:
+            try:
+                # Parse the query to determine intent
+                intent = self._parse_intent(user_query)
+                response["intent"] = intent
+                trace.root.set(intent=intent)
+                
+                if intent == "search_company":
+                    response = self._handle_company_search(user_query, response, timer)
+                elif intent == "analyze_filing":
+                    response = self._handle_filing_analysis(user_query, response, context, stream, timer)
+                elif intent == "ask_question":
+                    response = self._handle_question(user_query, response, context, stream, timer)
+                elif intent == "compare_companies":
+                    response = self._handle_comparison(user_query, response, context, timer)
+                elif intent == "get_summary":
+                    response = self._handle_summary(user_query, response, context, stream, timer)
                 else:
-                    response["response"] = "🤖 **AI Analysis Ready**\n\nI can help you analyze SEC filings with real AI! Try these queries:\n\n• **Search for Apple Inc** - Find company information\n• **Analyze Microsoft's latest 10-K** - Get AI-powered filing analysis\n• **What are Tesla's main business risks?** - AI risk assessment\n• **Summarize Amazon's financial performance** - AI financial summary\n\n*Powered by DeepSeek AI model via OpenRouter*"
+                    # If no LLM analyzer available, provide demo response
+                    if not self.llm_analyzer:
+                        response["response"] = "🤖 **Demo Mode Active**\n\nI can help you explore SEC filings! Try these demo queries:\n\n• **Search for Apple Inc** - Find company information\n• **Analyze Microsoft's latest 10-K** - Get filing analysis\n• **What are Tesla's main business risks?** - Risk assessment\n• **Summarize Amazon's financial performance** - Financial summary\n\n*Note: This is demo mode with sample data. For real-time SEC analysis, please configure your OpenRouter API key.*"
+                    else:
+                        response["response"] = "🤖 **AI Analysis Ready**\n\nI can help you analyze SEC filings with real AI! Try these queries:\n\n• **Search for Apple Inc** - Find company information\n• **Analyze Microsoft's latest 10-K** - Get AI-powered filing analysis\n• **What are Tesla's main business risks?** - AI risk assessment\n• **Summarize Amazon's financial performance** - AI financial summary\n\n*Powered by DeepSeek AI model via OpenRouter*"
+                
+                # Store in conversation history
+                self.conversation_history.append(response)
+                
+            except Exception as e:
+                trace.root.fail(e)
+                response["error"] = str(e)
+                response["response"] = f"I encountered an error: {str(e)}"
             
-            # Store in conversation history
-            self.conversation_history.append(response)
+            if response.get("stream"):
+                # The model stage runs while the caller consumes the stream
+                response["stream"] = self._timed_stream(response, propagate_iter(response["stream"]), timer, trace)
+            else:
+                response["timings"] = timer.finish()
+                response["trace"] = trace.finish()
             
-        except Exception as e:
-            response["error"] = str(e)
-            response["response"] = f"I encountered an error: {str(e)}"
-        
         return response
     
+    def _timed_stream(self, response: Dict, chunks, timer: StageTimer, trace: Trace):
+        """Pass a reply stream through and record stage timings and the trace once it is exhausted."""
+        try:
+            yield from chunks
+        finally:
+            response["timings"] = timer.finish()
+            response["trace"] = trace.finish()
+    
     def _parse_intent(self, query: str) -> str:
         """Parse user query to determine intent."""
         query_lower = query.lower()
@@ -76,7 +158,7 @@ class SECChatbot:
         else:
             return "general"
     
-    def _handle_company_search(self, query: str, response: Dict) -> Dict:
+    def _handle_company_search(self, query: str, response: Dict, timer: Optional[StageTimer] = None) -> Dict:
         """Handle company search requests."""
         # Extract company name from query
         company_name = self._extract_company_name(query)
@@ -90,7 +172,8 @@ class SECChatbot:
             return response
         
         # Search for company
-        search_results = self.edgar_client.search_and_analyze(company_name)
+        timer = timer or StageTimer()
+        search_results = self.edgar_client.search_and_analyze(company_name, progress=timer.stage)
         
         if search_results.get("error"):
             response["response"] = f"Error searching for {company_name}: {search_results['error']}"
@@ -111,7 +194,29 @@ class SECChatbot:
         
         return response
     
-    def _handle_filing_analysis(self, query: str, response: Dict, context: Dict) -> Dict:
+    def _stream_reply(self, response: Dict, chunks, prefix: str = "", on_complete=None, on_error=None):
+        """Yield streamed LLM text and record the full reply in response once finished."""
+        parts = []
+        failed = False
+        if prefix:
+            yield prefix
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
+        except Exception as e:
+            failed = True
+            message = on_error(e) if on_error else f"\n\n⚠️ Note: {str(e)}"
+            parts.append(message)
+            yield message
+        
+        text = "".join(parts)
+        response["response"] = prefix + text
+        if on_complete and not failed:
+            on_complete(text)
+    
+    def _handle_filing_analysis(self, query: str, response: Dict, context: Dict, stream: bool = False,
+                                timer: Optional[StageTimer] = None) -> Dict:
         """Handle filing analysis requests."""
         company_name = self._extract_company_name(query)
         
@@ -124,7 +229,11 @@ class SECChatbot:
             return self._demo_filing_analysis(company_name, response)
         
         # Get company data and filings
-        search_results = self.edgar_client.search_and_analyze(company_name, "10-K")
+        timer = timer or StageTimer()
+        # Downloading, extracting and segmenting happen together in the fetch_filing stage
+        search_results = self.edgar_client.search_and_analyze(
+            company_name, "10-K", progress=timer.stage, section_keys=ANALYSIS_SECTIONS["comprehensive"]
+        )
         
         if search_results.get("error"):
             response["response"] = f"Error analyzing {company_name}: {search_results['error']}"
@@ -134,10 +243,46 @@ class SECChatbot:
             response["response"] = f"No 10-K filing content found for {company_name}"
             return response
         
+        # Send the relevant Item sections rather than the start of the filing
+        company = search_results["selected_company"]
+        filing = search_results["selected_filing"]
+        sections = search_results.get("sections", {})
+        document = search_results["content"]
+        if config.ANALYSIS_MAP_REDUCE and not sections:
+            # Map-reduce analysis can cover the whole filing when no Item sections were found
+            document = self.edgar_client.get_filing_text(
+                company["cik"], filing["accessionNumber"], filing["primaryDocument"]
+            ) or document
+        
+        response["data"] = {
+            "company": search_results.get("selected_company"),
+            "filing": search_results.get("selected_filing"),
+            "analysis": None
+        }
+        
+        timer.stage("call_model")
+        if stream:
+            def complete(text):
+                response["data"]["analysis"] = self.llm_analyzer._parse_analysis(text, "comprehensive")
+            
+            def fallback(error):
+                fallback_text = self.llm_analyzer._generate_fallback_analysis(document, "comprehensive")
+                return f"{fallback_text}\n\n⚠️ Note: Analysis failed: {str(error)}"
+            
+            response["stream"] = self._stream_reply(
+                response,
+                self.llm_analyzer.stream_analysis(document, "comprehensive", sections=sections),
+                prefix=f"**Analysis of {company_name}:**\n\n",
+                on_complete=complete,
+                on_error=fallback
+            )
+            return response
+        
         # Analyze with LLM
         analysis = self.llm_analyzer.analyze_document(
-            search_results["content"], 
-            "comprehensive"
+            document, 
+            "comprehensive",
+            sections=sections
         )
         
         # Handle different response formats including fallbacks
@@ -151,42 +296,281 @@ class SECChatbot:
             # Successful analysis - format response
             response["response"] = self._format_analysis_response(analysis, company_name)
         
-        response["data"] = {
-            "company": search_results.get("selected_company"),
-            "filing": search_results.get("selected_filing"),
-            "analysis": analysis
-        }
+        response["data"]["analysis"] = analysis
         
         return response
     
-    def _handle_question(self, query: str, response: Dict, context: Dict) -> Dict:
+    def _context_filing(self, context: Dict) -> tuple:
+        """Return the document id, full text, section index and passage index of the filing in context, if known.
+        
+        When the filing's passage index is available the full text is not
+        loaded and comes back as None; answers are built from the index alone.
+        """
+        company = context.get("company") or context.get("selected_company") or {}
+        filing = context.get("filing") or context.get("selected_filing") or {}
+        if not (company.get("cik") and filing.get("accessionNumber") and filing.get("primaryDocument")):
+            return None, None, None, None
+        
+        args = (company["cik"], filing["accessionNumber"], filing["primaryDocument"])
+        document_id = f"{filing['accessionNumber']}/{filing['primaryDocument']}"
+        index = self.edgar_client.get_filing_index(*args)
+        if index is not None and len(index):
+            return document_id, None, None, index
+        
+        loaded = self.edgar_client.get_filing_with_index(*args)
+        if not loaded or not loaded["text"]:
+            return None, None, None, None
+        return document_id, loaded["text"], loaded["sections"], loaded["index"]
+    
+    def _answer_from_facts(self, query: str, context: Dict) -> Optional[Dict]:
+        """Answer direct questions for a reported figure of the company in context from its XBRL facts.
+
+        Only questions like "What was the net income in 2022?" are answered
+        here; anything else, or a question about another company, goes to the
+        filing and the LLM.
+        """
+        metric = match_metric(query)
+        company = context.get("company") or context.get("selected_company") or {}
+        if not metric or not company.get("cik"):
+            return None
+        if metric["subject"] and not self._is_same_company(metric["subject"], company):
+            return None
+        
+        table = self.edgar_client.get_facts_table(company["cik"])
+        if table is None:
+            return None
+        
+        label, concepts, unit = metric["label"], metric["concepts"], metric["unit"]
+        name = company.get("title") or table.entity_name
+        if metric["history"]:
+            series = table.by_fiscal_year(concepts, unit)
+            if not series:
+                return None
+            lines = [f"• FY{year}: {format_value(value, unit)}" for year, value in list(series.items())[-5:]]
+            answer = f"📊 **{name} {label} by fiscal year** (from XBRL financial data):\n\n" + "\n".join(lines)
+            return {"answer": answer, "metric": label, "series": series}
+        
+        if metric["year"]:
+            value = table.by_fiscal_year(concepts, unit).get(metric["year"])
+            if value is None:
+                return None
+            answer = f"📊 **{name} {label}:** {format_value(value, unit)} for fiscal year {metric['year']} (from XBRL financial data)."
+            return {"answer": answer, "metric": label, "fiscal_year": metric["year"], "value": value}
+        
+        fact = table.latest(concepts, unit, annual=True)
+        if fact is None:
+            return None
+        answer = f"📊 **{name} {label}:** {format_value(fact['value'], unit)} for the fiscal year ended {fact['end']} (reported in {fact['form']}, {fact['concept']})."
+        return {"answer": answer, "metric": label, "fact": fact}
+    
+    @staticmethod
+    def _is_same_company(subject: str, company: Dict) -> bool:
+        """Return whether a company named in a question ("Apple", "AAPL") is the given company."""
+        if subject.upper() == (company.get("ticker") or "").upper():
+            return True
+        title_tokens = set(tokenize(company.get("title") or ""))
+        subject_tokens = set(tokenize(subject))
+        return bool(subject_tokens) and subject_tokens <= title_tokens
+    
+    def _handle_question(self, query: str, response: Dict, context: Dict, stream: bool = False,
+                         timer: Optional[StageTimer] = None) -> Dict:
         """Handle specific questions about filings."""
-        if not context or not context.get("content"):
+        context = context or {}
+        timer = timer or StageTimer()
+        
+        # Figures such as revenue or net income come straight from XBRL facts, without an LLM call
+        timer.stage("lookup_facts")
+        facts_answer = self._answer_from_facts(query, context)
+        if facts_answer:
+            response["response"] = facts_answer["answer"]
+            response["data"] = dict(facts_answer, question=query)
+            return response
+        
+        # Answer from the whole filing when we know which one the user is looking at
+        timer.stage("fetch_filing")
+        document_id, document, section_index, index = self._context_filing(context)
+        if document is None and index is None:
+            document = context.get("content")
+        
+        if not document and index is None:
             response["response"] = "Please first search for and analyze a company's filing before asking questions."
             return response
         
-        answer = self.llm_analyzer.answer_question(context["content"], query)
+        timer.stage("call_model")
+        if stream:
+            response["data"] = {"question": query, "answer": None}
+            response["stream"] = self._stream_reply(
+                response,
+                self.llm_analyzer.stream_answer(document, query, section_index, index, document_id=document_id),
+                on_complete=lambda text: response["data"].update(answer=text.strip())
+            )
+            return response
+        
+        answer = self.llm_analyzer.answer_question(document, query, section_index, index, document_id=document_id)
         response["response"] = answer
         response["data"] = {"question": query, "answer": answer}
         
         return response
     
-    def _handle_summary(self, query: str, response: Dict, context: Dict) -> Dict:
+    def _handle_summary(self, query: str, response: Dict, context: Dict, stream: bool = False,
+                        timer: Optional[StageTimer] = None) -> Dict:
         """Handle summary requests."""
         if not context or not context.get("content"):
             response["response"] = "Please first search for and analyze a company's filing before requesting a summary."
             return response
         
+        timer = timer or StageTimer()
+        timer.stage("call_model")
+        if stream:
+            response["data"] = {"summary": None}
+            response["stream"] = self._stream_reply(
+                response,
+                self.llm_analyzer.stream_summary(context["content"]),
+                prefix="**Executive Summary:**\n\n",
+                on_complete=lambda text: response["data"].update(summary=text.strip())
+            )
+            return response
+        
         summary = self.llm_analyzer.generate_summary(context["content"])
         response["response"] = f"**Executive Summary:**\n\n{summary}"
         response["data"] = {"summary": summary}
         
         return response
     
-    def _handle_comparison(self, query: str, response: Dict, context: Dict) -> Dict:
-        """Handle company comparison requests."""
-        # This would require multiple company analyses
-        response["response"] = "Company comparison feature requires analyzing multiple companies. Please analyze individual companies first, then I can help compare them."
+    def _handle_comparison(self, query: str, response: Dict, context: Dict,
+                           timer: Optional[StageTimer] = None) -> Dict:
+        """Handle company comparison requests.
+        
+        Every company's filing and XBRL facts are fetched concurrently, the
+        comparable figures are computed locally, and the model is asked once
+        to compare the pre-digested metrics and short filing excerpts.
+        """
+        company_names = self._extract_company_names(query)
+        if len(company_names) < 2:
+            response["response"] = "Please name at least two companies to compare, e.g. 'Compare Apple, Microsoft and Alphabet'."
+            return response
+        
+        timer = timer or StageTimer()
+        timer.stage("fetch_filing", f"Fetching filings for {len(company_names)} companies")
+        results = self._get_async_client().run_sync(self._fetch_comparison_data(company_names))
+        
+        found = [result for result in results if not result.get("error")]
+        missing = [f"{result['company_name']} ({result['error']})" for result in results if result.get("error")]
+        if len(found) < 2:
+            response["response"] = "Could not compare these companies: " + "; ".join(missing)
+            return response
+        
+        timer.stage("parse_filing", "Computing metrics")
+        # Compare every company on the same fiscal year, not each one's own latest
+        fiscal_year = common_fiscal_year([result["facts_table"] for result in found if result.get("facts_table") is not None])
+        metrics = []
+        documents = []
+        for result in found:
+            company = result["selected_company"]
+            table = result.get("facts_table")
+            if table is not None:
+                metric = company_metrics(table, fiscal_year)
+                metric["company"] = company["title"]
+                metrics.append(metric)
+            documents.append({
+                "company_name": company["title"],
+                "content": result["content"],
+                "sections": result.get("sections")
+            })
+        metrics_table = format_metrics_table(metrics) if metrics else ""
+        
+        response["data"] = {
+            "companies": [result["selected_company"] for result in found],
+            "filings": [result["selected_filing"] for result in found],
+            "fiscal_year": fiscal_year,
+            "metrics": metrics,
+            "comparison": None
+        }
+        
+        names = ", ".join(document["company_name"] for document in documents)
+        reply = f"**Comparison of {names}:**\n\n"
+        if metrics_table:
+            period = f"fiscal year {fiscal_year}" if fiscal_year else "each company's latest fiscal year"
+            reply += f"{metrics_table}\n\n*Figures from XBRL financial data for {period}.*\n\n"
+        
+        if self.llm_analyzer:
+            timer.stage("call_model")
+            comparison = self.llm_analyzer.compare_companies(documents, metrics_table)
+            response["data"]["comparison"] = comparison
+            reply += self._format_comparison_response(comparison)
+        else:
+            reply += "*Configure your OpenRouter API key for an AI-written comparison of these companies.*"
+        
+        if missing:
+            reply += "\n\n⚠️ Not included: " + "; ".join(missing)
+        response["response"] = reply.strip()
+        return response
+    
+    async def _fetch_comparison_data(self, company_names: List[str]) -> List[Dict]:
+        """Fetch each company's latest 10-K, its comparison sections and XBRL facts concurrently."""
+        client = self._get_async_client()
+        
+        async def fetch(company_name):
+            result = await client.search_and_analyze(
+                company_name, "10-K", include_overview=False, include_facts=False, include_facts_table=True
+            )
+            if not result.get("error"):
+                filing = result["selected_filing"]
+                # The filing was just loaded, so cutting out its sections is a cache hit
+                result["sections"] = await client.get_filing_sections(
+                    result["selected_company"]["cik"], filing["accessionNumber"],
+                    filing["primaryDocument"], COMPARISON_SECTIONS
+                )
+            return result
+        
+        return await asyncio.gather(*[fetch(name) for name in company_names])
+    
+    def _extract_company_names(self, query: str) -> List[str]:
+        """Extract the companies named in a comparison query, e.g. "Compare Apple vs Microsoft"."""
+        query = query.strip()
+        verb = COMPARISON_VERB_RE.search(query)
+        if verb:
+            before = COMPARISON_FILLER_RE.sub("", query[:verb.start()].strip())
+            after = COMPARISON_LEADING_SEPARATOR_RE.sub("", query[verb.end():].strip())
+            query = f"{before}, {after}" if before else after
+        
+        names = []
+        for part in COMPARISON_SPLIT_RE.split(query):
+            words = []
+            for word in re.sub(r"[?!.]+$", "", part.strip()).split():
+                if words and word.lower() in COMPARISON_STOP_WORDS:
+                    break
+                possessive = re.sub(r"['’]s$", "", word)
+                words.append(possessive)
+                if possessive != word:
+                    break
+            name = " ".join(words[:4])
+            if name and name.lower() not in [n.lower() for n in names]:
+                names.append(name)
+        return names[:config.COMPARISON_MAX_COMPANIES]
+    
+    def _format_comparison_response(self, comparison: Dict) -> str:
+        """Format an LLM comparison into a readable response."""
+        if comparison.get("error"):
+            return f"⚠️ Note: {comparison['error']}"
+        if "raw_comparison" in comparison:
+            return comparison["raw_comparison"]
+        
+        response = ""
+        for key, title in (("comparison_summary", "Summary"), ("financial_comparison", "Financials"),
+                           ("risk_comparison", "Risks"), ("growth_comparison", "Growth")):
+            if comparison.get(key):
+                response += f"**{title}:**\n{comparison[key]}\n\n"
+        
+        if comparison.get("recommendations"):
+            response += "**Recommendations:**\n"
+            for recommendation in comparison["recommendations"][:3]:
+                response += f"• {recommendation}\n"
+            response += "\n"
+        
+        if comparison.get("winner"):
+            response += f"**Best Positioned:** {comparison['winner']}"
+        
         return response
     
     def _extract_company_name(self, query: str) -> str:
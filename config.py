@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,6 +11,24 @@ OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
 OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 OPENROUTER_MODEL = "deepseek/deepseek-chat-v3.1:free"
+LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', 7 * 24 * 3600))  # Reuse completions for a week
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', 5000))
+LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', 8))  # Pooled keep-alive connections to OpenRouter
+LLM_CONTEXT_TOKENS = int(os.getenv('LLM_CONTEXT_TOKENS', 32768))  # Prompt plus reply must fit the model
+LLM_DOCUMENT_TOKENS = int(os.getenv('LLM_DOCUMENT_TOKENS', 1500))  # Filing text per prompt, bounds cost per call
+
+# Retrieval configuration for question answering
+RETRIEVAL_CHUNK_CHARS = 1200  # Passage size when chunking filings
+RETRIEVAL_TOP_K = 5  # Passages sent to the model per question
+
+# Map-reduce analysis over the full text of relevant filing sections
+ANALYSIS_MAP_REDUCE = os.getenv('ANALYSIS_MAP_REDUCE', 'false').lower() == 'true'
+ANALYSIS_CHUNK_CHARS = int(os.getenv('ANALYSIS_CHUNK_CHARS', 8000))  # Text summarized per map call
+ANALYSIS_MAX_CHUNKS = int(os.getenv('ANALYSIS_MAX_CHUNKS', 24))  # Chunks grow past this many
+ANALYSIS_CONCURRENCY = int(os.getenv('ANALYSIS_CONCURRENCY', 4))  # Map calls in flight at once
+
+# Multi-company comparison
+COMPARISON_MAX_COMPANIES = int(os.getenv('COMPARISON_MAX_COMPANIES', 5))  # Companies fetched per comparison
 
 # AWS Configuration
 AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
@@ -19,7 +38,26 @@ AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
 # EDGAR API Configuration
 EDGAR_BASE_URL = "https://data.sec.gov/api/xbrl/companyfacts"
 EDGAR_SEARCH_URL = "https://www.sec.gov/edgar/search"
+EDGAR_TICKERS_URL = "https://www.sec.gov/files/company_tickers.json"
+EDGAR_SUBMISSIONS_URL = "https://data.sec.gov/submissions"
+EDGAR_ARCHIVES_URL = "https://www.sec.gov/Archives/edgar/data"
+EDGAR_STREAM_CHUNK_SIZE = 64 * 1024  # Bytes fed to the filing extractor at a time
+EDGAR_MAX_CONNECTIONS = int(os.getenv('EDGAR_MAX_CONNECTIONS', 8))  # Concurrent requests to SEC
+EDGAR_RATE_LIMIT = float(os.getenv('EDGAR_RATE_LIMIT', 9))  # Requests per second, below SEC's 10/s limit
+EDGAR_RATE_LIMIT_FILE = os.getenv('EDGAR_RATE_LIMIT_FILE')  # Shared bucket state for multi-process hosts
+EDGAR_MAX_RETRIES = int(os.getenv('EDGAR_MAX_RETRIES', 3))
+EDGAR_RETRY_BASE_DELAY = 1.0  # Seconds, doubled on every retry
+TICKER_INDEX_TTL = int(os.getenv('TICKER_INDEX_TTL', 86400))  # Refresh ticker index daily
 
 # Application Configuration
 MAX_DOCUMENT_SIZE = 1000000  # 1MB limit for processing
 MAX_SUMMARY_LENGTH = 2000
+
+# Request tracing: append every chat request's spans to this JSON lines file
+TRACE_EXPORT_PATH = os.getenv('TRACE_EXPORT_PATH')
+TRACE_EXPORT_FORMAT = os.getenv('TRACE_EXPORT_FORMAT', 'json')  # 'json' (one nested record) or 'otel' (OTLP spans)
+
+# Local cache configuration (point SEC_CACHE_DIR at a mounted volume to share it)
+CACHE_DIR = os.getenv('SEC_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'sec-chatbot-cache'))
+EDGAR_CACHE_MAX_BYTES = int(os.getenv('EDGAR_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+EDGAR_CACHE_MAX_AGE = int(os.getenv('EDGAR_CACHE_MAX_AGE', 3600))  # Revalidate after 1 hour
@@ -1,9 +1,31 @@
 import requests
 import json
+import random
+import threading
 import time
-from typing import Dict, List, Optional
-from bs4 import BeautifulSoup
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 import config
+from filing_cache import get_shared_filing_cache
+from filing_extractor import charset_from_content_type, iter_text_blocks
+from filing_index import get_shared_filing_index_store
+from http_cache import get_shared_cache
+from retrieval import FilingIndex, chunk_document
+from rate_limiter import get_shared_limiter
+from section_segmenter import ANNUAL_PRIORITY, QUARTERLY_PRIORITY, get_sections, segment_filing
+from single_flight import SingleFlight
+from submissions_index import SubmissionsIndex
+from ticker_index import get_shared_index
+from tracing import propagate, span
+from xbrl_facts import FactsTable, get_shared_facts_store
+
+# Text of the page SEC serves with a 403 when the fair-access request rate is exceeded
+RATE_LIMIT_PAGE_MARKER = b'Request Rate Threshold Exceeded'
+
+# Identical EDGAR fetches in flight across all clients in the process share one request
+edgar_flight = SingleFlight()
 
 class EdgarClient:
     """Client for interacting with SEC EDGAR API to retrieve 10-K and 10-Q filings."""
@@ -16,89 +38,227 @@ class EdgarClient:
             'User-Agent': 'GenAI-SEC-Chatbot/1.0 (contact@example.com)',
             'Accept': 'application/json'
         })
+        self.rate_limiter = get_shared_limiter()
+        self.http_cache = get_shared_cache()
+        self.filing_cache = get_shared_filing_cache()
+        self.filing_index = get_shared_filing_index_store()
+        self.facts_store = get_shared_facts_store()
+        self.ticker_index = get_shared_index(self._load_company_tickers)
+        # Parsed submissions and their form-type index, shared by overview and filing lookups
+        self._submissions = OrderedDict()
+        self._submissions_lock = threading.Lock()
     
     def search_company(self, company_name: str) -> List[Dict]:
         """Search for a company by name and return basic information."""
         try:
-            # Use SEC's company tickers endpoint
-            tickers_url = "https://www.sec.gov/files/company_tickers.json"
-            response = self.session.get(tickers_url)
-            response.raise_for_status()
-            
-            tickers_data = response.json()
-            results = []
-            
-            # First, try exact matches
-            for entry in tickers_data.values():
-                title = entry.get('title', '').lower()
-                ticker = entry.get('ticker', '').lower()
-                search_term = company_name.lower()
-                
-                # Check for exact matches first
-                if search_term in title or search_term == ticker:
-                    results.append({
-                        'cik': str(entry['cik_str']).zfill(10),
-                        'ticker': entry['ticker'],
-                        'title': entry['title'],
-                        'match_score': 100 if search_term == ticker else 90
-                    })
-            
-            # If no exact matches, try partial matches
-            if not results:
-                for entry in tickers_data.values():
-                    title = entry.get('title', '').lower()
-                    search_words = search_term.split()
-                    
-                    # Check if any search words are in the title
-                    if any(word in title for word in search_words if len(word) > 2):
-                        results.append({
-                            'cik': str(entry['cik_str']).zfill(10),
-                            'ticker': entry['ticker'],
-                            'title': entry['title'],
-                            'match_score': 70
-                        })
-            
-            # Sort by match score and return top 5
-            results.sort(key=lambda x: x.get('match_score', 0), reverse=True)
-            return results[:5]
+            # Lookups are served from the shared in-memory index of company_tickers.json
+            return self.ticker_index.search(company_name)
             
         except Exception as e:
             print(f"Error searching for company: {e}")
             return []
     
+    def _load_company_tickers(self) -> Dict:
+        """Download SEC's company tickers file for the ticker index."""
+        return self._get_json(config.EDGAR_TICKERS_URL)
+    
+    def _request(self, url: str, **kwargs) -> requests.Response:
+        """GET from EDGAR within the shared rate limit, retrying when SEC throttles us."""
+        for attempt in range(config.EDGAR_MAX_RETRIES + 1):
+            with span("http.get", url=url, attempt=attempt) as current:
+                with span("rate_limit.wait"):
+                    self.rate_limiter.acquire()
+                response = self.session.get(url, **kwargs)
+                if current:
+                    current.set(status_code=response.status_code)
+            
+            if not self._is_throttled(response) or attempt == config.EDGAR_MAX_RETRIES:
+                return response
+            
+            wait_time = self._retry_after(response)
+            if wait_time is None:
+                # Exponential backoff with jitter so clients do not retry in lockstep
+                wait_time = config.EDGAR_RETRY_BASE_DELAY * (2 ** attempt) * random.uniform(0.5, 1.5)
+            response.close()
+            print(f"SEC rate limit hit, waiting {wait_time:.1f} seconds before retry {attempt + 1}/{config.EDGAR_MAX_RETRIES}")
+            self.rate_limiter.pause(wait_time)
+        
+        return response
+    
+    @staticmethod
+    def _is_throttled(response: requests.Response) -> bool:
+        """Return whether SEC asked us to slow down, rather than refusing the request outright."""
+        if response.status_code in (429, 503):
+            return True
+        # 403 also signals an exceeded fair-access limit, but only with Retry-After or
+        # SEC's rate-limit page; a bare 403 (bad User-Agent, forbidden path) will not pass on retry
+        if response.status_code == 403:
+            return 'Retry-After' in response.headers or RATE_LIMIT_PAGE_MARKER in response.content[:4096]
+        return False
+    
+    @staticmethod
+    def _retry_after(response: requests.Response) -> Optional[float]:
+        """Parse a Retry-After header given in seconds or as an HTTP date."""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+    
+    def _get_json(self, url: str) -> Dict:
+        """GET a JSON document through the disk cache, revalidating stale entries."""
+        return edgar_flight.do(('json', url), self._fetch_json, url)
+    
+    def _fetch_json(self, url: str) -> Dict:
+        with span("edgar.get_json", url=url) as current:
+            cached = self.http_cache.get(url)
+            if current:
+                current.set(cache='fresh' if cached and cached['fresh'] else 'stale' if cached else 'miss')
+            if cached and cached['fresh']:
+                return json.loads(cached['body'])
+            
+            headers = {}
+            if cached:
+                if cached['etag']:
+                    headers['If-None-Match'] = cached['etag']
+                if cached['last_modified']:
+                    headers['If-Modified-Since'] = cached['last_modified']
+            
+            response = self._request(url, headers=headers)
+            if response.status_code == 304 and cached:
+                self.http_cache.touch(url)
+                return json.loads(cached['body'])
+            response.raise_for_status()
+            
+            self.http_cache.put(
+                url,
+                response.content,
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified')
+            )
+            return response.json()
+    
+    def _load_submissions(self, cik: str, include_history: bool = False) -> Tuple[Dict, SubmissionsIndex]:
+        """Return a company's submissions payload and its form-type index, reusing recent ones.
+        
+        With include_history=True the older filings.files pages are loaded and indexed too.
+        """
+        key = (cik, include_history)
+        with self._submissions_lock:
+            entry = self._submissions.get(key)
+        if entry is None or time.time() - entry[0] > config.EDGAR_CACHE_MAX_AGE:
+            data = self._get_json(f"{config.EDGAR_SUBMISSIONS_URL}/CIK{cik}.json")
+            pages = self._iter_history_pages(data) if include_history else []
+            entry = (time.time(), data, SubmissionsIndex.from_submissions(data, pages))
+        
+        with self._submissions_lock:
+            self._submissions[key] = entry
+            self._submissions.move_to_end(key)
+            while len(self._submissions) > 32:
+                self._submissions.popitem(last=False)
+        return entry[1], entry[2]
+    
+    def _submit_history_pages(self, data: Dict, start: Optional[str] = None,
+                              end: Optional[str] = None) -> Tuple[Optional[ThreadPoolExecutor], List[Tuple[Dict, Future]]]:
+        """Request the older filings.files pages of a submissions payload concurrently, newest first.
+        
+        Pages outside [start, end] are skipped. Returns the executor, which the
+        caller must shut down, and each page with the future of its payload.
+        """
+        pages = [
+            page for page in data.get('filings', {}).get('files', [])
+            if not (start and page.get('filingTo', start) < start)
+            and not (end and page.get('filingFrom', end) > end)
+        ]
+        if not pages:
+            return None, []
+        
+        executor = ThreadPoolExecutor(max_workers=min(len(pages), config.EDGAR_MAX_CONNECTIONS))
+        return executor, [
+            (page, executor.submit(propagate(self._get_json), f"{config.EDGAR_SUBMISSIONS_URL}/{page['name']}"))
+            for page in pages
+        ]
+    
+    @staticmethod
+    def _collect_history_pages(pending: List[Tuple[Dict, Future]]) -> Iterator[Dict]:
+        """Yield the payloads of submitted history pages in order, skipping pages that failed."""
+        for page, future in pending:
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Error getting filing history page {page['name']}: {e}")
+                continue
+            yield result
+    
+    def _iter_history_pages(self, data: Dict, start: Optional[str] = None,
+                            end: Optional[str] = None) -> Iterator[Dict]:
+        """Yield the older filings.files pages of a submissions payload, newest first.
+        
+        The pages are requested concurrently as soon as iteration begins, and
+        pending requests are cancelled if the caller stops early.
+        """
+        executor, pending = self._submit_history_pages(data, start, end)
+        try:
+            yield from self._collect_history_pages(pending)
+        finally:
+            if executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+    
+    def get_filing_history(self, cik: str, form_type: Optional[str] = None,
+                           start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Dict]:
+        """Iterate over a company's full filing history, newest first.
+        
+        Filings are filtered by form type (substring match, as in
+        get_recent_filings) and by filing date within [start, end]
+        ("YYYY-MM-DD"). Older history pages are requested in parallel, through
+        the HTTP cache, while the recent filings are being consumed.
+        """
+        try:
+            data, index = self._load_submissions(cik)
+        except Exception as e:
+            print(f"Error getting filing history: {e}")
+            return
+        
+        # Start downloading older pages before handing out the recent rows, so the two overlap
+        executor, pending = self._submit_history_pages(data, start, end)
+        try:
+            yield from index.filings(form_type, start=start, end=end)
+            for page in self._collect_history_pages(pending):
+                yield from SubmissionsIndex([page]).filings(form_type, start=start, end=end)
+        finally:
+            if executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+    
+    def get_submissions_index(self, cik: str, include_history: bool = False) -> Optional[SubmissionsIndex]:
+        """Get the form-type index over a company's filings."""
+        try:
+            return self._load_submissions(cik, include_history)[1]
+        except Exception as e:
+            print(f"Error getting submissions index: {e}")
+            return None
+    
     def get_company_overview(self, cik: str) -> Optional[Dict]:
         """Get comprehensive company overview including recent filings and key metrics."""
         try:
             # Get company submissions data
-            submissions_url = f"https://data.sec.gov/submissions/CIK{cik}.json"
-            response = self.session.get(submissions_url)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            # Get recent filings for more context
-            recent_filings = data.get('filings', {}).get('recent', {})
-            forms = recent_filings.get('form', [])
-            filing_dates = recent_filings.get('filingDate', [])
-            accession_numbers = recent_filings.get('accessionNumber', [])
+            data, index = self._load_submissions(cik)
             
             # Find latest 10-K and 10-Q filings
             latest_10k = None
             latest_10q = None
             
-            for i, form in enumerate(forms):
-                if form == '10-K' and not latest_10k:
-                    latest_10k = {
-                        'form': form,
-                        'date': filing_dates[i] if i < len(filing_dates) else '',
-                        'accession': accession_numbers[i] if i < len(accession_numbers) else ''
-                    }
-                elif form == '10-Q' and not latest_10q:
-                    latest_10q = {
-                        'form': form,
-                        'date': filing_dates[i] if i < len(filing_dates) else '',
-                        'accession': accession_numbers[i] if i < len(accession_numbers) else ''
-                    }
+            filing = index.latest('10-K', exact=True)
+            if filing:
+                latest_10k = {'form': filing['form'], 'date': filing['filingDate'], 'accession': filing['accessionNumber']}
+            filing = index.latest('10-Q', exact=True)
+            if filing:
+                latest_10q = {'form': filing['form'], 'date': filing['filingDate'], 'accession': filing['accessionNumber']}
             
             # Extract comprehensive information
             overview = {
@@ -110,7 +270,7 @@ class EdgarClient:
                 'fiscal_year_end': data.get('fiscalYearEnd', ''),
                 'business_address': data.get('addresses', {}).get('business', {}),
                 'mailing_address': data.get('addresses', {}).get('mailing', {}),
-                'recent_filings_count': len(forms),
+                'recent_filings_count': len(index),
                 'latest_10k': latest_10k,
                 'latest_10q': latest_10q,
                 'entity_type': data.get('entityType', ''),
@@ -128,39 +288,32 @@ class EdgarClient:
     def get_company_facts(self, cik: str) -> Optional[Dict]:
         """Get company facts data for a given CIK."""
         try:
-            url = f"{self.base_url}/CIK{cik}.json"
-            response = self.session.get(url)
-            response.raise_for_status()
-            return response.json()
+            return self._get_json(f"{self.base_url}/CIK{cik}.json")
         except Exception as e:
             print(f"Error getting company facts: {e}")
             return None
     
+    def get_facts_table(self, cik: str) -> Optional[FactsTable]:
+        """Get company facts as a columnar table for numeric queries."""
+        try:
+            table = self.facts_store.get(cik)
+            if table is None:
+                facts = self.get_company_facts(cik)
+                if not facts:
+                    return None
+                table = FactsTable.from_companyfacts(facts)
+                self.facts_store.put(cik, table)
+            return table
+        except Exception as e:
+            print(f"Error getting facts table: {e}")
+            return None
+    
     def get_recent_filings(self, cik: str, form_type: str = "10-K") -> List[Dict]:
         """Get recent filings for a company."""
         try:
-            # Use SEC's submissions endpoint
-            submissions_url = f"https://data.sec.gov/submissions/CIK{cik}.json"
-            response = self.session.get(submissions_url)
-            response.raise_for_status()
-            
-            data = response.json()
-            filings = []
-            
-            if 'filings' in data and 'recent' in data['filings']:
-                recent = data['filings']['recent']
-                
-                for i, form in enumerate(recent.get('form', [])):
-                    if form_type in form:
-                        filing = {
-                            'form': form,
-                            'filingDate': recent.get('filingDate', [])[i],
-                            'accessionNumber': recent.get('accessionNumber', [])[i],
-                            'primaryDocument': recent.get('primaryDocument', [])[i]
-                        }
-                        filings.append(filing)
-            
-            return filings[:5]  # Return last 5 filings
+            # Use SEC's submissions endpoint, indexed by form type
+            _, index = self._load_submissions(cik)
+            return index.filings(form_type, limit=5)  # Return last 5 filings
             
         except Exception as e:
             print(f"Error getting recent filings: {e}")
@@ -169,85 +322,141 @@ class EdgarClient:
     def get_filing_content(self, cik: str, accession_number: str, primary_document: str) -> Optional[str]:
         """Retrieve the content of a specific filing."""
         try:
-            # Construct the filing URL
-            filing_url = f"https://www.sec.gov/Archives/edgar/data/{cik}/{accession_number.replace('-', '')}/{primary_document}"
-            
-            response = self.session.get(filing_url)
-            response.raise_for_status()
-            
-            # Parse HTML content
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            # Look for specific sections that are most relevant for analysis
-            relevant_sections = []
-            
-            # Try to find specific sections
-            section_keywords = [
-                'business', 'risk factors', 'management discussion', 'financial statements',
-                'consolidated statements', 'balance sheet', 'income statement', 'cash flow',
-                'revenue', 'expenses', 'assets', 'liabilities', 'equity'
-            ]
-            
-            # Get all text content
-            text_content = soup.get_text()
-            
-            # Split into paragraphs and find relevant sections
-            paragraphs = text_content.split('\n')
-            current_section = []
-            in_relevant_section = False
-            
-            for line in paragraphs:
-                line = line.strip()
-                if not line or len(line) < 10:
-                    continue
-                
-                line_lower = line.lower()
-                
-                # Check if this line starts a relevant section
-                if any(keyword in line_lower for keyword in section_keywords):
-                    if current_section and in_relevant_section:
-                        relevant_sections.append('\n'.join(current_section))
-                    current_section = [line]
-                    in_relevant_section = True
-                elif in_relevant_section:
-                    current_section.append(line)
-                    # Limit section length
-                    if len(current_section) > 50:
-                        relevant_sections.append('\n'.join(current_section))
-                        current_section = []
-                        in_relevant_section = False
-            
-            # Add the last section if it exists
-            if current_section and in_relevant_section:
-                relevant_sections.append('\n'.join(current_section))
-            
-            # If we found relevant sections, use them
-            if relevant_sections:
-                content = '\n\n'.join(relevant_sections[:5])  # Use top 5 sections
-            else:
-                # Fallback to general content extraction
-                lines = text_content.split('\n')
-                cleaned_lines = []
-                
-                for line in lines:
-                    line = line.strip()
-                    if line and len(line) > 20:  # Filter out very short lines
-                        cleaned_lines.append(line)
-                
-                content = '\n'.join(cleaned_lines[:2000])  # Limit to first 2000 lines
-            
-            return content
-            
+            return self._load_filing(cik, accession_number, primary_document)['content']
         except Exception as e:
             print(f"Error getting filing content: {e}")
             return None
     
-    def search_and_analyze(self, company_name: str, form_type: str = "10-K") -> Dict:
-        """Complete workflow: search company, get filings, and retrieve content."""
+    def get_filing_text(self, cik: str, accession_number: str, primary_document: str) -> Optional[str]:
+        """Retrieve the full cleaned text of a specific filing."""
+        try:
+            return self._load_filing(cik, accession_number, primary_document)['text']
+        except Exception as e:
+            print(f"Error getting filing text: {e}")
+            return None
+    
+    def _load_filing(self, cik: str, accession_number: str, primary_document: str) -> Dict:
+        """Return extracted text for a filing, downloading and parsing it only once."""
+        key = ('filing', str(cik).lstrip('0'), accession_number.replace('-', ''), primary_document)
+        return edgar_flight.do(key, self._fetch_filing, cik, accession_number, primary_document)
+    
+    def _fetch_filing(self, cik: str, accession_number: str, primary_document: str) -> Dict:
+        with span("edgar.fetch_filing", accession=accession_number, document=primary_document) as current:
+            cached = self.filing_cache.get(cik, accession_number, primary_document)
+            if current:
+                current.set(cache='hit' if cached else 'miss')
+            if cached:
+                return cached
+            
+            # Construct the filing URL
+            filing_url = f"{config.EDGAR_ARCHIVES_URL}/{cik}/{accession_number.replace('-', '')}/{primary_document}"
+            
+            # Stream the document through the incremental extractor instead of building a DOM
+            response = self._request(filing_url, stream=True)
+            try:
+                response.raise_for_status()
+                # Download and HTML extraction are interleaved, so they are timed together
+                with span("filing.download_extract") as extract:
+                    blocks = iter_text_blocks(response.iter_content(chunk_size=config.EDGAR_STREAM_CHUNK_SIZE),
+                                              charset_from_content_type(response.headers.get('Content-Type')))
+                    text_content = '\n'.join(blocks)
+                    if extract:
+                        extract.set(text_chars=len(text_content))
+            finally:
+                response.close()
+            
+            with span("filing.segment"):
+                section_index = segment_filing(text_content)
+                content = self._build_content(text_content, section_index)
+            
+            self.filing_cache.put(cik, accession_number, primary_document, text_content, content, section_index)
+            # Index passages now so follow-up questions are lookups rather than rescans
+            with span("filing.index"):
+                self._build_index(accession_number, primary_document, text_content, section_index)
+            return {'text': text_content, 'content': content, 'sections': section_index}
+    
+    def _build_index(self, accession_number: str, primary_document: str,
+                     text_content: str, section_index: List[Dict]) -> FilingIndex:
+        index = FilingIndex.build(chunk_document(text_content, section_index))
+        self.filing_index.put(accession_number, primary_document, index)
+        return index
+    
+    def _build_content(self, text_content: str, section_index: List[Dict]) -> str:
+        """Build the analysis excerpt from the most relevant Item sections."""
+        keys = [section['key'] for section in section_index]
+        priority = QUARTERLY_PRIORITY if any(key.startswith('part_') for key in keys) else ANNUAL_PRIORITY
+        sections = get_sections(text_content, section_index, priority)
+        
+        # If we found relevant sections, use the opening of each one
+        relevant_sections = []
+        for key in priority:
+            if key in sections:
+                lines = [line for line in sections[key].split('\n') if len(line) >= 10]
+                relevant_sections.append('\n'.join(lines[:50]))
+        
+        if relevant_sections:
+            return '\n\n'.join(relevant_sections)
+        
+        # Fallback to general content extraction
+        cleaned_lines = [line for line in text_content.split('\n') if len(line) > 20]  # Filter out very short lines
+        return '\n'.join(cleaned_lines[:2000])  # Limit to first 2000 lines
+    
+    def get_filing_sections(self, cik: str, accession_number: str, primary_document: str,
+                            keys: Optional[List[str]] = None) -> Dict[str, str]:
+        """Retrieve Item sections of a filing by key, e.g. "item_1a" or "part_1_item_2"."""
+        try:
+            filing = self._load_filing(cik, accession_number, primary_document)
+            if keys is None:
+                keys = [section['key'] for section in filing['sections']]
+            return get_sections(filing['text'], filing['sections'], keys)
+        except Exception as e:
+            print(f"Error getting filing sections: {e}")
+            return {}
+    
+    def get_filing_section_index(self, cik: str, accession_number: str, primary_document: str) -> List[Dict]:
+        """Retrieve the section index (keys, titles and byte offsets) of a filing."""
+        try:
+            return self._load_filing(cik, accession_number, primary_document)['sections']
+        except Exception as e:
+            print(f"Error getting filing section index: {e}")
+            return []
+    
+    def get_filing_index(self, cik: str, accession_number: str, primary_document: str) -> Optional[FilingIndex]:
+        """Retrieve the persisted passage index of a filing, building it if needed."""
+        try:
+            index = self.filing_index.get(accession_number, primary_document)
+            if index is None:
+                filing = self._load_filing(cik, accession_number, primary_document)
+                index = self.filing_index.get(accession_number, primary_document)
+                if index is None:
+                    index = self._build_index(accession_number, primary_document, filing['text'], filing['sections'])
+            return index
+        except Exception as e:
+            print(f"Error getting filing index: {e}")
+            return None
+    
+    def get_filing_with_index(self, cik: str, accession_number: str, primary_document: str) -> Optional[Dict]:
+        """Retrieve a filing's text, section index and passage index from a single cache read."""
+        try:
+            filing = self._load_filing(cik, accession_number, primary_document)
+            index = self.filing_index.get(accession_number, primary_document)
+            if index is None:
+                index = self._build_index(accession_number, primary_document, filing['text'], filing['sections'])
+            return {'text': filing['text'], 'sections': filing['sections'], 'index': index}
+        except Exception as e:
+            print(f"Error getting filing with index: {e}")
+            return None
+    
+    def search_and_analyze(self, company_name: str, form_type: str = "10-K",
+                           progress: Optional[Callable[[str], None]] = None,
+                           section_keys: Optional[List[str]] = None) -> Dict:
+        """Complete workflow: search company, get filings, and retrieve content.
+        
+        progress, if given, is called with "resolve_company" and then
+        "fetch_filing" as the workflow reaches each stage. With section_keys,
+        those Item sections are cut from the loaded filing into "sections",
+        saving callers a second read of the cached filing.
+        """
         results = {
             'company_name': company_name,
             'companies_found': [],
@@ -258,6 +467,8 @@ class EdgarClient:
         
         try:
             # Search for company
+            if progress:
+                progress("resolve_company")
             companies = self.search_company(company_name)
             results['companies_found'] = companies
             
@@ -279,13 +490,18 @@ class EdgarClient:
             
             # Get content of most recent filing
             latest_filing = filings[0]
-            content = self.get_filing_content(
+            if progress:
+                progress("fetch_filing")
+            filing = self._load_filing(
                 cik, 
                 latest_filing['accessionNumber'], 
                 latest_filing['primaryDocument']
             )
             
-            results['content'] = content
+            results['content'] = filing['content']
+            results['section_index'] = filing['sections']
+            if section_keys is not None:
+                results['sections'] = get_sections(filing['text'], filing['sections'], section_keys)
             results['selected_company'] = company
             results['selected_filing'] = latest_filing
             
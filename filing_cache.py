@@ -0,0 +1,102 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+import config
+
+
+class FilingCache:
+    """Permanent cache of extracted filing text keyed by CIK, accession and document.
+
+    Published filings never change, so entries are never expired or revalidated.
+    Text is stored zlib-compressed and hit/miss counters are kept per process.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        # v2: text extracted before charset detection may be garbled, so it is not reused
+        self.path = path or os.path.join(config.CACHE_DIR, 'filings-v2.sqlite')
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS filings (
+                cik TEXT NOT NULL,
+                accession TEXT NOT NULL,
+                document TEXT NOT NULL,
+                text BLOB NOT NULL,
+                content BLOB NOT NULL,
+                sections BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (cik, accession, document)
+            )
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def _key(cik: str, accession_number: str, primary_document: str) -> tuple:
+        # Accession numbers appear both with and without dashes across EDGAR
+        return (str(cik).lstrip('0'), accession_number.replace('-', ''), primary_document)
+
+    def get(self, cik: str, accession_number: str, primary_document: str) -> Optional[Dict]:
+        """Return the cached text, content and section index for a filing, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, content, sections FROM filings WHERE cik = ? AND accession = ? AND document = ?",
+                self._key(cik, accession_number, primary_document)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        text, content, sections = row
+        return {
+            'text': zlib.decompress(text).decode('utf-8'),
+            'content': zlib.decompress(content).decode('utf-8'),
+            'sections': json.loads(zlib.decompress(sections))
+        }
+
+    def put(self, cik: str, accession_number: str, primary_document: str,
+            text: str, content: str, sections: List[Dict]):
+        """Store the extracted text of a filing permanently."""
+        row = self._key(cik, accession_number, primary_document) + (
+            zlib.compress(text.encode('utf-8'), 6),
+            zlib.compress(content.encode('utf-8'), 6),
+            zlib.compress(json.dumps(sections).encode('utf-8'), 6),
+            time.time()
+        )
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO filings VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        """Return entry count and the hit rate observed by this process."""
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM filings").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'entries': count,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+
+_shared_cache: Optional[FilingCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_filing_cache() -> FilingCache:
+    """Return the process-wide filing cache stored under config.CACHE_DIR."""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = FilingCache()
+    return _shared_cache
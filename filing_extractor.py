@@ -0,0 +1,158 @@
+import codecs
+import re
+from typing import Iterable, Iterator, List, Optional
+from lxml import etree
+
+# Elements whose text is never part of the readable filing
+SKIP_TAGS = {'script', 'style', 'noscript', 'ix:header'}
+
+# Elements that start a new line of text, mirroring how a browser lays them out
+BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'body', 'br', 'caption', 'center',
+    'dd', 'div', 'dl', 'dt', 'fieldset', 'figcaption', 'figure', 'footer', 'form',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'main', 'nav', 'ol',
+    'p', 'pre', 'section', 'table', 'tbody', 'tfoot', 'thead', 'title',
+    'tr', 'ul'
+}
+
+# Table cells are joined on one line per row
+CELL_TAGS = {'td', 'th'}
+
+# A <meta charset>, http-equiv content type or XML declaration near the top of the document
+DECLARED_CHARSET_RE = re.compile(rb'(?:charset|encoding)\s*=\s*["\']?\s*([A-Za-z0-9_.:-]+)', re.IGNORECASE)
+
+# Bytes scanned for a declared charset, as browsers do before decoding
+SNIFF_BYTES = 4096
+
+
+def _cp1252_fallback(error: UnicodeDecodeError):
+    """Decode bytes that are not valid UTF-8 as Windows-1252, like older EDGAR filings."""
+    bad = error.object[error.start:error.end]
+    return bad.decode('cp1252', errors='replace'), error.end
+
+
+codecs.register_error('cp1252fallback', _cp1252_fallback)
+
+
+def _lookup_encoding(name) -> Optional[str]:
+    if isinstance(name, bytes):
+        name = name.decode('ascii', errors='ignore')
+    try:
+        encoding = codecs.lookup(name).name
+    except (LookupError, TypeError):
+        return None
+    # Browsers read Latin-1 labels as Windows-1252, and filings rely on it for curly quotes
+    return 'cp1252' if encoding in ('latin-1', 'iso8859-1', 'ascii') else encoding
+
+
+def sniff_encoding(head: bytes) -> Optional[str]:
+    """Return the charset declared in the start of an HTML document, if any."""
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    match = DECLARED_CHARSET_RE.search(head[:SNIFF_BYTES])
+    return _lookup_encoding(match.group(1)) if match else None
+
+
+class _TextTarget:
+    """lxml parser target that turns SAX-style events into cleaned text blocks."""
+
+    def __init__(self):
+        self.blocks: List[str] = []
+        self._parts: List[str] = []
+        self._skip_depth = 0
+
+    def start(self, tag, attrib):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in CELL_TAGS:
+            self._parts.append(' ')
+        elif tag in BLOCK_TAGS and tag != 'tr':
+            self._flush()
+
+    def end(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip_depth = max(self._skip_depth - 1, 0)
+        elif tag in CELL_TAGS:
+            self._parts.append(' ')
+        elif tag in BLOCK_TAGS:
+            self._flush()
+
+    def data(self, data):
+        if not self._skip_depth:
+            self._parts.append(data)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        self._flush()
+
+    def _flush(self):
+        if not self._parts:
+            return
+        text = ' '.join(''.join(self._parts).split())
+        self._parts = []
+        if text:
+            self.blocks.append(text)
+
+    def pop_blocks(self) -> List[str]:
+        blocks, self.blocks = self.blocks, []
+        return blocks
+
+
+def charset_from_content_type(content_type: Optional[str]) -> Optional[str]:
+    """Return the charset parameter of a Content-Type header, e.g. from an EDGAR response."""
+    match = re.search(r'charset\s*=\s*["\']?([A-Za-z0-9_.:-]+)', content_type or '', re.IGNORECASE)
+    return match.group(1) if match else None
+
+
+def _make_decoder(encoding: Optional[str], head: bytes) -> codecs.IncrementalDecoder:
+    encoding = (_lookup_encoding(encoding) if encoding else None) or sniff_encoding(head) or 'utf-8-sig'
+    # UTF-8 that turns out to be invalid is almost always Windows-1252 mislabelled
+    errors = 'cp1252fallback' if encoding in ('utf-8', 'utf-8-sig') else 'replace'
+    return codecs.getincrementaldecoder(encoding)(errors=errors)
+
+
+def iter_text_blocks(chunks: Iterable[bytes], encoding: Optional[str] = None) -> Iterator[str]:
+    """Incrementally extract text blocks from an HTML byte stream.
+
+    Chunks are fed to lxml's event-driven HTML parser as they arrive, so the
+    document tree is never built and only the current block is held in memory.
+    Each yielded block has its whitespace collapsed and is never empty.
+
+    Bytes are decoded with encoding (e.g. the response's Content-Type charset),
+    else the charset the document declares, else UTF-8 with any invalid bytes
+    read as Windows-1252. Decoding here rather than in libxml2 keeps it from
+    guessing Latin-1 for filings that declare nothing.
+    """
+    target = _TextTarget()
+    parser = etree.HTMLParser(target=target, huge_tree=True)
+    decoder = None
+    head = b''
+    for chunk in chunks:
+        if decoder is None:
+            # Hold back the start of the document until the charset can be sniffed from it
+            head += chunk
+            if len(head) < SNIFF_BYTES:
+                continue
+            decoder = _make_decoder(encoding, head)
+            chunk, head = head, b''
+        text = decoder.decode(chunk)
+        if text:
+            parser.feed(text)
+            yield from target.pop_blocks()
+    if decoder is None:
+        decoder = _make_decoder(encoding, head)
+        text = decoder.decode(head, final=True)
+    else:
+        text = decoder.decode(b'', final=True)
+    if text:
+        parser.feed(text)
+    parser.close()
+    yield from target.pop_blocks()
+
+
+def extract_text(content: bytes, chunk_size: int = 65536, encoding: Optional[str] = None) -> str:
+    """Extract the readable text of an HTML document, one block per line."""
+    chunks = (content[i:i + chunk_size] for i in range(0, len(content), chunk_size))
+    return '\n'.join(iter_text_blocks(chunks, encoding))
@@ -0,0 +1,77 @@
+import os
+import re
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+import config
+from retrieval import FilingIndex
+
+
+class FilingIndexStore:
+    """On-disk store of per-filing passage indexes keyed by accession and document.
+
+    Each index is a directory of .npy arrays that is memory-mapped when
+    opened, so follow-up questions about a filing only pay for the pages of
+    the postings they touch. Recently opened indexes are kept in memory.
+    """
+
+    def __init__(self, path: Optional[str] = None, memory_entries: int = 16):
+        # v2: indexes built from text extracted before charset detection are not reused
+        self.path = path or os.path.join(config.CACHE_DIR, 'filing_index-v2')
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        os.makedirs(self.path, exist_ok=True)
+
+    def _directory(self, accession_number: str, primary_document: str) -> str:
+        # Accession numbers appear both with and without dashes across EDGAR
+        document = re.sub(r'[^A-Za-z0-9._-]', '_', primary_document)
+        return os.path.join(self.path, f"{accession_number.replace('-', '')}_{document}")
+
+    def _remember(self, directory: str, index: FilingIndex):
+        self._memory[directory] = index
+        self._memory.move_to_end(directory)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, accession_number: str, primary_document: str) -> Optional[FilingIndex]:
+        """Return the index for a filing, or None if it has not been built."""
+        directory = self._directory(accession_number, primary_document)
+        with self._lock:
+            index = self._memory.get(directory)
+            if index is None:
+                index = FilingIndex.load(directory)
+                if index is None:
+                    return None
+            self._remember(directory, index)
+            return index
+
+    def put(self, accession_number: str, primary_document: str, index: FilingIndex):
+        """Persist an index; concurrent writers of the same filing keep the first copy."""
+        directory = self._directory(accession_number, primary_document)
+        staging = tempfile.mkdtemp(dir=self.path, prefix='.building-')
+        try:
+            index.save(staging)
+            os.rename(staging, directory)
+        except OSError:
+            # Another process already published this filing's index
+            shutil.rmtree(staging, ignore_errors=True)
+        with self._lock:
+            self._remember(directory, index)
+
+
+_shared_store: Optional[FilingIndexStore] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_filing_index_store() -> FilingIndexStore:
+    """Return the process-wide filing index store under config.CACHE_DIR."""
+    global _shared_store
+    if _shared_store is None:
+        with _shared_lock:
+            if _shared_store is None:
+                _shared_store = FilingIndexStore()
+    return _shared_store
@@ -0,0 +1,149 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, Optional, Tuple
+import config
+
+
+class HttpCache:
+    """Persistent, size-bounded cache of HTTP response bodies keyed by URL.
+
+    Entries live in a single SQLite file so that several processes (or Lambda
+    containers sharing a mounted volume) can read and write the same cache.
+    Each entry keeps its ETag / Last-Modified validators so stale entries can be
+    revalidated with a conditional GET instead of being downloaded again, and
+    the least recently used entries are evicted once max_bytes is exceeded.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = config.EDGAR_CACHE_MAX_BYTES,
+                 max_age: int = config.EDGAR_CACHE_MAX_AGE):
+        self.path = path or os.path.join(config.CACHE_DIR, 'http_cache.sqlite')
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Return the cached entry for url (fresh or stale), or None."""
+        key = self._key(url)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, fetched_at, expires_at FROM responses WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+
+        body, etag, last_modified, fetched_at, expires_at = row
+        return {
+            'body': zlib.decompress(body),
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': fetched_at,
+            'fresh': now < expires_at
+        }
+
+    def put(self, url: str, body: bytes, etag: Optional[str] = None,
+            last_modified: Optional[str] = None, max_age: Optional[int] = None):
+        """Store a response body and its validators, evicting old entries if needed."""
+        now = time.time()
+        compressed = zlib.compress(body, 6)
+        expires_at = now + (self.max_age if max_age is None else max_age)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._key(url), url, compressed, etag, last_modified, now, expires_at, now, len(compressed))
+            )
+            self._evict()
+            self._conn.commit()
+
+    def put_many(self, items: Iterable[Tuple[str, bytes]], max_age: Optional[int] = None) -> int:
+        """Store many (url, body) pairs in one transaction, e.g. from a bulk archive."""
+        now = time.time()
+        expires_at = now + (self.max_age if max_age is None else max_age)
+        count = 0
+        with self._lock:
+            for url, body in items:
+                compressed = zlib.compress(body, 6)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (self._key(url), url, compressed, None, None, now, expires_at, now, len(compressed))
+                )
+                count += 1
+            self._evict()
+            self._conn.commit()
+        return count
+
+    def touch(self, url: str, max_age: Optional[int] = None):
+        """Mark an entry fresh again after the server answered 304 Not Modified."""
+        now = time.time()
+        expires_at = now + (self.max_age if max_age is None else max_age)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET expires_at = ?, accessed_at = ? WHERE key = ?",
+                (expires_at, now, self._key(url))
+            )
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def stats(self) -> Dict:
+        """Return the number of cached entries and their total compressed size."""
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {'entries': count, 'bytes': total, 'max_bytes': self.max_bytes}
+
+
+_shared_cache: Optional[HttpCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_cache() -> HttpCache:
+    """Return the process-wide HTTP cache stored under config.CACHE_DIR."""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = HttpCache()
+    return _shared_cache
@@ -1,25 +1,172 @@
 import requests
-from typing import Dict, List, Optional
+import hashlib
+import threading
+from typing import Dict, Iterator, List, Optional
 import config
 import json
+import math
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from llm_cache import get_shared_response_cache, make_key, normalize_question
+from retrieval import Embedder, FilingIndex, Retriever, chunk_document, format_passages
+from single_flight import SingleFlight
+from token_budget import pack_sections, truncate_to_tokens
+from tracing import propagate, span, traced
+
+# Bump whenever a prompt template changes so cached completions are not reused
+PROMPT_VERSION = "3"
+
+# Filing sections relevant to each analysis type, by 10-K and 10-Q section key
+ANALYSIS_SECTIONS = {
+    "comprehensive": ["item_1", "item_1a", "item_7", "part_1_item_2", "part_2_item_1a"],
+    "financial": ["item_7", "item_8", "part_1_item_2", "part_1_item_1"],
+    "risks": ["item_1a", "part_2_item_1a"]
+}
+
+# Sections excerpted for each company in a comparison, alongside its XBRL metrics
+COMPARISON_SECTIONS = ["item_1a", "item_7"]
+
+# Reply sizes per request type, reserved out of config.LLM_CONTEXT_TOKENS
+ANALYSIS_MAX_TOKENS = 1000
+MAP_MAX_TOKENS = 400
+SUMMARY_MAX_TOKENS = 300
+ANSWER_MAX_TOKENS = 500
+COMPARISON_MAX_TOKENS = 1500
+
+# Allowance for the instructions and system message wrapped around document text
+PROMPT_OVERHEAD_TOKENS = 400
+
+# What the map step of a map-reduce analysis should pull out of each chunk
+MAP_FOCUS = {
+    "comprehensive": "the business, financial results, risks, growth opportunities and outlook",
+    "financial": "revenue, profitability, balance sheet, cash flow, ratios and year-over-year changes",
+    "risks": "operational, market, regulatory and financial risks and how they are mitigated"
+}
+
+# Identical completion requests in flight across the process share one API call
+llm_flight = SingleFlight()
+
+_shared_session: Optional[requests.Session] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_session() -> requests.Session:
+    """Return the process-wide keep-alive session for OpenRouter.
+    
+    Reusing pooled connections skips a TCP and TLS handshake per call, and the
+    session lives at module level so warm Lambda containers keep it between
+    invocations.
+    """
+    global _shared_session
+    if _shared_session is None:
+        with _shared_lock:
+            if _shared_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.LLM_MAX_CONNECTIONS)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _shared_session = session
+    return _shared_session
+
 
 class LLMAnalyzer:
     """LLM-powered analyzer for SEC filings using OpenRouter DeepSeek model."""
     
-    def __init__(self):
+    def __init__(self, embedder: Optional[Embedder] = None):
         self.api_key = config.OPENROUTER_API_KEY
         self.base_url = config.OPENROUTER_BASE_URL
         self.model = config.OPENROUTER_MODEL
+        self.cache = get_shared_response_cache()
+        self.session = get_shared_session()
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "http://localhost:8501",
+            "X-Title": "SEC Filing Chatbot"
+        }
+        # Optional local embedding model used alongside BM25 when retrieving passages
+        self.embedder = embedder
+        self._retrievers = OrderedDict()
+        self._retrievers_lock = threading.Lock()
+    
+    def connection_stats(self) -> Dict:
+        """Return how many requests the OpenRouter connection pool served and how many connections it opened."""
+        host = urlparse(self.base_url).hostname
+        pools = self.session.get_adapter(self.base_url).poolmanager.pools
+        stats = {'requests': 0, 'connections_opened': 0, 'idle_connections': 0}
+        for key in pools.keys():
+            if key.key_host != host:
+                continue
+            pool = pools[key]
+            stats['requests'] += pool.num_requests
+            stats['connections_opened'] += pool.num_connections
+            stats['idle_connections'] += pool.pool.qsize() if pool.pool else 0
+        stats['connections_reused'] = max(stats['requests'] - stats['connections_opened'], 0)
+        return stats
+    
+    def _post_chat(self, headers: Dict, payload: Dict) -> requests.Response:
+        """POST a chat completion; concurrent calls with the same model and prompt share one request."""
+        key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+        with span("llm.chat", model=payload.get("model", self.model), max_tokens=payload.get("max_tokens", 0)) as current:
+            response = llm_flight.do(
+                key,
+                self.session.post,
+                f"{self.base_url}/chat/completions",
+                headers=headers,
+                json=payload,
+                timeout=60
+            )
+            if current:
+                current.set(status_code=response.status_code)
+            return response
+    
+    def _cache_completion(self, cache_key: str, result: Dict) -> str:
+        """Store a successful completion in the response cache and return its text."""
+        content = result["choices"][0]["message"]["content"]
+        tokens = result.get("usage", {}).get("total_tokens", 0)
+        self.cache.put(cache_key, content, tokens)
+        return content
+    
+    def cache_stats(self) -> Dict:
+        """Return response cache hit rate and saved token counts."""
+        return self.cache.stats()
+    
+    def _document_budget(self, max_tokens: int, budget: Optional[int] = None) -> int:
+        """Return how many tokens of document text a prompt may carry.
+        
+        This is the requested budget (default config.LLM_DOCUMENT_TOKENS), capped
+        so the prompt and a reply of max_tokens fit in the model's context window.
+        """
+        room = config.LLM_CONTEXT_TOKENS - max_tokens - PROMPT_OVERHEAD_TOKENS
+        return max(0, min(budget or config.LLM_DOCUMENT_TOKENS, room))
+    
+    def _select_document_text(self, document_content: str, analysis_type: str,
+                              sections: Optional[Dict[str, str]], budget: int) -> str:
+        """Pick up to budget tokens of filing text, preferring the relevant Item sections."""
+        relevant = []
+        if sections:
+            relevant = [sections[key] for key in ANALYSIS_SECTIONS.get(analysis_type, []) if sections.get(key)]
+        
+        if not relevant:
+            return truncate_to_tokens(document_content, budget)
+        
+        # Sections are listed most valuable first; short ones are kept whole
+        return pack_sections(relevant, budget)
     
-    def create_analysis_prompt(self, document_content: str, analysis_type: str = "comprehensive") -> str:
-        """Create a structured prompt for document analysis."""
+    def create_analysis_prompt(self, document_content: str, analysis_type: str = "comprehensive",
+                               sections: Optional[Dict[str, str]] = None, budget: Optional[int] = None) -> str:
+        """Create a structured prompt for document analysis within a token budget."""
+        budget = self._document_budget(ANALYSIS_MAX_TOKENS, budget)
         
         if analysis_type == "comprehensive":
+            document_text = self._select_document_text(document_content, analysis_type, sections, budget)
             prompt = f"""
             Analyze this SEC filing and provide a concise summary in plain text (not JSON).
             
             Document Content:
-            {document_content[:4000]}
+            {document_text}
             
             Give me a simple, readable response with:
             1. Brief company overview (2-3 sentences)
@@ -32,10 +179,11 @@ class LLMAnalyzer:
             """
         
         elif analysis_type == "financial":
+            document_text = self._select_document_text(document_content, analysis_type, sections, budget)
             prompt = f"""
             Extract and analyze financial information from this SEC filing:
             
-            {document_content[:6000]}
+            {document_text}
             
             Return JSON format:
             {{
@@ -49,10 +197,11 @@ class LLMAnalyzer:
             """
         
         elif analysis_type == "risks":
+            document_text = self._select_document_text(document_content, analysis_type, sections, budget)
             prompt = f"""
             Identify and analyze risk factors from this SEC filing:
             
-            {document_content[:6000]}
+            {document_text}
             
             Return JSON format:
             {{
@@ -67,62 +216,65 @@ class LLMAnalyzer:
         
         return prompt
     
-    def analyze_document(self, document_content: str, analysis_type: str = "comprehensive") -> Dict:
-        """Analyze SEC filing document using OpenRouter DeepSeek model with retry logic."""
-        import time
+    @traced("llm.build_prompt")
+    def _analysis_request(self, document_content: str, analysis_type: str,
+                          sections: Optional[Dict[str, str]], budget: Optional[int] = None) -> tuple:
+        """Build the cache key and request payload for a document analysis."""
+        prompt = self.create_analysis_prompt(document_content, analysis_type, sections, budget)
+        cache_key = make_key(PROMPT_VERSION, self.model, "analyze_document", analysis_type, prompt)
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": "You are a helpful financial analyst. Provide clear, concise answers about SEC filings. Use simple language and avoid complex formatting."},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": ANALYSIS_MAX_TOKENS,
+            "temperature": 0.3
+        }
+        return cache_key, payload
+    
+    def analyze_document(self, document_content: str, analysis_type: str = "comprehensive",
+                         sections: Optional[Dict[str, str]] = None,
+                         map_reduce: Optional[bool] = None) -> Dict:
+        """Analyze SEC filing document using OpenRouter DeepSeek model with retry logic.
         
+        When the filing's Item sections are given (see EdgarClient.get_filing_sections),
+        the prompt is built from the sections relevant to analysis_type. With
+        map_reduce (default config.ANALYSIS_MAP_REDUCE) the whole of those sections
+        is summarized chunk by chunk first; see _map_chunks.
+        """
         if not document_content:
             return {"error": "No document content provided"}
         
+        if map_reduce is None:
+            map_reduce = config.ANALYSIS_MAP_REDUCE
+        if map_reduce:
+            notes = self._map_chunks(document_content, analysis_type, sections)
+            if notes:
+                cache_key, payload = self._analysis_request(notes, analysis_type, None, config.LLM_CONTEXT_TOKENS)
+                return self._complete_analysis(cache_key, payload, document_content, analysis_type)
+        
+        cache_key, payload = self._analysis_request(document_content, analysis_type, sections)
+        return self._complete_analysis(cache_key, payload, document_content, analysis_type)
+    
+    def _complete_analysis(self, cache_key: str, payload: Dict, document_content: str, analysis_type: str) -> Dict:
+        """Run an analysis request with retries, falling back to a basic analysis on failure."""
+        import time
+        
         max_retries = 3
         retry_delay = 2
         
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return self._parse_analysis(cached, analysis_type)
+        
         for attempt in range(max_retries):
             try:
-                prompt = self.create_analysis_prompt(document_content, analysis_type)
-                
-                headers = {
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": "http://localhost:8501",
-                    "X-Title": "SEC Filing Chatbot"
-                }
-                
-                payload = {
-                    "model": self.model,
-                    "messages": [
-                        {"role": "system", "content": "You are a helpful financial analyst. Provide clear, concise answers about SEC filings. Use simple language and avoid complex formatting."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "max_tokens": 1000,
-                    "temperature": 0.3
-                }
-                
-                response = requests.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=headers,
-                    json=payload,
-                    timeout=60
-                )
+                response = self._post_chat(self.headers, payload)
                 
                 if response.status_code == 200:
-                    result = response.json()
-                    content = result["choices"][0]["message"]["content"]
-                    
-                    # Try to parse JSON response
-                    try:
-                        analysis_result = json.loads(content)
-                        analysis_result["analysis_type"] = analysis_type
-                        analysis_result["model_used"] = self.model
-                        return analysis_result
-                    except json.JSONDecodeError:
-                        # If JSON parsing fails, return the raw content
-                        return {
-                            "raw_analysis": content,
-                            "analysis_type": analysis_type,
-                            "model_used": self.model,
-                            "format": "text"
-                        }
+                    content = self._cache_completion(cache_key, response.json())
+                    return self._parse_analysis(content, analysis_type)
                         
                 elif response.status_code == 429:
                     # Rate limit hit - wait and retry
@@ -158,6 +310,99 @@ class LLMAnalyzer:
             "fallback": self._generate_fallback_analysis(document_content, analysis_type)
         }
     
+    def _analysis_chunks(self, document_content: str, analysis_type: str,
+                         sections: Optional[Dict[str, str]]) -> List[Dict]:
+        """Split the relevant sections (or the whole document) into labelled chunks for the map step."""
+        parts = []
+        if sections:
+            parts = [(key, sections[key]) for key in ANALYSIS_SECTIONS.get(analysis_type, []) if sections.get(key)]
+        if not parts:
+            parts = [(None, document_content)]
+        
+        # Grow chunks rather than exceed ANALYSIS_MAX_CHUNKS map calls
+        total = sum(len(text) for _, text in parts)
+        chunk_size = max(config.ANALYSIS_CHUNK_CHARS, math.ceil(total / config.ANALYSIS_MAX_CHUNKS))
+        chunks = []
+        for key, text in parts:
+            for chunk in chunk_document(text, chunk_size=chunk_size):
+                chunks.append({'text': chunk['text'], 'section': key})
+        return chunks
+    
+    @traced("llm.build_prompt")
+    def _map_request(self, chunk: Dict, analysis_type: str) -> tuple:
+        """Build the cache key and request payload summarizing one chunk."""
+        label = chunk['section'].replace('_', ' ').title() if chunk['section'] else 'Filing excerpt'
+        prompt = f"""
+        Extract the key points from this excerpt of an SEC filing ({label}) about
+        {MAP_FOCUS.get(analysis_type, MAP_FOCUS["comprehensive"])}.
+        
+        Excerpt:
+        {truncate_to_tokens(chunk['text'], self._document_budget(MAP_MAX_TOKENS, config.LLM_CONTEXT_TOKENS))}
+        
+        Reply with short bullet points. Keep exact figures and dates. If the excerpt has nothing relevant, reply "None".
+        """
+        cache_key = make_key(PROMPT_VERSION, self.model, "map_chunk", analysis_type, prompt)
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": "You are a helpful financial analyst taking notes on an SEC filing."},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": MAP_MAX_TOKENS,
+            "temperature": 0.2
+        }
+        return cache_key, payload
+    
+    def _summarize_chunk(self, chunk: Dict, analysis_type: str) -> Optional[str]:
+        cache_key, payload = self._map_request(chunk, analysis_type)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached.strip()
+        
+        try:
+            response = self._post_chat(self.headers, payload)
+            response.raise_for_status()
+            return self._cache_completion(cache_key, response.json()).strip()
+        except Exception as e:
+            print(f"Error summarizing {chunk['section'] or 'filing'} chunk: {e}")
+            return None
+    
+    def _map_chunks(self, document_content: str, analysis_type: str,
+                    sections: Optional[Dict[str, str]]) -> str:
+        """Map step: summarize every chunk in parallel and return the combined notes.
+        
+        At most config.ANALYSIS_CONCURRENCY requests are in flight, trading latency
+        against rate-limit headroom. Chunks that fail are left out of the notes.
+        """
+        chunks = self._analysis_chunks(document_content, analysis_type, sections)
+        with ThreadPoolExecutor(max_workers=max(1, min(config.ANALYSIS_CONCURRENCY, len(chunks)))) as executor:
+            summarize = propagate(lambda chunk: self._summarize_chunk(chunk, analysis_type))
+            summaries = list(executor.map(summarize, chunks))
+        
+        notes = []
+        for chunk, summary in zip(chunks, summaries):
+            if summary and summary.strip('. ').lower() != 'none':
+                label = chunk['section'].replace('_', ' ').title() if chunk['section'] else 'Filing'
+                notes.append(f"[{label}]\n{summary}")
+        return '\n\n'.join(notes)
+    
+    def _parse_analysis(self, content: str, analysis_type: str) -> Dict:
+        """Turn a completion into an analysis dict, keeping plain text responses as-is."""
+        # Try to parse JSON response
+        try:
+            analysis_result = json.loads(content)
+            analysis_result["analysis_type"] = analysis_type
+            analysis_result["model_used"] = self.model
+            return analysis_result
+        except json.JSONDecodeError:
+            # If JSON parsing fails, return the raw content
+            return {
+                "raw_analysis": content,
+                "analysis_type": analysis_type,
+                "model_used": self.model,
+                "format": "text"
+            }
+    
     def _generate_fallback_analysis(self, document_content: str, analysis_type: str) -> str:
         """Generate a basic analysis when API is unavailable."""
         content_preview = document_content[:1000] if document_content else "No content available"
@@ -183,113 +428,259 @@ The company appears to be operating in the market with various business segments
         else:
             return f"Basic analysis unavailable due to API limitations. Content preview: {content_preview}..."
     
-    def generate_summary(self, document_content: str, max_length: int = 500) -> str:
-        """Generate a concise summary of the document."""
-        
+    @traced("llm.build_prompt")
+    def _summary_request(self, document_content: str) -> tuple:
+        """Build the cache key and request payload for an executive summary."""
         prompt = f"""
         Summarize this SEC filing in 2-3 short paragraphs:
         
-        {document_content[:3000]}
+        {truncate_to_tokens(document_content, self._document_budget(SUMMARY_MAX_TOKENS))}
         
         Keep it simple and focus on the main points about the company and its financials.
         """
         
+        cache_key = make_key(PROMPT_VERSION, self.model, "generate_summary", prompt)
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": "You are a business analyst creating executive summaries. Be concise and focus on key insights."},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": SUMMARY_MAX_TOKENS,
+            "temperature": 0.3
+        }
+        return cache_key, payload
+    
+    def generate_summary(self, document_content: str, max_length: int = 500) -> str:
+        """Generate a concise summary of the document."""
+        cache_key, payload = self._summary_request(document_content)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached.strip()
+        
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": "http://localhost:8501",
-                "X-Title": "SEC Filing Chatbot"
-            }
-            
-            payload = {
-                "model": self.model,
-                "messages": [
-                    {"role": "system", "content": "You are a business analyst creating executive summaries. Be concise and focus on key insights."},
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": 300,
-                "temperature": 0.3
-            }
-            
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=60
-            )
+            response = self._post_chat(self.headers, payload)
             
             response.raise_for_status()
-            result = response.json()
             
-            return result["choices"][0]["message"]["content"].strip()
+            return self._cache_completion(cache_key, response.json()).strip()
             
         except Exception as e:
             return f"Summary generation failed: {str(e)}"
     
-    def answer_question(self, document_content: str, question: str) -> str:
-        """Answer specific questions about the document."""
+    def _get_retriever(self, document_hash: str, document_content: Optional[str],
+                       section_index: Optional[List[Dict]], index: Optional[FilingIndex] = None) -> Retriever:
+        """Return a passage retriever for the document, reusing recently built ones."""
+        with self._retrievers_lock:
+            retriever = self._retrievers.get(document_hash)
+        if retriever is None:
+            retriever = Retriever(document_content, section_index, self.embedder, index)
+        # Analyzers are shared across chat sessions, so guard the LRU against concurrent updates
+        with self._retrievers_lock:
+            retriever = self._retrievers.setdefault(document_hash, retriever)
+            self._retrievers.move_to_end(document_hash)
+            while len(self._retrievers) > 4:
+                self._retrievers.popitem(last=False)
+        return retriever
+    
+    def _select_passages(self, document_hash: str, document_content: Optional[str], question: str,
+                         section_index: Optional[List[Dict]], budget: int,
+                         index: Optional[FilingIndex] = None) -> str:
+        """Pick the passages most relevant to the question, up to budget tokens."""
+        if document_content is None:
+            # Only the passage index is at hand: its best passages, or else its opening ones
+            passages = self._get_retriever(document_hash, None, section_index, index).retrieve(question)
+            return format_passages(passages or (index.passage(doc_id) for doc_id in range(len(index))), budget)
+        
+        prefix = truncate_to_tokens(document_content, budget)
+        if len(prefix) == len(document_content):
+            return document_content
+        
+        passages = self._get_retriever(document_hash, document_content, section_index, index).retrieve(question)
+        if not passages:
+            return prefix
+        return format_passages(passages, budget)
+    
+    def _answer_cache_key(self, document_content: Optional[str], question: str,
+                          document_id: Optional[str] = None) -> tuple:
+        """Return the document key and the exact-match cache key for a question.
+        
+        A filing known by its document_id (accession number and primary
+        document) is keyed by it; other documents by a hash of their text.
+        """
+        document_hash = document_id or hashlib.sha256(document_content.encode('utf-8')).hexdigest()
+        return document_hash, make_key(PROMPT_VERSION, self.model, "answer_question", document_hash, normalize_question(question))
+    
+    @traced("llm.build_prompt")
+    def _answer_request(self, document_hash: str, cache_key: str, document_content: Optional[str], question: str,
+                        section_index: Optional[List[Dict]] = None,
+                        index: Optional[FilingIndex] = None) -> tuple:
+        """Build the request payload for a question about a document, keyed as _answer_cache_key returned."""
+        document_text = self._select_passages(
+            document_hash, document_content, question, section_index,
+            self._document_budget(ANSWER_MAX_TOKENS), index
+        )
         
         prompt = f"""
         Based on the following SEC filing document, answer this question: {question}
         
         Document Content:
-        {document_content[:6000]}
+        {document_text}
         
         Provide a clear, accurate answer based only on the information in the document.
         If the information is not available in the document, state that clearly.
         Include relevant data points and quotes when possible.
         """
         
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": "You are a helpful financial analyst. Answer questions about SEC filings clearly and concisely."},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": ANSWER_MAX_TOKENS,
+            "temperature": 0.2
+        }
+        return cache_key, payload
+    
+    def answer_question(self, document_content: Optional[str], question: str,
+                        section_index: Optional[List[Dict]] = None,
+                        index: Optional[FilingIndex] = None,
+                        document_id: Optional[str] = None) -> str:
+        """Answer specific questions about the document.
+        
+        Long documents (e.g. the full text of a 10-K) are chunked along their
+        Item sections and only the passages retrieved for the question are sent.
+        A prebuilt index of the document's passages is used when given, in
+        which case document_content may be None and the filing is identified
+        by document_id alone.
+        """
+        # Exact-match fast path: the same question about the same document skips retrieval
+        document_hash, cache_key = self._answer_cache_key(document_content, question, document_id)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached.strip()
+        
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": "http://localhost:8501",
-                "X-Title": "SEC Filing Chatbot"
-            }
-            
-            payload = {
-                "model": self.model,
-                "messages": [
-                    {"role": "system", "content": "You are a helpful financial analyst. Answer questions about SEC filings clearly and concisely."},
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": 500,
-                "temperature": 0.2
-            }
-            
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=60
-            )
+            cache_key, payload = self._answer_request(document_hash, cache_key, document_content, question, section_index, index)
+            response = self._post_chat(self.headers, payload)
             
             response.raise_for_status()
-            result = response.json()
             
-            return result["choices"][0]["message"]["content"].strip()
+            return self._cache_completion(cache_key, response.json()).strip()
             
         except Exception as e:
             return f"Question answering failed: {str(e)}"
     
-    def compare_companies(self, documents: List[Dict]) -> Dict:
-        """Compare multiple company filings."""
-        
-        if len(documents) < 2:
-            return {"error": "At least 2 documents required for comparison"}
+    def _stream_chat(self, payload: Dict) -> Iterator[Dict]:
+        """POST a streaming chat completion and yield each server-sent event as a dict.
+
+        The server's closing [DONE] marker is yielded as {"done": True}, so a
+        stream cut off early can be told apart from one that completed.
+        """
+        with span("llm.stream", model=payload.get("model", self.model), max_tokens=payload.get("max_tokens", 0)) as current:
+            response = self.session.post(
+                f"{self.base_url}/chat/completions",
+                headers=self.headers,
+                json=dict(payload, stream=True),
+                timeout=60,
+                stream=True
+            )
+            events = 0
+            try:
+                if current:
+                    current.set(status_code=response.status_code)
+                response.raise_for_status()
+                for line in response.iter_lines(decode_unicode=True):
+                    # Blank lines separate events; lines starting with ":" are keep-alive comments
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        yield {"done": True}
+                        break
+                    events += 1
+                    yield json.loads(data)
+            finally:
+                response.close()
+                if current:
+                    current.set(events=events)
+    
+    def stream_completion(self, cache_key: str, payload: Dict) -> Iterator[str]:
+        """Return an iterator over completion text as it arrives; the full text is cached once complete."""
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return iter([cached])
+        return self._stream_and_cache(cache_key, payload)
+    
+    def _stream_and_cache(self, cache_key: str, payload: Dict) -> Iterator[str]:
+        parts = []
+        tokens = 0
+        finished = failed = False
+        for event in self._stream_chat(payload):
+            if event.get("done"):
+                finished = True
+            if event.get("usage"):
+                tokens = event["usage"].get("total_tokens", 0)
+            for choice in event.get("choices", []):
+                failed = failed or choice.get("finish_reason") == "error"
+                text = choice.get("delta", {}).get("content")
+                if text:
+                    parts.append(text)
+                    yield text
         
+        # An empty, errored or cut-off stream would otherwise be replayed until the TTL expires
+        completion = "".join(parts)
+        if finished and not failed and completion.strip():
+            self.cache.put(cache_key, completion, tokens)
+    
+    def stream_analysis(self, document_content: str, analysis_type: str = "comprehensive",
+                        sections: Optional[Dict[str, str]] = None,
+                        map_reduce: Optional[bool] = None) -> Iterator[str]:
+        """Streaming counterpart of analyze_document; in map-reduce mode only the reduce step streams."""
+        if map_reduce is None:
+            map_reduce = config.ANALYSIS_MAP_REDUCE
+        if map_reduce:
+            notes = self._map_chunks(document_content, analysis_type, sections)
+            if notes:
+                return self.stream_completion(*self._analysis_request(notes, analysis_type, None, config.LLM_CONTEXT_TOKENS))
+        return self.stream_completion(*self._analysis_request(document_content, analysis_type, sections))
+    
+    def stream_summary(self, document_content: str) -> Iterator[str]:
+        """Streaming counterpart of generate_summary."""
+        return self.stream_completion(*self._summary_request(document_content))
+    
+    def stream_answer(self, document_content: Optional[str], question: str,
+                      section_index: Optional[List[Dict]] = None,
+                      index: Optional[FilingIndex] = None,
+                      document_id: Optional[str] = None) -> Iterator[str]:
+        """Streaming counterpart of answer_question."""
+        document_hash, cache_key = self._answer_cache_key(document_content, question, document_id)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return iter([cached])
+        return self._stream_and_cache(*self._answer_request(document_hash, cache_key, document_content, question, section_index, index))
+    
+    @traced("llm.build_prompt")
+    def _comparison_request(self, documents: List[Dict], metrics: Optional[str] = None) -> tuple:
+        """Build the cache key and request payload for a multi-company comparison."""
+        # Figures arrive pre-computed, so each company only needs a short excerpt for qualitative context
+        share = self._document_budget(COMPARISON_MAX_TOKENS) // len(documents)
         doc_summaries = []
         for i, doc in enumerate(documents):
-            doc_summaries.append(f"Company {i+1} ({doc.get('company_name', 'Unknown')}):\n{doc.get('content', '')[:2000]}")
+            doc_sections = doc.get('sections') or {}
+            sections = [doc_sections[key] for key in COMPARISON_SECTIONS if doc_sections.get(key)]
+            excerpt = pack_sections(sections, share) if sections else truncate_to_tokens(doc.get('content') or '', share)
+            doc_summaries.append(f"Company {i+1} ({doc.get('company_name', 'Unknown')}):\n{excerpt}")
         
+        metrics_block = f"Key metrics from XBRL financial data (the FY column gives the fiscal year of each row):\n{metrics}\n" if metrics else ""
         prompt = f"""
-        Compare the following SEC filings and provide a comparative analysis:
+        Compare the following companies using their reported figures and SEC filing excerpts:
         
+        {metrics_block}
         {chr(10).join(doc_summaries)}
         
-        Return JSON format:
+        Base the financial comparison on the metrics table. Return JSON format:
         {{
             "comparison_summary": "Overall comparison",
             "financial_comparison": "Financial metrics comparison",
@@ -300,18 +691,36 @@ The company appears to be operating in the market with various business segments
         }}
         """
         
+        cache_key = make_key(PROMPT_VERSION, self.model, "compare_companies", prompt)
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": "You are a financial analyst comparing companies. Provide objective, data-driven comparisons."},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": COMPARISON_MAX_TOKENS,
+            "temperature": 0.3
+        }
+        return cache_key, payload
+    
+    def compare_companies(self, documents: List[Dict], metrics: Optional[str] = None) -> Dict:
+        """Compare multiple company filings in a single completion.
+        
+        Each document has a company_name and content, plus optional Item
+        sections by key; metrics is a pre-computed table of comparable figures.
+        """
+        
+        if len(documents) < 2:
+            return {"error": "At least 2 documents required for comparison"}
+        
+        cache_key, payload = self._comparison_request(documents, metrics)
+        content = self.cache.get(cache_key)
+        
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a financial analyst comparing companies. Provide objective, data-driven comparisons."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=1500,
-                temperature=0.3
-            )
-            
-            content = response.choices[0].message.content
+            if content is None:
+                response = self._post_chat(self.headers, payload)
+                response.raise_for_status()
+                content = self._cache_completion(cache_key, response.json())
             
             try:
                 return json.loads(content)
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+import config
+
+
+def make_key(*parts) -> str:
+    """Hash the exact inputs of an LLM call (prompt, model, template version...)."""
+    data = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def normalize_question(question: str) -> str:
+    """Normalize a question so trivially different phrasings share a cache entry."""
+    return re.sub(r'\s+', ' ', question).strip().lower().rstrip('?.! ')
+
+
+class ResponseCache:
+    """Persistent cache of LLM completions with TTL and LRU eviction.
+
+    Entries are stored in SQLite under config.CACHE_DIR, fronted by a small
+    in-memory LRU so repeated questions in a warm process never touch disk.
+    Hit counts and the tokens saved by hits are tracked per process.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: int = config.LLM_CACHE_TTL,
+                 max_entries: int = config.LLM_CACHE_MAX_ENTRIES, memory_entries: int = 256):
+        self.path = path or os.path.join(config.CACHE_DIR, 'llm_cache.sqlite')
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                tokens INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed_at)")
+        self._conn.commit()
+
+    def _remember(self, key: str, entry: tuple):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached completion for key, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                row = self._conn.execute(
+                    "SELECT content, tokens, created_at FROM completions WHERE key = ?", (key,)
+                ).fetchone()
+                entry = tuple(row) if row else None
+
+            if entry is None or now - entry[2] > self.ttl:
+                self._memory.pop(key, None)
+                self.misses += 1
+                return None
+
+            self._remember(key, entry)
+            self._conn.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            self.saved_tokens += entry[1]
+            return entry[0]
+
+    def put(self, key: str, content: str, tokens: int = 0):
+        """Store a completion and the number of tokens it cost."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, (content, tokens, now))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?)",
+                (key, content, tokens, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM completions WHERE created_at < ?", (now - self.ttl,))
+        count = self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM completions WHERE key IN "
+                "(SELECT key FROM completions ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def stats(self) -> Dict:
+        """Return hit rate and token savings observed by this process."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'saved_tokens': self.saved_tokens
+        }
+
+
+_shared_cache: Optional[ResponseCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_response_cache() -> ResponseCache:
+    """Return the process-wide LLM response cache stored under config.CACHE_DIR."""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = ResponseCache()
+    return _shared_cache
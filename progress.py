@@ -0,0 +1,67 @@
+import time
+from typing import Callable, Dict, List, Optional
+
+# Stages of a chat request, in the order they run, with their display labels
+STAGES = {
+    "resolve_company": "Resolving company",
+    "lookup_facts": "Looking up financial data",
+    "fetch_filing": "Fetching and parsing filing",
+    "parse_filing": "Parsing filing",
+    "call_model": "Calling model",
+    "done": "Done"
+}
+
+
+class StageTimer:
+    """Times the stages of a request and reports each one as it starts.
+
+    Calling stage() ends the current stage and starts the next. The optional
+    callback receives an event dict with the stage key, its label, the seconds
+    since the request began and the timings of the stages finished so far, so
+    a UI can show live progress. finish() ends the last stage and returns the
+    per-stage timings.
+    """
+
+    def __init__(self, callback: Optional[Callable[[Dict], None]] = None):
+        self.callback = callback
+        self.started = time.monotonic()
+        self.timings: List[Dict] = []
+        self._current: Optional[Dict] = None
+        self._finished = False
+
+    def _close(self, now: float):
+        if self._current is not None:
+            self._current['seconds'] = now - self._current.pop('began')
+            self.timings.append(self._current)
+            self._current = None
+
+    def _emit(self, stage: str, label: str, now: float):
+        if self.callback is None:
+            return
+        try:
+            self.callback({
+                'stage': stage,
+                'label': label,
+                'elapsed': now - self.started,
+                'timings': list(self.timings)
+            })
+        except Exception as e:
+            print(f"Error reporting progress: {e}")
+
+    def stage(self, stage: str, label: Optional[str] = None):
+        """End the current stage and start the next one."""
+        now = time.monotonic()
+        self._close(now)
+        label = label or STAGES.get(stage, stage)
+        self._current = {'stage': stage, 'label': label, 'began': now}
+        self._emit(stage, label, now)
+
+    def finish(self) -> List[Dict]:
+        """End the last stage, report completion and return the timings of every stage."""
+        if self._finished:
+            return self.timings
+        self._finished = True
+        now = time.monotonic()
+        self._close(now)
+        self._emit('done', STAGES['done'], now)
+        return self.timings
@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from typing import Callable, Optional
+import config
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to a process-local bucket
+    fcntl = None
+
+
+class TokenBucket:
+    """Thread-safe token bucket that paces requests to a fixed rate.
+
+    With the default capacity of one token, requests are spaced evenly at
+    1 / rate seconds instead of bursting and then stalling. When state_path is
+    given (and file locking is available), the bucket state lives in that file
+    under an exclusive lock so every process on the host shares one budget.
+    pause() blocks all callers, e.g. to honor a server's Retry-After.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0, state_path: Optional[str] = None,
+                 clock: Callable[[], float] = time.time, sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.state_path = state_path if fcntl else None
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = capacity
+        self._updated_at = clock()
+        self._blocked_until = 0.0
+
+        if self.state_path:
+            os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+
+    def _load(self, handle):
+        handle.seek(0)
+        fields = handle.read().split()
+        if len(fields) == 3:
+            self._tokens, self._updated_at, self._blocked_until = map(float, fields)
+
+    def _save(self, handle):
+        handle.seek(0)
+        handle.truncate()
+        handle.write(f"{self._tokens} {self._updated_at} {self._blocked_until}")
+        handle.flush()
+
+    def _update(self, func):
+        """Run func on the bucket state while holding the thread (and file) lock."""
+        with self._lock:
+            if not self.state_path:
+                return func()
+            with open(self.state_path, 'a+') as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    self._load(handle)
+                    result = func()
+                    self._save(handle)
+                    return result
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _try_acquire(self) -> float:
+        """Take a token if one is available; otherwise return how long to wait."""
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        # Tolerate float rounding in the refill so waits never shrink to nothing
+        if self._tokens >= 1 - 1e-9:
+            self._tokens = max(self._tokens - 1, 0.0)
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            wait = self._update(self._try_acquire)
+            if wait <= 0:
+                return
+            self._sleep(wait)
+
+    def pause(self, seconds: float):
+        """Hold back every caller for the given number of seconds."""
+        def block():
+            self._blocked_until = max(self._blocked_until, self._clock() + seconds)
+        self._update(block)
+
+
+_shared_limiter: Optional[TokenBucket] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_limiter() -> TokenBucket:
+    """Return the process-wide limiter for SEC EDGAR requests."""
+    global _shared_limiter
+    if _shared_limiter is None:
+        with _shared_lock:
+            if _shared_limiter is None:
+                _shared_limiter = TokenBucket(
+                    config.EDGAR_RATE_LIMIT,
+                    state_path=config.EDGAR_RATE_LIMIT_FILE
+                )
+    return _shared_limiter
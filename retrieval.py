@@ -0,0 +1,250 @@
+import bisect
+import json
+import math
+import os
+import re
+from array import array
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence
+import numpy as np
+import config
+from token_budget import count_tokens, truncate_to_tokens
+
+# Words, plus numbers with decimal points or thousands separators ("394.3", "1,234")
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'did', 'do', 'does', 'for', 'from',
+    'has', 'have', 'how', 'in', 'is', 'it', 'its', 'of', 'on', 'or', 'that', 'the',
+    'their', 'this', 'to', 'was', 'were', 'what', 'when', 'where', 'which', 'who',
+    'why', 'with'
+}
+
+# An embedder maps a batch of texts to one vector per text
+Embedder = Callable[[List[str]], Sequence[Sequence[float]]]
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase text and split it into search terms, dropping stopwords."""
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def chunk_document(text: str, section_index: Optional[List[Dict]] = None,
+                   chunk_size: int = config.RETRIEVAL_CHUNK_CHARS) -> List[Dict]:
+    """Split filing text into passages of about chunk_size characters.
+
+    Lines (text blocks) are packed into passages without crossing the Item
+    boundaries of section_index, so each passage belongs to a single section.
+    Lines longer than chunk_size are split on their own.
+    """
+    starts = [section['start'] for section in section_index or []]
+    chunks = []
+    current = []
+    current_length = 0
+    current_section = None
+    offset = 0
+
+    def flush():
+        if current:
+            chunks.append({'text': '\n'.join(current), 'section': current_section})
+
+    for line in text.split('\n'):
+        position = bisect.bisect_right(starts, offset) - 1
+        section = section_index[position]['key'] if position >= 0 and offset < section_index[position]['end'] else None
+        offset += len(line.encode('utf-8')) + 1
+        if not line:
+            continue
+
+        if section != current_section or current_length + len(line) > chunk_size:
+            flush()
+            current, current_length, current_section = [], 0, section
+
+        while len(line) > chunk_size:
+            chunks.append({'text': line[:chunk_size], 'section': section})
+            line = line[chunk_size:]
+        current.append(line)
+        current_length += len(line) + 1
+
+    flush()
+    return chunks
+
+
+class FilingIndex:
+    """Okapi BM25 inverted index over the passages of a filing.
+
+    Terms are kept sorted in a fixed-width byte array and their postings
+    (passage ids and term frequencies) are stored contiguously, so the whole
+    index is a handful of flat NumPy arrays. save() writes them as .npy files
+    and load() memory-maps them, making a persisted index cheap to open.
+    """
+
+    VERSION = 1
+    ARRAYS = ('terms', 'offsets', 'doc_ids', 'freqs', 'doc_lengths', 'idf',
+              'passage_offsets', 'passage_sections', 'passage_text')
+
+    def __init__(self, arrays: Dict[str, np.ndarray], sections: List[str],
+                 k1: float = 1.5, b: float = 0.75):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.sections = sections
+        self.k1 = k1
+        self.b = b
+        self.average_length = float(self.doc_lengths.mean()) if len(self.doc_lengths) else 0.0
+
+    @classmethod
+    def build(cls, chunks: List[Dict], k1: float = 1.5, b: float = 0.75) -> 'FilingIndex':
+        """Index passages as produced by chunk_document."""
+        postings: Dict[str, tuple] = {}
+        doc_lengths = array('I')
+        for doc_id, chunk in enumerate(chunks):
+            terms = Counter(tokenize(chunk['text']))
+            doc_lengths.append(sum(terms.values()))
+            for term, frequency in terms.items():
+                doc_ids, freqs = postings.setdefault(term, (array('I'), array('I')))
+                doc_ids.append(doc_id)
+                freqs.append(frequency)
+
+        vocabulary = sorted(postings)
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term][0]) for term in vocabulary])
+        doc_ids = array('I')
+        freqs = array('I')
+        for term in vocabulary:
+            doc_ids.extend(postings[term][0])
+            freqs.extend(postings[term][1])
+
+        count = len(chunks)
+        document_frequency = np.diff(offsets).astype(np.float64)
+        sections = sorted({chunk['section'] for chunk in chunks if chunk['section']})
+        section_ids = {section: i for i, section in enumerate(sections)}
+        encoded = [chunk['text'].encode('utf-8') for chunk in chunks]
+        passage_offsets = np.zeros(count + 1, dtype=np.int64)
+        passage_offsets[1:] = np.cumsum([len(text) for text in encoded])
+
+        arrays = {
+            'terms': np.array([term.encode('utf-8') for term in vocabulary], dtype=bytes) if vocabulary else np.array([], dtype='S1'),
+            'offsets': offsets,
+            'doc_ids': np.frombuffer(doc_ids, dtype=np.uint32),
+            'freqs': np.frombuffer(freqs, dtype=np.uint32),
+            'doc_lengths': np.frombuffer(doc_lengths, dtype=np.uint32),
+            'idf': np.log(1 + (count - document_frequency + 0.5) / (document_frequency + 0.5)),
+            'passage_offsets': passage_offsets,
+            'passage_sections': np.array([section_ids.get(chunk['section'], -1) for chunk in chunks], dtype=np.int16),
+            'passage_text': np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        }
+        return cls(arrays, sections, k1, b)
+
+    def save(self, path: str):
+        """Write the index to the directory path."""
+        os.makedirs(path, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, f'{name}.npy'), getattr(self, name))
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'version': self.VERSION, 'sections': self.sections, 'k1': self.k1, 'b': self.b}, f)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['FilingIndex']:
+        """Memory-map an index written by save(), or return None if it is missing or outdated."""
+        try:
+            with open(os.path.join(path, 'meta.json')) as f:
+                meta = json.load(f)
+            if meta.get('version') != cls.VERSION:
+                return None
+            arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in cls.ARRAYS}
+        except (OSError, ValueError):
+            return None
+        return cls(arrays, meta['sections'], meta['k1'], meta['b'])
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def passage(self, doc_id: int) -> Dict:
+        """Return the text and section key of a passage."""
+        start, end = self.passage_offsets[doc_id], self.passage_offsets[doc_id + 1]
+        section = int(self.passage_sections[doc_id])
+        return {
+            'text': self.passage_text[start:end].tobytes().decode('utf-8'),
+            'section': self.sections[section] if section >= 0 else None
+        }
+
+    def _term_id(self, term: str) -> Optional[int]:
+        key = term.encode('utf-8')
+        position = int(np.searchsorted(self.terms, key))
+        if position < len(self.terms) and self.terms[position] == key:
+            return position
+        return None
+
+    def search(self, query: str, k: int) -> List[tuple]:
+        """Return up to k (passage id, score) pairs, best first."""
+        scores = np.zeros(len(self), dtype=np.float64)
+        for term in set(tokenize(query)):
+            term_id = self._term_id(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            doc_ids = self.doc_ids[start:end]
+            freqs = self.freqs[start:end].astype(np.float64)
+            length_norm = 1 - self.b + self.b * self.doc_lengths[doc_ids] / self.average_length
+            # A term lists each passage once, so fancy-index accumulation is safe
+            scores[doc_ids] += self.idf[term_id] * freqs * (self.k1 + 1) / (freqs + self.k1 * length_norm)
+
+        matched = np.flatnonzero(scores)
+        ranked = matched[np.lexsort((matched, -scores[matched]))][:k]
+        return [(int(doc_id), float(scores[doc_id])) for doc_id in ranked]
+
+
+class Retriever:
+    """Select the passages of a filing most relevant to a question.
+
+    Passages are ranked with BM25, using a prebuilt FilingIndex when one is
+    given. When a local embedding model is supplied, its cosine-similarity
+    ranking is fused with the BM25 ranking using reciprocal rank fusion.
+    """
+
+    def __init__(self, text: str, section_index: Optional[List[Dict]] = None,
+                 embedder: Optional[Embedder] = None, index: Optional[FilingIndex] = None):
+        self.index = index if index is not None else FilingIndex.build(chunk_document(text, section_index))
+        self.embedder = embedder
+        self._embeddings = None
+
+    def _embedding_ranking(self, question: str) -> List[int]:
+        if self._embeddings is None:
+            texts = [self.index.passage(doc_id)['text'] for doc_id in range(len(self.index))]
+            self._embeddings = [_normalize(vector) for vector in self.embedder(texts)]
+        query = _normalize(self.embedder([question])[0])
+        similarities = [sum(q * v for q, v in zip(query, vector)) for vector in self._embeddings]
+        return sorted(range(len(similarities)), key=lambda i: -similarities[i])
+
+    def retrieve(self, question: str, k: int = config.RETRIEVAL_TOP_K) -> List[Dict]:
+        """Return the top k passages for question, in document order."""
+        if not len(self.index):
+            return []
+
+        ranked = [doc_id for doc_id, _ in self.index.search(question, len(self.index))]
+        if self.embedder:
+            fused = {}
+            for ranking in (ranked, self._embedding_ranking(question)):
+                for rank, doc_id in enumerate(ranking):
+                    fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (60 + rank)
+            ranked = sorted(fused, key=lambda doc_id: -fused[doc_id])
+
+        return [self.index.passage(doc_id) for doc_id in sorted(ranked[:k])]
+
+
+def _normalize(vector: Sequence[float]) -> List[float]:
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def format_passages(passages: List[Dict], max_tokens: int) -> str:
+    """Join passages into prompt context, labelled by section, within max_tokens."""
+    parts = []
+    used = 0
+    for passage in passages:
+        label = passage['section'].replace('_', ' ').title() if passage['section'] else 'Filing'
+        part = truncate_to_tokens(f"[{label}]\n{passage['text']}", max_tokens - used)
+        if not part:
+            break
+        parts.append(part)
+        used += count_tokens(part) + 1
+    return '\n\n'.join(parts)
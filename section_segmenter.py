@@ -0,0 +1,119 @@
+import bisect
+import re
+from typing import Dict, List, Optional
+
+_ROMAN = {'i': 1, 'ii': 2, 'iii': 3, 'iv': 4}
+
+# "PART II", optionally followed by a title or by the first item heading
+PART_RE = re.compile(r'^(?i:part)\s+(?P<part>(?i:iv|i{1,3}))\b[\s.:\-–—]*(?P<rest>.*)$')
+
+# "Item 1A. Risk Factors", "ITEM 7 - Management's Discussion", "Item 9B:"; a bare
+# "Item 7 of this report" in running text is rejected by requiring punctuation,
+# the end of the line or a capitalized title after the item number
+ITEM_RE = re.compile(
+    r'^(?i:item)\s*(?P<item>\d{1,2}[A-Ca-c]?)\b(?:\s*[.:\-–—]\s*|\s*$|\s+(?=[A-Z]))(?P<title>.*)$'
+)
+
+# Start of an item heading that follows a part title on the same line
+ITEM_START_RE = re.compile(r'\b(?i:item)\s*\d')
+
+# Headings are short; longer blocks are body text that happens to start with "Item"
+MAX_HEADING_LENGTH = 200
+
+# Sections most useful for analysis, in the order they are concatenated
+ANNUAL_PRIORITY = ['item_1', 'item_1a', 'item_7', 'item_8']
+QUARTERLY_PRIORITY = ['part_1_item_2', 'part_1_item_1', 'part_2_item_1a']
+
+
+def _section_key(item: str, part: Optional[int], quarterly: bool) -> str:
+    if quarterly and part:
+        return f"part_{part}_item_{item.lower()}"
+    return f"item_{item.lower()}"
+
+
+def segment_filing(text: str) -> List[Dict]:
+    """Split filing text into its Item sections and return a byte-offset index.
+
+    The text is expected one block per line, as produced by filing_extractor.
+    Each entry has a key such as "item_1a" (10-K) or "part_2_item_1a" (10-Q,
+    detected when item numbers repeat under different parts), the heading
+    title and the [start, end) byte offsets of the section within
+    text.encode('utf-8'). Table-of-contents entries are discarded by keeping,
+    for every key, the occurrence with the longest body.
+    """
+    candidates = []
+    part_starts = []
+    offset = 0
+    part = None
+
+    for line in text.split('\n'):
+        line_start = offset
+        offset += len(line.encode('utf-8')) + 1
+
+        if len(line) > MAX_HEADING_LENGTH:
+            continue
+
+        heading = line
+        part_match = PART_RE.match(heading)
+        if part_match:
+            part = _ROMAN[part_match.group('part').lower()]
+            part_starts.append(line_start)
+            # "PART I. FINANCIAL INFORMATION Item 1. Financial Statements"
+            item_start = ITEM_START_RE.search(part_match.group('rest'))
+            heading = part_match.group('rest')[item_start.start():] if item_start else ''
+
+        item_match = ITEM_RE.match(heading)
+        if item_match:
+            candidates.append({
+                'item': item_match.group('item').upper(),
+                'part': part,
+                'title': item_match.group('title').strip(),
+                'start': line_start
+            })
+
+    text_length = offset - 1 if offset else 0
+    seen_parts = {}
+    for candidate in candidates:
+        if candidate['part']:
+            seen_parts.setdefault(candidate['item'], set()).add(candidate['part'])
+    quarterly = any(len(parts) > 1 for parts in seen_parts.values())
+
+    # Measure each occurrence up to the next heading and keep the longest per key
+    boundaries = sorted(set(part_starts + [c['start'] for c in candidates]))
+    best = {}
+    for candidate in candidates:
+        end = _next_boundary(boundaries, candidate['start'], text_length)
+        key = _section_key(candidate['item'], candidate['part'], quarterly)
+        if key not in best or end - candidate['start'] > best[key]['end'] - best[key]['start']:
+            best[key] = dict(candidate, key=key, end=end)
+
+    # Chosen sections run until the next chosen section or part heading begins
+    sections = sorted(best.values(), key=lambda section: section['start'])
+    for i, section in enumerate(sections):
+        next_start = sections[i + 1]['start'] if i + 1 < len(sections) else text_length
+        section['end'] = min(next_start, _next_boundary(part_starts, section['start'], text_length))
+    return sections
+
+
+def _next_boundary(boundaries: List[int], start: int, default: int) -> int:
+    index = bisect.bisect_right(boundaries, start)
+    return boundaries[index] if index < len(boundaries) else default
+
+
+def get_section(text: str, section_index: List[Dict], key: str) -> Optional[str]:
+    """Return the text of one section from a filing and its section index."""
+    for section in section_index:
+        if section['key'] == key:
+            data = text.encode('utf-8')[section['start']:section['end']]
+            return data.decode('utf-8').strip()
+    return None
+
+
+def get_sections(text: str, section_index: List[Dict], keys: List[str]) -> Dict[str, str]:
+    """Return the text of every requested section present in the index."""
+    data = text.encode('utf-8')
+    sections = {}
+    for section in section_index:
+        if section['key'] in keys:
+            sections[section['key']] = data[section['start']:section['end']].decode('utf-8').strip()
+    return sections
@@ -0,0 +1,91 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+# Columns copied from EDGAR's submissions payload for each filing
+FIELDS = ('form', 'filingDate', 'reportDate', 'accessionNumber', 'primaryDocument')
+
+
+def _day(date: str) -> int:
+    return int(np.datetime64(date, 'D').astype(np.int64))
+
+
+class SubmissionsIndex:
+    """Form-type index over a company's filings from the submissions API.
+
+    Rows from filings.recent (and any older filings.files pages) are ordered
+    newest first. Each form type maps to its sorted row ids together with
+    their filing dates, so "latest 10-K", "last 8 10-Qs" or a date range is a
+    binary search instead of a scan over the parallel lists.
+    """
+
+    def __init__(self, pages: Iterable[Dict]):
+        columns = {field: [] for field in FIELDS}
+        for page in pages:
+            count = len(page.get('accessionNumber', []))
+            for field in FIELDS:
+                values = page.get(field, [])
+                columns[field].extend(values[:count] + [''] * (count - len(values)))
+
+        # Filings without a date sort as the oldest
+        days = np.array([date or '1970-01-01' for date in columns['filingDate']], dtype='datetime64[D]').astype(np.int64)
+        # Stable sort keeps EDGAR's order for filings made on the same day
+        order = np.argsort(-days, kind='stable')
+        self._columns = {field: [values[i] for i in order] for field, values in columns.items()}
+        self._days = days[order]
+
+        rows_by_form: Dict[str, List[int]] = {}
+        for row, form in enumerate(self._columns['form']):
+            rows_by_form.setdefault(form, []).append(row)
+        self._forms = {form: self._entry(np.array(rows, dtype=np.int32)) for form, rows in rows_by_form.items()}
+        self._all = self._entry(np.arange(len(self._days), dtype=np.int32))
+        self._matches: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    @classmethod
+    def from_submissions(cls, data: Dict, pages: Iterable[Dict] = ()) -> 'SubmissionsIndex':
+        """Build the index from a submissions payload and optional older history pages."""
+        return cls([data.get('filings', {}).get('recent', {}), *pages])
+
+    def _entry(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Negated dates ascend as rows go back in time, as np.searchsorted needs
+        return rows, -self._days[rows]
+
+    def __len__(self) -> int:
+        return len(self._days)
+
+    @property
+    def form_types(self) -> List[str]:
+        return sorted(self._forms)
+
+    def _rows(self, form_type: Optional[str], exact: bool) -> Tuple[np.ndarray, np.ndarray]:
+        if form_type is None:
+            return self._all
+        if exact:
+            return self._forms.get(form_type) or self._entry(np.array([], dtype=np.int32))
+
+        # Substring match ("10-K" also finds "10-K/A" and "10-K405"), merged once per query
+        if form_type not in self._matches:
+            rows = [self._forms[form][0] for form in self._forms if form_type in form]
+            merged = np.sort(np.concatenate(rows)) if rows else np.array([], dtype=np.int32)
+            self._matches[form_type] = self._entry(merged)
+        return self._matches[form_type]
+
+    def _row(self, row: int) -> Dict:
+        return {field: self._columns[field][row] for field in FIELDS}
+
+    def filings(self, form_type: Optional[str] = None, limit: Optional[int] = None,
+                start: Optional[str] = None, end: Optional[str] = None, exact: bool = False) -> List[Dict]:
+        """Return filings of a form type, newest first, optionally within [start, end] filing dates.
+
+        form_type matches as a substring of the filing's form unless exact=True.
+        """
+        rows, negated_days = self._rows(form_type, exact)
+        first = int(np.searchsorted(negated_days, -_day(end), 'left')) if end else 0
+        last = int(np.searchsorted(negated_days, -_day(start), 'right')) if start else len(rows)
+        if limit is not None:
+            last = min(last, first + limit)
+        return [self._row(row) for row in rows[first:last]]
+
+    def latest(self, form_type: str, exact: bool = False) -> Optional[Dict]:
+        """Return the most recent filing of a form type, or None."""
+        filings = self.filings(form_type, limit=1, exact=exact)
+        return filings[0] if filings else None
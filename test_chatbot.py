@@ -4,8 +4,11 @@ Test script for the SEC Chatbot functionality.
 Run this to verify all components are working correctly.
 """
 
+import json
 import os
 import sys
+import tempfile
+import time
 from chatbot_service import SECChatbot
 from edgar_client import EdgarClient
 from llm_analyzer import LLMAnalyzer
@@ -37,6 +40,1297 @@ def test_edgar_client():
     
     return True
 
+def test_ticker_index():
+    """Test offline company lookups against the in-memory ticker index."""
+    print("🗂️  Testing Ticker Index...")
+    
+    from ticker_index import TickerIndex
+    
+    sample_tickers = {
+        "0": {"cik_str": 320193, "ticker": "AAPL", "title": "Apple Inc."},
+        "1": {"cik_str": 789019, "ticker": "MSFT", "title": "MICROSOFT CORP"},
+        "2": {"cik_str": 1018724, "ticker": "AMZN", "title": "AMAZON COM INC"},
+        "3": {"cik_str": 6951, "ticker": "AMAT", "title": "APPLIED MATERIALS INC"},
+        "4": {"cik_str": 1067983, "ticker": "BRK-B", "title": "BERKSHIRE HATHAWAY INC"}
+    }
+    index = TickerIndex(lambda: sample_tickers)
+    
+    results = index.search("AAPL")
+    assert results[0]['cik'] == "0000320193" and results[0]['match_score'] == 100
+    
+    results = index.search("Apple")
+    assert [r['ticker'] for r in results] == ["AAPL"]
+    assert results[0]['match_score'] == 90
+    
+    results = index.search("microsoft corp")
+    assert results[0]['ticker'] == "MSFT"
+    
+    # Share classes match however the separator is typed
+    for query in ("BRK-B", "BRK.B", "brk/b"):
+        results = index.search(query)
+        assert results[0]['ticker'] == "BRK-B" and results[0]['match_score'] == 100
+    
+    # Partial word matches fall back to a lower score
+    results = index.search("applied widgets")
+    assert results[0]['ticker'] == "AMAT" and results[0]['match_score'] == 70
+    
+    assert index.search("nonexistent zzz") == []
+    print("✅ Ticker index lookups working")
+    return True
+
+class FakeResponse:
+    """Minimal stand-in for requests.Response used by the offline tests."""
+    
+    def __init__(self, body=b"", status_code=200, headers=None):
+        self.content = body
+        self.status_code = status_code
+        self.headers = headers or {}
+    
+    def json(self):
+        return json.loads(self.content)
+    
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+    
+    def close(self):
+        pass
+    
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"HTTP {self.status_code}")
+
+def test_http_cache():
+    """Test disk caching and conditional revalidation of EDGAR JSON."""
+    print("💾 Testing HTTP Cache...")
+    
+    from http_cache import HttpCache
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = HttpCache(os.path.join(cache_dir, "cache.sqlite"), max_bytes=10_000, max_age=0)
+        
+        class RevalidatingSession:
+            def __init__(self):
+                self.calls = []
+            
+            def get(self, url, headers=None, **kwargs):
+                self.calls.append(headers or {})
+                if (headers or {}).get('If-None-Match') == '"v1"':
+                    return FakeResponse(status_code=304)
+                return FakeResponse(b'{"name": "Apple Inc."}', headers={'ETag': '"v1"'})
+        
+        client = EdgarClient()
+        client.http_cache = cache
+        client.session = RevalidatingSession()
+        
+        url = "https://data.sec.gov/submissions/CIK0000320193.json"
+        assert client._get_json(url) == {"name": "Apple Inc."}
+        # Stale entry is revalidated with its ETag and served from disk on 304
+        assert client._get_json(url) == {"name": "Apple Inc."}
+        assert client.session.calls[1] == {'If-None-Match': '"v1"'}
+        
+        # Fresh entries skip the network entirely
+        cache.max_age = 3600
+        cache.touch(url)
+        client._get_json(url)
+        assert len(client.session.calls) == 2
+        
+        # Least recently used entries are evicted past max_bytes
+        for i in range(5):
+            cache.put(f"https://example.com/{i}", os.urandom(4000))
+        assert cache.stats()['bytes'] <= 10_000
+        assert cache.get("https://example.com/4") is not None
+        assert cache.get(url) is None
+    
+    print("✅ HTTP cache working")
+    return True
+
+SAMPLE_FILING_HTML = b"""<html><head><style>p { color: red; }</style></head><body>
+<p>Apple Inc. Annual Report on Form 10-K</p>
+<p>Item 1. Business</p>
+<p>The Company designs, manufactures and markets smartphones and personal computers.</p>
+<p>Item 1A. Risk Factors</p>
+<p>The Company faces intense competition and supply chain disruptions.</p>
+<p>Item 7. Management's Discussion and Analysis</p>
+<p>Total net sales increased 8% to $394.3 billion during 2023.</p>
+<script>var tracking = "ignored";</script>
+</body></html>"""
+
+def test_filing_extractor():
+    """Test streaming HTML-to-text extraction of filing documents."""
+    print("🧾 Testing Filing Extractor...")
+    
+    from filing_extractor import charset_from_content_type, iter_text_blocks
+    
+    html = (b"<html><body><div style='display:none'><ix:header>dei:Hidden</ix:header></div>"
+            b"<p><span>Item&#160;7.</span> <b>Management's Discussion</b></p>"
+            b"<table><tr><td>Net sales</td><td>$ 383,285</td></tr></table></body></html>")
+    # Feed in tiny chunks to exercise the incremental parser
+    chunks = (html[i:i + 5] for i in range(0, len(html), 5))
+    blocks = list(iter_text_blocks(chunks))
+    assert blocks == ["Item 7. Management's Discussion", "Net sales $ 383,285"]
+    
+    # Non-ASCII text with no declared charset: UTF-8, falling back to Windows-1252 bytes
+    text = "Company\u2019s risk \u2014 \u201cfactors\u201d"
+    for body in (text.encode("utf-8"), text.encode("cp1252")):
+        html = b"<html><body><p>" + body + b"</p></body></html>"
+        assert list(iter_text_blocks(html[i:i + 3] for i in range(0, len(html), 3))) == [text]
+    # A declared charset, or one from the response headers, is honoured
+    html = b'<html><head><meta charset="windows-1252"></head><body><p>' + text.encode("cp1252") + b"</p></body></html>"
+    assert list(iter_text_blocks([html])) == ["Company\u2019s risk \u2014 \u201cfactors\u201d"]
+    assert list(iter_text_blocks([b"<p>caf\xe9</p>"], charset_from_content_type("text/html; charset=ISO-8859-1"))) == ["caf\u00e9"]
+    
+    print("✅ Filing extractor working")
+    return True
+
+def test_section_segmenter():
+    """Test Item segmentation of 10-K and 10-Q text."""
+    print("📑 Testing Section Segmenter...")
+    
+    from section_segmenter import get_section, segment_filing
+    
+    annual = "\n".join([
+        "TABLE OF CONTENTS",
+        "Item 1. Business 4",
+        "Item 1A. Risk Factors 9",
+        "PART I",
+        "Item 1. Business",
+        "The Company designs smartphones.",
+        "Item 1A. Risk Factors",
+        "Competition is intense — pricing pressure may continue.",
+        "PART II",
+        "Item 7. Management's Discussion and Analysis",
+        "Net sales increased. See Item 8 of this report for details.",
+        "ITEM 8. FINANCIAL STATEMENTS",
+        "Total assets were $352.6 billion."
+    ])
+    index = segment_filing(annual)
+    assert [section['key'] for section in index] == ["item_1", "item_1a", "item_7", "item_8"]
+    # Table-of-contents entries are skipped and sections stop at part headings
+    assert get_section(annual, index, "item_1a") == "Item 1A. Risk Factors\nCompetition is intense — pricing pressure may continue."
+    assert annual.encode("utf-8")[index[3]['start']:index[3]['end']].decode("utf-8").endswith("billion.")
+    
+    quarterly = "\n".join([
+        "PART I. FINANCIAL INFORMATION Item 1. Financial Statements",
+        "Condensed balance sheets.",
+        "Item 2. Management's Discussion and Analysis",
+        "Quarterly revenue grew.",
+        "PART II. OTHER INFORMATION",
+        "Item 1. Legal Proceedings",
+        "None.",
+        "Item 1A. Risk Factors",
+        "No material changes."
+    ])
+    keys = [section['key'] for section in segment_filing(quarterly)]
+    assert keys == ["part_1_item_1", "part_1_item_2", "part_2_item_1", "part_2_item_1a"]
+    
+    print("✅ Section segmenter working")
+    return True
+
+def test_filing_cache():
+    """Test that extracted filing text is cached permanently by accession."""
+    print("📄 Testing Filing Cache...")
+    
+    from filing_cache import FilingCache
+    from filing_index import FilingIndexStore
+    
+    class DocumentSession:
+        def __init__(self):
+            self.calls = 0
+        
+        def get(self, url, **kwargs):
+            self.calls += 1
+            return FakeResponse(SAMPLE_FILING_HTML)
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        client = EdgarClient()
+        client.filing_cache = FilingCache(os.path.join(cache_dir, "filings.sqlite"))
+        client.filing_index = FilingIndexStore(os.path.join(cache_dir, "filing_index"))
+        client.session = DocumentSession()
+        
+        content = client.get_filing_content("0000320193", "0000320193-23-000106", "aapl-20230930.htm")
+        assert "Risk Factors" in content
+        assert "tracking" not in content and "color: red" not in content
+        sections = client.get_filing_sections("0000320193", "0000320193-23-000106", "aapl-20230930.htm", ["item_7"])
+        assert sections == {"item_7": "Item 7. Management's Discussion and Analysis\nTotal net sales increased 8% to $394.3 billion during 2023."}
+        
+        # Repeated requests skip both the download and the parse
+        assert client.get_filing_content("0000320193", "000032019323000106", "aapl-20230930.htm") == content
+        assert "$394.3 billion" in client.get_filing_text("0000320193", "0000320193-23-000106", "aapl-20230930.htm")
+        assert client.session.calls == 1
+        assert client.filing_cache.stats()['hits'] == 3
+    
+    print("✅ Filing cache working")
+    return True
+
+def test_filing_index():
+    """Test that a passage index is persisted on first fetch and memory-mapped on load."""
+    print("🗂️ Testing Filing Index...")
+    
+    import numpy as np
+    from filing_cache import FilingCache
+    from filing_index import FilingIndexStore
+    
+    class DocumentSession:
+        def __init__(self):
+            self.calls = 0
+        
+        def get(self, url, **kwargs):
+            self.calls += 1
+            return FakeResponse(SAMPLE_FILING_HTML)
+    
+    args = ("0000320193", "0000320193-23-000106", "aapl-20230930.htm")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        client = EdgarClient()
+        client.filing_cache = FilingCache(os.path.join(cache_dir, "filings.sqlite"))
+        client.filing_index = FilingIndexStore(os.path.join(cache_dir, "filing_index"))
+        client.session = DocumentSession()
+        
+        client.get_filing_content(*args)
+        assert len(os.listdir(os.path.join(cache_dir, "filing_index"))) == 1
+        
+        # A fresh store (e.g. another process) memory-maps the saved arrays
+        client.filing_index = FilingIndexStore(os.path.join(cache_dir, "filing_index"))
+        index = client.get_filing_index(*args)
+        assert isinstance(index.doc_ids, np.memmap)
+        assert client.session.calls == 1
+        
+        doc_id, score = index.search("total net sales", 1)[0]
+        passage = index.passage(doc_id)
+        assert passage["section"] == "item_7" and "$394.3 billion" in passage["text"]
+        assert index.search("nonexistentterm", 5) == []
+        
+        # Follow-up questions read the cached filing once for its text, sections and index
+        reads = []
+        cache_get = client.filing_cache.get
+        client.filing_cache.get = lambda *key: reads.append(key) or cache_get(*key)
+        loaded = client.get_filing_with_index(*args)
+        assert len(reads) == 1 and client.session.calls == 1
+        assert "$394.3 billion" in loaded["text"] and loaded["sections"] and loaded["index"] is index
+        
+        # Once indexed, questions are answered from the retrieved passages without reading the full text
+        from chatbot_service import SECChatbot
+        from llm_cache import ResponseCache
+        
+        prompts = []
+        
+        def fake_post_chat(headers, payload):
+            prompts.append(payload["messages"][1]["content"])
+            return FakeResponse(json.dumps({"choices": [{"message": {"content": "$394.3 billion"}}]}).encode())
+        
+        analyzer = LLMAnalyzer()
+        analyzer.cache = ResponseCache(os.path.join(cache_dir, "llm.sqlite"))
+        analyzer._post_chat = fake_post_chat
+        hashed = []
+        analyzer_key = analyzer._answer_cache_key
+        analyzer._answer_cache_key = lambda *key_args: hashed.append(key_args) or analyzer_key(*key_args)
+        client.get_facts_table = lambda cik: None
+        chatbot = SECChatbot(edgar_client=client, llm_analyzer=analyzer)
+        context = {"company": {"cik": args[0]}, "filing": {"accessionNumber": args[1], "primaryDocument": args[2]}}
+        
+        reads.clear()
+        for _ in range(2):
+            response = chatbot.process_query("What were total net sales?", context)
+            assert response["response"] == "$394.3 billion"
+        assert reads == [] and len(prompts) == 1 and "$394.3 billion" in prompts[0]
+        # The answer cache is keyed by the filing, once per question
+        assert [key_args[0] for key_args in hashed] == [None, None]
+        assert all(key_args[2] == f"{args[1]}/{args[2]}" for key_args in hashed)
+    
+    print("✅ Filing index working")
+    return True
+
+def test_bulk_ingest():
+    """Test that bulk archives are ingested so EdgarClient is served locally."""
+    print("📦 Testing Bulk Ingest...")
+    
+    import zipfile
+    from bulk_ingest import ingest
+    from http_cache import HttpCache
+    from xbrl_facts import FactsStore
+    
+    submissions = {
+        "cik": "320193",
+        "name": "Apple Inc.",
+        "tickers": ["AAPL"],
+        "filings": {
+            "recent": {
+                "form": ["10-Q", "10-K", "8-K"],
+                "filingDate": ["2024-02-02", "2023-11-03", "2023-08-01"],
+                "accessionNumber": ["0000320193-24-000006", "0000320193-23-000106", "0000320193-23-000077"],
+                "primaryDocument": ["aapl-20231230.htm", "aapl-20230930.htm", "aapl-8k.htm"]
+            },
+            "files": [{"name": "CIK0000320193-submissions-001.json"}]
+        }
+    }
+    companyfacts = {"cik": 320193, "entityName": "Apple Inc.", "facts": {"us-gaap": {"NetIncomeLoss": {"units": {"USD": [
+        {"start": "2022-09-25", "end": "2023-09-30", "val": 96995000000, "fy": 2023, "fp": "FY", "form": "10-K", "accn": "0000320193-23-000106", "filed": "2023-11-03"}
+    ]}}}}}
+    
+    class OfflineSession:
+        def get(self, url, **kwargs):
+            raise AssertionError(f"unexpected request to {url}")
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        facts_zip = os.path.join(cache_dir, "companyfacts.zip")
+        submissions_zip = os.path.join(cache_dir, "submissions.zip")
+        with zipfile.ZipFile(facts_zip, "w") as archive:
+            archive.writestr("CIK0000320193.json", json.dumps(companyfacts))
+            archive.writestr("CIK0000789019.json", json.dumps(companyfacts))
+        with zipfile.ZipFile(submissions_zip, "w") as archive:
+            archive.writestr("CIK0000320193.json", json.dumps(submissions))
+            archive.writestr("CIK0000320193-submissions-001.json", json.dumps({"form": ["10-K"]}))
+        
+        http_cache = HttpCache(os.path.join(cache_dir, "http.sqlite"))
+        facts_store = FactsStore(os.path.join(cache_dir, "facts"))
+        results = ingest(facts_zip, submissions_zip, ciks=["320193"], http_cache=http_cache, facts_store=facts_store)
+        assert results["companyfacts"]["documents"] == 1 and results["companyfacts"]["tables"] == 1
+        assert results["submissions"]["documents"] == 2
+        
+        client = EdgarClient()
+        client.http_cache = http_cache
+        client.facts_store = facts_store
+        client.session = OfflineSession()
+        
+        assert client.get_company_overview("0000320193")["latest_10k"]["accession"] == "0000320193-23-000106"
+        assert client.get_recent_filings("0000320193", "10-K")[0]["primaryDocument"] == "aapl-20230930.htm"
+        assert client.get_company_facts("0000320193")["entityName"] == "Apple Inc."
+        assert client.get_facts_table("0000320193").latest("NetIncomeLoss")["value"] == 96995000000.0
+    
+    print("✅ Bulk ingest working")
+    return True
+
+def test_submissions_index():
+    """Test the form-type index shared by get_recent_filings and get_company_overview."""
+    print("🗃️ Testing Submissions Index...")
+    
+    from submissions_index import SubmissionsIndex
+    
+    recent = {
+        "form": ["10-Q", "8-K", "10-K/A", "10-K", "10-Q", "10-Q", "NT 10-K"],
+        "filingDate": ["2024-02-02", "2024-01-15", "2023-12-01", "2023-11-03", "2023-08-04", "2023-05-05", "2023-01-03"],
+        "reportDate": ["2023-12-30", "", "2023-09-30", "2023-09-30", "2023-07-01", "2023-04-01", ""],
+        "accessionNumber": [f"acc-{i}" for i in range(7)],
+        "primaryDocument": [f"doc-{i}.htm" for i in range(7)]
+    }
+    older = {
+        "form": ["10-K", "10-Q"],
+        "filingDate": ["2022-10-28", "2022-07-29"],
+        "accessionNumber": ["acc-old-0", "acc-old-1"],
+        "primaryDocument": ["old-0.htm", "old-1.htm"]
+    }
+    index = SubmissionsIndex.from_submissions({"filings": {"recent": recent}}, [older])
+    assert len(index) == 9
+    
+    # Substring semantics of the old scan are kept: "10-K" matches amendments and NT filings
+    assert [f["accessionNumber"] for f in index.filings("10-K")] == ["acc-2", "acc-3", "acc-6", "acc-old-0"]
+    assert index.latest("10-K", exact=True)["accessionNumber"] == "acc-3"
+    assert [f["accessionNumber"] for f in index.filings("10-Q", limit=2)] == ["acc-0", "acc-4"]
+    in_2023 = index.filings("10-Q", start="2023-01-01", end="2023-12-31")
+    assert [f["filingDate"] for f in in_2023] == ["2023-08-04", "2023-05-05"]
+    assert index.filings("S-1") == [] and index.latest("S-1") is None
+    
+    class SubmissionsSession:
+        def __init__(self):
+            self.calls = 0
+        
+        def get(self, url, **kwargs):
+            self.calls += 1
+            return FakeResponse(json.dumps({"name": "Apple Inc.", "filings": {"recent": recent}}).encode())
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        from http_cache import HttpCache
+        
+        client = EdgarClient()
+        client.http_cache = HttpCache(os.path.join(cache_dir, "http.sqlite"))
+        client.session = SubmissionsSession()
+        
+        overview = client.get_company_overview("0000320193")
+        assert overview["latest_10k"]["accession"] == "acc-3" and overview["latest_10q"]["accession"] == "acc-0"
+        assert [f["accessionNumber"] for f in client.get_recent_filings("0000320193", "10-Q")] == ["acc-0", "acc-4", "acc-5"]
+        assert client.session.calls == 1
+    
+    print("✅ Submissions index working")
+    return True
+
+def test_filing_history():
+    """Test the filing history iterator and its parallel prefetch of older pages."""
+    print("🕰️ Testing Filing History...")
+    
+    import threading
+    from http_cache import HttpCache
+    from rate_limiter import TokenBucket
+    
+    def page(year):
+        return {
+            "form": ["10-K", "10-Q", "8-K"],
+            "filingDate": [f"{year}-11-01", f"{year}-08-01", f"{year}-03-01"],
+            "accessionNumber": [f"{year}-k", f"{year}-q", f"{year}-8k"],
+            "primaryDocument": ["k.htm", "q.htm", "8k.htm"]
+        }
+    
+    names = {f"CIK0000320193-submissions-00{i}.json": year for i, year in enumerate([2022, 2021, 2020, 2019], 1)}
+    submissions = {"filings": {
+        "recent": page(2023),
+        "files": [{"name": name, "filingFrom": f"{year}-01-01", "filingTo": f"{year}-12-31"} for name, year in names.items()]
+    }}
+    
+    class HistorySession:
+        def __init__(self):
+            self.lock = threading.Lock()
+            self.active = 0
+            self.max_active = 0
+            self.urls = []
+        
+        def get(self, url, **kwargs):
+            name = url.rsplit("/", 1)[-1]
+            with self.lock:
+                self.urls.append(name)
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+            time.sleep(0.05)
+            with self.lock:
+                self.active -= 1
+            body = page(names[name]) if name in names else submissions
+            return FakeResponse(json.dumps(body).encode())
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        client = EdgarClient()
+        client.http_cache = HttpCache(os.path.join(cache_dir, "http.sqlite"))
+        client.rate_limiter = TokenBucket(1000)
+        client.session = HistorySession()
+        
+        annual = list(client.get_filing_history("0000320193", "10-K"))
+        assert [f["accessionNumber"] for f in annual] == ["2023-k", "2022-k", "2021-k", "2020-k", "2019-k"]
+        assert client.session.max_active > 1
+        
+        # Pages outside the date range are never requested; repeat pages come from the cache
+        client.session.urls.clear()
+        window = list(client.get_filing_history("0000320193", "10-Q", start="2020-06-01", end="2021-12-31"))
+        assert [f["accessionNumber"] for f in window] == ["2021-q", "2020-q"]
+        assert client.session.urls == []
+        
+        # Older pages download while the caller is still handling the recent rows
+        client.http_cache = HttpCache(os.path.join(cache_dir, "http-cold.sqlite"))
+        client.session = HistorySession()
+        history = client.get_filing_history("0000320193", "10-K")
+        assert next(history)["accessionNumber"] == "2023-k"
+        time.sleep(0.03)
+        assert set(names) <= set(client.session.urls)
+        history.close()
+    
+    print("✅ Filing history working")
+    return True
+
+def test_async_edgar_client():
+    """Test that the async client fetches facts and the filing document concurrently."""
+    print("⚡ Testing Async EDGAR Client...")
+    
+    import asyncio
+    import threading
+    from async_edgar_client import AsyncEdgarClient
+    from filing_cache import FilingCache
+    from http_cache import HttpCache
+    from ticker_index import TickerIndex
+    
+    submissions = {
+        "name": "Apple Inc.",
+        "tickers": ["AAPL"],
+        "filings": {"recent": {
+            "form": ["10-Q", "10-K"],
+            "filingDate": ["2024-02-02", "2023-11-03"],
+            "accessionNumber": ["0000320193-24-000006", "0000320193-23-000106"],
+            "primaryDocument": ["aapl-20231230.htm", "aapl-20230930.htm"]
+        }}
+    }
+    # Both slow fetches must be in flight at the same time to pass the barrier
+    barrier = threading.Barrier(2, timeout=5)
+    
+    class StandInSession:
+        def get(self, url, **kwargs):
+            if "companyfacts" in url:
+                barrier.wait()
+                return FakeResponse(b'{"cik": 320193, "facts": {}}')
+            if "Archives" in url:
+                barrier.wait()
+                return FakeResponse(SAMPLE_FILING_HTML)
+            return FakeResponse(json.dumps(submissions).encode())
+        
+        def mount(self, prefix, adapter):
+            pass
+        
+        def close(self):
+            pass
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        client = EdgarClient()
+        client.session = StandInSession()
+        client.http_cache = HttpCache(os.path.join(cache_dir, "cache.sqlite"))
+        client.filing_cache = FilingCache(os.path.join(cache_dir, "filings.sqlite"))
+        client.ticker_index = TickerIndex(lambda: {"0": {"cik_str": 320193, "ticker": "AAPL", "title": "Apple Inc."}})
+        
+        async_client = AsyncEdgarClient(client, max_connections=4)
+        try:
+            results = asyncio.run(async_client.search_and_analyze("Apple"))
+        finally:
+            async_client.close()
+    
+    assert results['error'] is None
+    assert results['selected_filing']['accessionNumber'] == "0000320193-23-000106"
+    assert results['overview']['name'] == "Apple Inc."
+    assert results['facts']['cik'] == 320193
+    assert "Risk Factors" in results['content']
+    
+    print("✅ Async EDGAR client working")
+    return True
+
+def test_rate_limiter():
+    """Test request pacing and Retry-After handling for EDGAR requests."""
+    print("🚦 Testing Rate Limiter...")
+    
+    from rate_limiter import TokenBucket
+    
+    now = [0.0]
+    sent_at = []
+    
+    def fake_sleep(seconds):
+        now[0] += seconds
+    
+    bucket = TokenBucket(10, clock=lambda: now[0], sleep=fake_sleep)
+    for _ in range(5):
+        bucket.acquire()
+        sent_at.append(now[0])
+    # Requests are spaced evenly at 1 / rate instead of bursting
+    assert [round(t, 6) for t in sent_at] == [0.0, 0.1, 0.2, 0.3, 0.4]
+    
+    bucket.pause(2)
+    bucket.acquire()
+    assert round(now[0], 6) == 2.4
+    
+    class ThrottledSession:
+        def __init__(self):
+            self.calls = 0
+        
+        def get(self, url, **kwargs):
+            self.calls += 1
+            if self.calls == 1:
+                return FakeResponse(status_code=429, headers={'Retry-After': '3'})
+            return FakeResponse(b'{}')
+    
+    client = EdgarClient()
+    client.rate_limiter = TokenBucket(10, clock=lambda: now[0], sleep=fake_sleep)
+    client.session = ThrottledSession()
+    started = now[0]
+    assert client._request("https://data.sec.gov/submissions/CIK0000320193.json").status_code == 200
+    assert client.session.calls == 2 and now[0] - started >= 3
+    
+    class ForbiddenSession:
+        def __init__(self, body):
+            self.body = body
+            self.calls = 0
+        
+        def get(self, url, **kwargs):
+            self.calls += 1
+            return FakeResponse(self.body, status_code=403 if self.calls == 1 else 200)
+    
+    # A bare 403 fails at once; SEC's rate-limit page is retried
+    client.session = ForbiddenSession(b"<html>Access Denied</html>")
+    assert client._request("https://www.sec.gov/Archives/edgar/data/320193/").status_code == 403
+    assert client.session.calls == 1
+    client.session = ForbiddenSession(b"<html><h1>Your Request Originates from an Undeclared Automated Tool</h1>"
+                                      b"<p>Request Rate Threshold Exceeded</p></html>")
+    assert client._request("https://www.sec.gov/Archives/edgar/data/320193/").status_code == 200
+    assert client.session.calls == 2
+    
+    print("✅ Rate limiter working")
+    return True
+
+def test_single_flight():
+    """Test that concurrent identical calls share one underlying call."""
+    print("🛫 Testing Single Flight...")
+    
+    import threading
+    from single_flight import SingleFlight
+    
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+    
+    def fetch(url):
+        calls.append(url)
+        release.wait(5)
+        return {"url": url}
+    
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("submissions", fetch, "CIK0000320193.json")))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    
+    # Release the leader only once every other caller is waiting on it
+    deadline = time.time() + 5
+    while flight.coalesced < 4 and time.time() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    
+    assert calls == ["CIK0000320193.json"]
+    assert results == [{"url": "CIK0000320193.json"}] * 5
+    assert flight.stats() == {'calls': 1, 'coalesced': 4}
+    
+    print("✅ Single flight working")
+    return True
+
+def test_llm_response_cache():
+    """Test that repeated LLM requests are served from the response cache."""
+    print("🧠 Testing LLM Response Cache...")
+    
+    from llm_cache import ResponseCache
+    
+    completion = {
+        "choices": [{"message": {"content": "Revenue was $394.3 billion."}}],
+        "usage": {"total_tokens": 1200}
+    }
+    posted = []
+    
+    def fake_post_chat(headers, payload):
+        posted.append(payload)
+        return FakeResponse(json.dumps(completion).encode())
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        analyzer = LLMAnalyzer()
+        analyzer.cache = ResponseCache(os.path.join(cache_dir, "llm.sqlite"))
+        analyzer._post_chat = fake_post_chat
+        
+        document = "Apple Inc. total net sales were $394.3 billion in fiscal 2023."
+        assert analyzer.answer_question(document, "What was Apple's revenue?") == "Revenue was $394.3 billion."
+        # Whitespace, case and trailing punctuation do not defeat the exact-match path
+        assert analyzer.answer_question(document, "what was apple's  revenue") == "Revenue was $394.3 billion."
+        assert len(posted) == 1
+        
+        analyzer.analyze_document(document, "comprehensive")
+        assert analyzer.analyze_document(document, "comprehensive")["raw_analysis"] == "Revenue was $394.3 billion."
+        assert len(posted) == 2
+        
+        stats = analyzer.cache_stats()
+        assert stats['hits'] == 2 and stats['saved_tokens'] == 2400
+        
+        # Entries persist for other processes and expire after the TTL
+        key = next(iter(analyzer.cache._memory))
+        assert ResponseCache(analyzer.cache.path).get(key) == "Revenue was $394.3 billion."
+        assert ResponseCache(analyzer.cache.path, ttl=-1).get(key) is None
+    
+    print("✅ LLM response cache working")
+    return True
+
+def test_streaming_responses():
+    """Test SSE streaming from the analyzer through SECChatbot.process_query."""
+    print("📡 Testing Streaming Responses...")
+    
+    from llm_cache import ResponseCache
+    
+    events = [
+        ": OPENROUTER PROCESSING",
+        'data: {"choices": [{"delta": {"content": "Revenue was "}}]}',
+        "",
+        'data: {"choices": [{"delta": {"content": "$394.3 billion."}}], "usage": {"total_tokens": 900}}',
+        "data: [DONE]"
+    ]
+    
+    class StreamingResponse(FakeResponse):
+        def iter_lines(self, decode_unicode=False):
+            return iter(events)
+    
+    posted = []
+    
+    class StreamingSession:
+        def post(self, url, **kwargs):
+            posted.append(kwargs["json"])
+            return StreamingResponse()
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        analyzer = LLMAnalyzer()
+        analyzer.session = StreamingSession()
+        analyzer.cache = ResponseCache(os.path.join(cache_dir, "llm.sqlite"))
+        chatbot = SECChatbot()
+        chatbot.llm_analyzer = analyzer
+        
+        context = {"content": "Apple Inc. total net sales were $394.3 billion."}
+        response = chatbot.process_query("What was the revenue?", context, stream=True)
+        assert list(response["stream"]) == ["Revenue was ", "$394.3 billion."]
+        assert posted[0]["stream"] is True
+        assert response["response"] == "Revenue was $394.3 billion."
+        assert response["data"]["answer"] == "Revenue was $394.3 billion."
+        
+        # The completed stream is cached for the blocking path too
+        assert analyzer.answer_question(context["content"], "What was the revenue?") == "Revenue was $394.3 billion."
+        assert len(posted) == 1
+        
+        # Empty or cut-off streams are not cached, so the next call asks the model again
+        events[:] = ["data: [DONE]"]
+        assert list(analyzer.stream_answer(context["content"], "Any risks?")) == []
+        events[:] = ['data: {"choices": [{"delta": {"content": "Supply "}}]}']
+        assert list(analyzer.stream_answer(context["content"], "Any risks?")) == ["Supply "]
+        _, cache_key = analyzer._answer_cache_key(context["content"], "Any risks?")
+        assert analyzer.cache.get(cache_key) is None and len(posted) == 3
+    
+    print("✅ Streaming responses working")
+    return True
+
+def test_llm_session():
+    """Test that OpenRouter calls reuse pooled keep-alive connections across analyzers."""
+    print("🔌 Testing LLM Session Pooling...")
+    
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    
+    class ChatHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            body = json.dumps({"choices": [{"message": {"content": "ok"}}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ChatHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        first, second = LLMAnalyzer(), LLMAnalyzer()
+        assert first.session is second.session
+        for analyzer in (first, second):
+            analyzer.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        
+        for i, analyzer in enumerate([first, second, first]):
+            response = analyzer._post_chat(analyzer.headers, {"model": "test", "messages": [], "n": i})
+            assert response.json()["choices"][0]["message"]["content"] == "ok"
+        
+        stats = first.connection_stats()
+        assert stats["requests"] == 3 and stats["connections_opened"] == 1
+        assert stats["connections_reused"] == 2
+    finally:
+        server.shutdown()
+        server.server_close()
+    
+    print("✅ LLM session pooling working")
+    return True
+
+def test_retrieval():
+    """Test section-aware chunking, BM25 ranking and retrieval-based answers."""
+    print("🔎 Testing Retrieval...")
+    
+    from llm_cache import ResponseCache
+    from retrieval import Retriever, chunk_document
+    from section_segmenter import segment_filing
+    
+    filler = "\n".join(f"General business discussion paragraph number {i} about products and services." for i in range(400))
+    text = (
+        "Item 1. Business\n" + filler + "\n"
+        "Item 1A. Risk Factors\nSupply chain disruption in Asia could materially harm manufacturing.\n"
+        "Item 7. Management's Discussion and Analysis\nTotal net sales were $394.3 billion in fiscal 2022.\n"
+    )
+    index = segment_filing(text)
+    chunks = chunk_document(text, index, chunk_size=500)
+    assert {chunk["section"] for chunk in chunks} == {"item_1", "item_1a", "item_7"}
+    assert all(len(chunk["text"]) <= 500 for chunk in chunks)
+    
+    passages = Retriever(text, index).retrieve("What were total net sales?", k=1)
+    assert passages[0]["section"] == "item_7" and "$394.3 billion" in passages[0]["text"]
+    
+    prompts = []
+    
+    def fake_post_chat(headers, payload):
+        prompts.append(payload["messages"][1]["content"])
+        return FakeResponse(json.dumps({"choices": [{"message": {"content": "$394.3 billion"}}]}).encode())
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        analyzer = LLMAnalyzer()
+        analyzer.cache = ResponseCache(os.path.join(cache_dir, "llm.sqlite"))
+        analyzer._post_chat = fake_post_chat
+        assert analyzer.answer_question(text, "What were total net sales?", index) == "$394.3 billion"
+    
+    # The passage deep in the filing is sent instead of the first 6000 characters
+    assert "$394.3 billion" in prompts[0] and "[Item 7]" in prompts[0]
+    assert len(text) > 6000
+    
+    print("✅ Retrieval working")
+    return True
+
+def test_xbrl_facts():
+    """Test the columnar XBRL facts table and numeric answers without the LLM."""
+    print("🧮 Testing XBRL Facts...")
+    
+    from xbrl_facts import FactsStore, FactsTable
+    
+    def fact(start, end, val, fy, fp, form, accn, filed):
+        return {"start": start, "end": end, "val": val, "fy": fy, "fp": fp, "form": form, "accn": accn, "filed": filed}
+    
+    companyfacts = {
+        "cik": 320193,
+        "entityName": "Apple Inc.",
+        "facts": {"us-gaap": {
+            "SalesRevenueNet": {"units": {"USD": [
+                fact("2019-09-29", "2020-09-26", 274515000000, 2020, "FY", "10-K", "a-2020", "2020-10-30")
+            ]}},
+            "RevenueFromContractWithCustomerExcludingAssessedTax": {"units": {"USD": [
+                fact("2020-09-27", "2021-09-25", 365817000000, 2021, "FY", "10-K", "a-2021", "2021-10-29"),
+                # Comparative repeated in the next 10-K carries that filing's fy
+                fact("2020-09-27", "2021-09-25", 365817000000, 2022, "FY", "10-K", "a-2022", "2022-10-28"),
+                fact("2021-09-26", "2022-09-24", 394328000000, 2022, "FY", "10-K", "a-2022", "2022-10-28"),
+                fact("2022-12-25", "2023-04-01", 94836000000, 2023, "Q2", "10-Q", "a-2023q2", "2023-05-05")
+            ]}},
+            "NetIncomeLoss": {"units": {"USD": [
+                fact("2020-09-27", "2021-09-25", 94680000000, 2021, "FY", "10-K", "a-2021", "2021-10-29"),
+                fact("2021-09-26", "2022-09-24", 99803000000, 2022, "FY", "10-K", "a-2022", "2022-10-28")
+            ]}},
+            "Assets": {"units": {"USD": [
+                {"end": "2022-09-24", "val": 352755000000, "fy": 2022, "fp": "FY", "form": "10-K", "accn": "a-2022", "filed": "2022-10-28"}
+            ]}}
+        }}
+    }
+    
+    table = FactsTable.from_companyfacts(companyfacts)
+    assert len(table) == 8
+    revenue = ["Revenues", "RevenueFromContractWithCustomerExcludingAssessedTax", "SalesRevenueNet"]
+    assert table.by_fiscal_year(revenue, "USD") == {2020: 274515000000.0, 2021: 365817000000.0, 2022: 394328000000.0}
+    latest = table.latest("NetIncomeLoss")
+    assert latest["value"] == 99803000000.0 and latest["end"] == "2022-09-24" and latest["accession"] == "a-2022"
+    assert table.latest("Assets", "USD", annual=True)["value"] == 352755000000.0
+    assert table.latest("Goodwill") is None
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        store = FactsStore(cache_dir)
+        store.put("0000320193", table)
+        reloaded = FactsStore(cache_dir).get("320193")
+        assert reloaded.entity_name == "Apple Inc."
+        assert reloaded.by_fiscal_year(revenue, "USD") == table.by_fiscal_year(revenue, "USD")
+        
+        # A company with no facts is still a memory hit, not a disk read
+        empty = FactsTable.from_companyfacts({"cik": 1, "entityName": "Shell Co", "facts": {}})
+        store.put("1", empty)
+        load = FactsTable.__dict__["load"]
+        FactsTable.load = staticmethod(lambda path: None)
+        try:
+            assert store.get("1") is empty
+        finally:
+            FactsTable.load = load
+        
+        chatbot = SECChatbot()
+        chatbot.edgar_client.facts_store = FactsStore(os.path.join(cache_dir, "fresh"))
+        chatbot.edgar_client.get_company_facts = lambda cik: companyfacts
+        chatbot.llm_analyzer = None
+        context = {"company": {"cik": "0000320193", "title": "Apple Inc."}}
+        
+        response = chatbot.process_query("What was the net income?", context)
+        assert "$99.8 billion" in response["response"]
+        response = chatbot.process_query("What was revenue by year?", context)
+        assert list(response["data"]["series"]) == [2020, 2021, 2022]
+        assert "FY2022: $394.3 billion" in response["response"]
+        response = chatbot.process_query("What was Apple's revenue in fiscal 2021?", context)
+        assert response["data"]["value"] == 365817000000.0 and "$365.8 billion" in response["response"]
+        
+        # Anything but a direct figure question about the company in context goes to the filing
+        for question in ("How is revenue broken down by segment?", "What are the main sources of revenue?",
+                         "What was Microsoft's net income?", "Why did net income rise?"):
+            response = chatbot.process_query(question, context)
+            assert "📊" not in response["response"] and "metric" not in response["data"], question
+    
+    print("✅ XBRL facts working")
+    return True
+
+def test_map_reduce_analysis():
+    """Test map-reduce analysis over whole sections with a bounded worker pool."""
+    print("🗺️ Testing Map-Reduce Analysis...")
+    
+    import threading
+    import config
+    from llm_cache import ResponseCache
+    
+    risks = "\n".join(f"Risk factor {i}: exposure number {i} could affect results." for i in range(600))
+    sections = {"item_1a": risks + "\nFinal risk: tariffs on imported components.", "item_7": "Total net sales were $394.3 billion."}
+    
+    lock = threading.Lock()
+    state = {"active": 0, "max_active": 0}
+    prompts = []
+    
+    def fake_post_chat(headers, payload):
+        prompt = payload["messages"][1]["content"]
+        with lock:
+            prompts.append(prompt)
+            state["active"] += 1
+            state["max_active"] = max(state["max_active"], state["active"])
+        time.sleep(0.02)
+        with lock:
+            state["active"] -= 1
+        if "Extract the key points" in prompt:
+            note = "- Tariffs on imported components" if "tariffs" in prompt else "- Net sales $394.3 billion" if "$394.3" in prompt else "None"
+        else:
+            note = "Overview: risks include tariffs; net sales were $394.3 billion."
+        return FakeResponse(json.dumps({"choices": [{"message": {"content": note}}]}).encode())
+    
+    saved = (config.ANALYSIS_CHUNK_CHARS, config.ANALYSIS_CONCURRENCY)
+    config.ANALYSIS_CHUNK_CHARS, config.ANALYSIS_CONCURRENCY = 5000, 2
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            analyzer = LLMAnalyzer()
+            analyzer.cache = ResponseCache(os.path.join(cache_dir, "llm.sqlite"))
+            analyzer._post_chat = fake_post_chat
+            
+            analysis = analyzer.analyze_document("preview", "comprehensive", sections=sections, map_reduce=True)
+    finally:
+        config.ANALYSIS_CHUNK_CHARS, config.ANALYSIS_CONCURRENCY = saved
+    
+    map_prompts = [p for p in prompts if "Extract the key points" in p]
+    assert len(map_prompts) == len(prompts) - 1 > 3
+    assert 1 < state["max_active"] <= 2
+    
+    # The reduce prompt sees notes from the end of a section a 4000-character prefix would cut off
+    reduce_prompt = prompts[-1]
+    assert "Tariffs on imported components" in reduce_prompt and "[Item 7]" in reduce_prompt
+    assert "Risk factor 1:" not in reduce_prompt
+    assert "tariffs" in analysis["raw_analysis"]
+    
+    print("✅ Map-reduce analysis working")
+    return True
+
+def test_token_budget():
+    """Test local token counting and packing sections into a prompt budget."""
+    print("🔢 Testing Token Budget...")
+    
+    import config
+    from token_budget import count_tokens, pack_sections, truncate_to_tokens
+    
+    sentence = "Total net sales were $394.3 billion in fiscal 2022."
+    assert 8 <= count_tokens(sentence) <= 20
+    assert count_tokens(sentence * 10) > count_tokens(sentence)
+    
+    prefix = truncate_to_tokens(sentence * 50, 40)
+    assert sentence.startswith(prefix[:len(sentence)]) and count_tokens(prefix) <= 40
+    assert truncate_to_tokens(sentence, 1000) == sentence
+    
+    short = "Item 7. Net sales were $394.3 billion."
+    long_risks = "Item 1A. " + "Competition could reduce margins. " * 500
+    packed = pack_sections([long_risks, short], 300)
+    assert short in packed and count_tokens(packed) <= 300
+    # With too little budget for both, the less valuable (later) section is dropped
+    assert pack_sections([long_risks, short], 150) == truncate_to_tokens(long_risks, 150)
+    
+    saved = config.LLM_DOCUMENT_TOKENS
+    config.LLM_DOCUMENT_TOKENS = 500
+    try:
+        analyzer = LLMAnalyzer()
+        prompt = analyzer.create_analysis_prompt("x", "risks", sections={"item_1a": long_risks})
+        assert 500 <= count_tokens(prompt) <= 500 + 400
+    finally:
+        config.LLM_DOCUMENT_TOKENS = saved
+    
+    print("✅ Token budget working")
+    return True
+
+def test_company_comparison():
+    """Test concurrent fetching, local metrics and a single LLM call when comparing companies."""
+    print("⚖️ Testing Company Comparison...")
+    
+    import asyncio
+    import threading
+    from llm_cache import ResponseCache
+    from xbrl_facts import FactsTable, company_metrics, format_metrics_table
+    
+    def annual(values):
+        return {"units": {"USD": [
+            {"start": f"{year - 1}-01-01", "end": f"{year - 1}-12-31", "val": value, "fy": year, "fp": "FY",
+             "form": "10-K", "accn": f"a-{year}", "filed": f"{year}-02-01"}
+            for year, value in values.items()
+        ]}}
+    
+    companies = {
+        "Apple": ("0000320193", {2023: 400e9, 2024: 420e9}, {2024: 100e9}),
+        # Microsoft has already reported a year the others have not
+        "Microsoft": ("0000789019", {2023: 200e9, 2024: 240e9, 2025: 300e9}, {2024: 80e9, 2025: 90e9}),
+        "Tesla": ("0001318605", {2023: 90e9, 2024: 99e9}, {2024: 9e9})
+    }
+    # Every filing download must be in flight at once to pass the barrier
+    barrier = threading.Barrier(3, timeout=5)
+    
+    class StandInSession:
+        def mount(self, prefix, adapter):
+            pass
+    
+    def search_company(name):
+        cik = companies[name][0]
+        return [{"cik": cik, "ticker": name[:4].upper(), "title": f"{name} Inc."}]
+    
+    def load_filing(cik, accession_number, primary_document):
+        barrier.wait()
+        return {"text": f"Filing of {cik}", "content": f"Risk Factors of {cik}", "sections": []}
+    
+    def facts_table(cik):
+        name = next(name for name, (company_cik, _, _) in companies.items() if company_cik == cik)
+        _, revenue, income = companies[name]
+        return FactsTable.from_companyfacts({"entityName": name, "facts": {"us-gaap": {
+            "Revenues": annual(revenue), "NetIncomeLoss": annual(income)
+        }}})
+    
+    client = EdgarClient()
+    client.session = StandInSession()
+    client.search_company = search_company
+    client.get_recent_filings = lambda cik, form_type="10-K": [{"accessionNumber": f"{cik}-24", "primaryDocument": "10k.htm"}]
+    client._load_filing = load_filing
+    client.get_facts_table = facts_table
+    client.get_filing_sections = lambda cik, accession, document, keys=None: {"item_1a": f"Risks of {cik}"}
+    
+    prompts = []
+    
+    def fake_post_chat(headers, payload):
+        prompts.append(payload["messages"][1]["content"])
+        comparison = {"comparison_summary": "Apple leads on scale.", "winner": "Apple Inc."}
+        return FakeResponse(json.dumps({"choices": [{"message": {"content": json.dumps(comparison)}}]}).encode())
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        chatbot = SECChatbot()
+        chatbot.edgar_client = client
+        chatbot.llm_analyzer = LLMAnalyzer()
+        chatbot.llm_analyzer.cache = ResponseCache(os.path.join(cache_dir, "llm.sqlite"))
+        chatbot.llm_analyzer._post_chat = fake_post_chat
+        
+        assert chatbot._extract_company_names("Compare Apple's revenue, Microsoft and Tesla") == ["Apple", "Microsoft", "Tesla"]
+        # The first company may come before the verb
+        assert chatbot._extract_company_names("How does Apple compare to Microsoft?") == ["Apple", "Microsoft"]
+        assert chatbot._extract_company_names("Can you compare Apple with Tesla") == ["Apple", "Tesla"]
+        response = chatbot.process_query("Compare Apple, Microsoft and Tesla")
+        
+        # Also callable from code already running an event loop, e.g. an async handler
+        async def handler():
+            return chatbot.process_query("Compare Apple, Microsoft and Tesla")
+        
+        from_loop = asyncio.run(handler())
+        assert from_loop["error"] is None and from_loop["data"]["metrics"] == response["data"]["metrics"]
+    
+    assert response["error"] is None and response["intent"] == "compare_companies"
+    assert len(prompts) == 1
+    # The model sees the locally computed figures and each company's excerpt
+    assert "$420.0 billion" in prompts[0] and "20.0%" in prompts[0] and "Risks of 0001318605" in prompts[0]
+    metrics = {metric["company"]: metric for metric in response["data"]["metrics"]}
+    assert response["data"]["fiscal_year"] == 2023
+    assert {metric["fiscal_year"] for metric in metrics.values()} == {2023}
+    assert "$300.0 billion" not in prompts[0] and "fiscal year 2023" in response["response"]
+    assert abs(metrics["Microsoft Inc."]["ratios"]["Revenue Growth"] - 0.2) < 1e-9
+    assert abs(metrics["Tesla Inc."]["ratios"]["Net Margin"] - 9 / 99) < 1e-9
+    assert "| Apple Inc. | 2023 |" in response["response"] and "Apple leads on scale." in response["response"]
+    
+    # A company missing the common year falls back to its latest, marked in the table
+    fallback = company_metrics(facts_table("0001318605"), 2021)
+    assert fallback["fiscal_year"] == 2023 and fallback["year_differs"]
+    assert "| Tesla | 2023* |" in format_metrics_table([fallback])
+    
+    print("✅ Company comparison working")
+    return True
+
+def test_shared_chatbot_sessions():
+    """Test that session chatbots share clients but keep their own conversation history."""
+    print("🤝 Testing Shared Chatbot Sessions...")
+    
+    shared = SECChatbot(llm_analyzer=LLMAnalyzer())
+    first = shared.for_session()
+    second = shared.for_session()
+    
+    assert first.edgar_client is second.edgar_client is shared.edgar_client
+    assert first.llm_analyzer is second.llm_analyzer is shared.llm_analyzer
+    # One worker pool for concurrent EDGAR fetches per process, not per session
+    assert first.async_edgar_client is second.async_edgar_client is shared.async_edgar_client
+    
+    first.process_query("Hello, how can you help me?")
+    assert len(first.get_conversation_history()) == 1
+    assert second.get_conversation_history() == [] and shared.get_conversation_history() == []
+    
+    print("✅ Shared chatbot sessions working")
+    return True
+
+def test_progress_events():
+    """Test that process_query reports each stage as it starts, with per-stage timings."""
+    print("⏱️ Testing Progress Events...")
+    
+    from llm_cache import ResponseCache
+    
+    def load_filing(cik, accession_number, primary_document):
+        time.sleep(0.05)
+        return {"text": "Item 1A. Risk Factors", "content": "Risk Factors", "sections": []}
+    
+    client = EdgarClient()
+    client.search_company = lambda name: [{"cik": "0000320193", "ticker": "AAPL", "title": "Apple Inc."}]
+    client.get_recent_filings = lambda cik, form_type="10-K": [{"accessionNumber": "a-1", "primaryDocument": "10k.htm"}]
+    client._load_filing = load_filing
+    # The analysis uses the sections cut from the filing search_and_analyze loaded, not a second read
+    client.get_filing_sections = None
+    
+    def fake_post_chat(headers, payload):
+        return FakeResponse(json.dumps({"choices": [{"message": {"content": "Apple faces supply chain risks."}}]}).encode())
+    
+    events = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        chatbot = SECChatbot(edgar_client=client, llm_analyzer=LLMAnalyzer())
+        chatbot.llm_analyzer.cache = ResponseCache(os.path.join(cache_dir, "llm.sqlite"))
+        chatbot.llm_analyzer._post_chat = fake_post_chat
+        response = chatbot.process_query("Analyze Apple", progress=events.append)
+    
+    assert response["error"] is None
+    assert [event["stage"] for event in events] == ["resolve_company", "fetch_filing", "call_model", "done"]
+    assert all(later["elapsed"] >= earlier["elapsed"] for earlier, later in zip(events, events[1:]))
+    timings = {timing["stage"]: timing["seconds"] for timing in response["timings"]}
+    assert list(timings) == ["resolve_company", "fetch_filing", "call_model"]
+    assert timings["fetch_filing"] >= 0.05
+    
+    # A follow-up question records the XBRL lookup and the filing load as separate stages
+    events.clear()
+    chatbot.edgar_client.get_facts_table = lambda cik: None
+    chatbot.edgar_client.get_filing_index = lambda cik, accession, document: None
+    chatbot.edgar_client.get_filing_with_index = lambda cik, accession, document: None
+    chatbot.llm_analyzer.answer_question = lambda document, question, *args, **kwargs: "Supply chain."
+    context = {"company": response["data"]["company"], "filing": response["data"]["filing"], "content": "Risk Factors"}
+    response = chatbot.process_query("What was the revenue?", context, progress=events.append)
+    assert [event["stage"] for event in events] == ["lookup_facts", "fetch_filing", "call_model", "done"]
+    
+    print("✅ Progress events working")
+    return True
+
+def test_tracing():
+    """Test nested spans across EDGAR calls and worker threads, and their JSON / OTel export."""
+    print("🔭 Testing Tracing...")
+    
+    from concurrent.futures import ThreadPoolExecutor
+    from http_cache import HttpCache
+    from llm_cache import ResponseCache
+    from rate_limiter import TokenBucket
+    from tracing import export_trace, propagate, span, start_trace
+    
+    class StandInSession:
+        def get(self, url, **kwargs):
+            return FakeResponse(b'{"cik": 320193, "facts": {}}')
+    
+    def names(node):
+        return [child["name"] for child in node["children"]]
+    
+    def work(index):
+        with span("worker", index=index):
+            pass
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        client = EdgarClient()
+        client.http_cache = HttpCache(os.path.join(cache_dir, "http.sqlite"))
+        client.rate_limiter = TokenBucket(1000)
+        client.session = StandInSession()
+        
+        # Outside a trace spans are no-ops
+        with span("untraced") as untraced:
+            assert untraced is None
+        
+        with start_trace("request", query="facts") as trace:
+            client.get_company_facts("0000320193")
+            client.get_company_facts("0000320193")
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                list(executor.map(propagate(work), range(2)))
+        record = trace.finish()
+        
+        root = record["root"]
+        assert names(root) == ["edgar.get_json", "edgar.get_json", "worker", "worker"]
+        fetch, cached = root["children"][:2]
+        assert fetch["attributes"]["cache"] == "miss" and cached["attributes"]["cache"] == "fresh"
+        assert names(fetch) == ["http.get"] and names(fetch["children"][0]) == ["rate_limit.wait"]
+        assert fetch["children"][0]["attributes"]["status_code"] == 200
+        assert root["duration_ms"] >= fetch["duration_ms"] >= 0
+        
+        path = os.path.join(cache_dir, "traces.jsonl")
+        export_trace(trace, path, "otel")
+        with open(path) as f:
+            spans = [json.loads(line) for line in f]
+        assert len(spans) == 7 and {s["traceId"] for s in spans} == {record["trace_id"]}
+        by_id = {s["spanId"]: s for s in spans}
+        http = next(s for s in spans if s["name"] == "http.get")
+        assert by_id[http["parentSpanId"]]["name"] == "edgar.get_json"
+        assert int(http["endTimeUnixNano"]) >= int(http["startTimeUnixNano"]) >= int(spans[0]["startTimeUnixNano"])
+    
+    # process_query attaches the trace of prompt building and the model call
+    def fake_post_chat(headers, payload):
+        return FakeResponse(json.dumps({"choices": [{"message": {"content": "A concise summary."}}]}).encode())
+    
+    with tempfile.TemporaryDirectory() as cache_dir:
+        chatbot = SECChatbot(llm_analyzer=LLMAnalyzer())
+        chatbot.llm_analyzer.cache = ResponseCache(os.path.join(cache_dir, "llm.sqlite"))
+        chatbot.llm_analyzer.session = type("StandInSession", (), {"post": lambda self, url, **kwargs: fake_post_chat(None, kwargs["json"])})()
+        response = chatbot.process_query("Summarize the filing", {"content": "Apple designs phones."})
+    
+    root = response["trace"]["root"]
+    assert root["attributes"]["intent"] == "get_summary"
+    assert [span["name"] for span in root["children"]] == ["llm.build_prompt", "llm.chat"]
+    assert root["children"][1]["attributes"]["status_code"] == 200
+    
+    print("✅ Tracing working")
+    return True
+
+def test_benchmark():
+    """Test the offline benchmark against its fixture server with small generated filings."""
+    print("⏱️ Testing Benchmark...")
+    
+    import glob
+    import config
+    from benchmark import generate_fixtures, make_filing_html, run_benchmarks
+    
+    html = make_filing_html(200 * 1024, "Apple Inc.")
+    assert 200 * 1024 <= len(html) < 220 * 1024
+    assert b"Item 1A. Risk Factors" in html and b"ix:nonFraction" in html
+    
+    cache_dir = config.CACHE_DIR
+    edgar_base_url = config.EDGAR_BASE_URL
+    pattern = os.path.join(tempfile.gettempdir(), 'sec-chatbot-benchmark-*')
+    leftovers = set(glob.glob(pattern))
+    report = run_benchmarks(generate_fixtures([0.1], facts_concepts=5), iterations=2, concurrency=2,
+                            operations=["search_company", "get_filing_content", "process_query: analyze"])
+    # The run restores the settings and leaves no temporary cache directory behind
+    assert config.CACHE_DIR == cache_dir and config.EDGAR_BASE_URL == edgar_base_url
+    assert set(glob.glob(pattern)) == leftovers
+    
+    operations = [result["operation"] for result in report["results"]]
+    assert operations == ["search_company", "get_filing_content (cold)", "get_filing_content (cached)",
+                          "process_query: analyze"]
+    for result in report["results"]:
+        assert result["errors"] == 0, result["first_error"]
+        assert result["p50_ms"] <= result["p99_ms"] and result["throughput_per_s"] > 0
+    # Everything was served by the local fixture server
+    assert report["fixture_requests"] > 0
+    
+    print("✅ Benchmark working")
+    return True
+
+def test_extraction_benchmark():
+    """Test that every extraction backend reads a generated filing and reports its costs."""
+    print("📏 Testing Extraction Benchmark...")
+    
+    from bench_extraction import BACKENDS, run_benchmarks, write_synthetic_filings
+    
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_synthetic_filings(directory, [0.1])
+        results = run_benchmarks(paths, list(BACKENDS), repeat=1, isolate=False)
+    
+    assert [result["backend"] for result in results] == list(BACKENDS)
+    for result in results:
+        assert result["input_mb"] >= 0.1 and result["best_s"] > 0
+        assert result["tracemalloc_peak_mb"] >= 0
+    # Backends differ in how they split lines, not in the text they keep
+    chars = [result["text_chars"] for result in results]
+    assert max(chars) < min(chars) * 1.05
+    
+    print("✅ Extraction benchmark working")
+    return True
+
 def test_llm_analyzer():
     """Test LLM analyzer functionality."""
     print("🤖 Testing LLM Analyzer...")
@@ -104,6 +1398,31 @@ def main():
     
     tests = [
         ("EDGAR Client", test_edgar_client),
+        ("Ticker Index", test_ticker_index),
+        ("HTTP Cache", test_http_cache),
+        ("Filing Extractor", test_filing_extractor),
+        ("Section Segmenter", test_section_segmenter),
+        ("Filing Cache", test_filing_cache),
+        ("Filing Index", test_filing_index),
+        ("Bulk Ingest", test_bulk_ingest),
+        ("Submissions Index", test_submissions_index),
+        ("Filing History", test_filing_history),
+        ("Async EDGAR Client", test_async_edgar_client),
+        ("Rate Limiter", test_rate_limiter),
+        ("Single Flight", test_single_flight),
+        ("LLM Response Cache", test_llm_response_cache),
+        ("Streaming Responses", test_streaming_responses),
+        ("LLM Session Pooling", test_llm_session),
+        ("Retrieval", test_retrieval),
+        ("XBRL Facts", test_xbrl_facts),
+        ("Map-Reduce Analysis", test_map_reduce_analysis),
+        ("Token Budget", test_token_budget),
+        ("Company Comparison", test_company_comparison),
+        ("Shared Chatbot Sessions", test_shared_chatbot_sessions),
+        ("Progress Events", test_progress_events),
+        ("Tracing", test_tracing),
+        ("Benchmark", test_benchmark),
+        ("Extraction Benchmark", test_extraction_benchmark),
         ("LLM Analyzer", test_llm_analyzer),
         ("Chatbot Service", test_chatbot_service)
     ]
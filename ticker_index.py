@@ -0,0 +1,182 @@
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+import config
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Share-class separators users type in place of SEC's '-' (BRK.B, BRK/B)
+_CLASS_SEPARATOR_RE = re.compile(r"[./]")
+_END = "\0"
+
+
+def tokenize(text: str) -> List[str]:
+    """Split a company title or query into lowercase alphanumeric tokens."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def normalize_title(text: str) -> str:
+    """Normalize a title so that punctuation and spacing do not affect matching."""
+    return " ".join(tokenize(text))
+
+
+class _Snapshot:
+    """Immutable lookup structures built from one download of company_tickers.json."""
+
+    def __init__(self, tickers_data: Dict):
+        self.entries = []
+        self.titles = []
+        self.by_ticker = {}
+        self.postings = {}
+        self.trie = {}
+
+        for entry in tickers_data.values():
+            entry_id = len(self.entries)
+            ticker = entry.get('ticker', '')
+            title = entry.get('title', '')
+            self.entries.append({
+                'cik': str(entry['cik_str']).zfill(10),
+                'ticker': ticker,
+                'title': title
+            })
+            self.titles.append(normalize_title(title))
+
+            key = ticker.lower()
+            # Keep the first (largest) filer for tickers listed more than once
+            self.by_ticker.setdefault(key, entry_id)
+
+            for token in set(tokenize(title)):
+                if token not in self.postings:
+                    self.postings[token] = []
+                    self._insert(token)
+                self.postings[token].append(entry_id)
+
+    def _insert(self, token: str):
+        node = self.trie
+        for char in token:
+            node = node.setdefault(char, {})
+        node[_END] = token
+
+    def tokens_with_prefix(self, prefix: str) -> List[str]:
+        """Return every indexed token starting with prefix."""
+        node = self.trie
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+
+        tokens = []
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            for char, child in current.items():
+                if char == _END:
+                    tokens.append(child)
+                else:
+                    stack.append(child)
+        return tokens
+
+    def ids_with_prefix(self, prefix: str) -> set:
+        ids = set()
+        for token in self.tokens_with_prefix(prefix):
+            ids.update(self.postings[token])
+        return ids
+
+
+class TickerIndex:
+    """In-memory index over SEC's company_tickers.json with TTL-based background refresh.
+
+    Lookups use an exact ticker dictionary, an inverted index from title tokens
+    to entries and a prefix trie over those tokens, so a search never scans the
+    full ticker list.
+    """
+
+    def __init__(self, loader: Callable[[], Dict], ttl: int = config.TICKER_INDEX_TTL):
+        self._loader = loader
+        self.ttl = ttl
+        self._snapshot: Optional[_Snapshot] = None
+        self._loaded_at = 0.0
+        self._load_lock = threading.Lock()
+        self._refreshing = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None
+
+    def refresh(self):
+        """Download company_tickers.json and atomically swap in a new snapshot."""
+        snapshot = _Snapshot(self._loader())
+        self._snapshot = snapshot
+        self._loaded_at = time.monotonic()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Error refreshing ticker index: {e}")
+        finally:
+            self._refreshing = False
+
+    def _get_snapshot(self) -> _Snapshot:
+        if self._snapshot is None:
+            with self._load_lock:
+                if self._snapshot is None:
+                    self.refresh()
+        elif time.monotonic() - self._loaded_at > self.ttl and not self._refreshing:
+            # Serve the stale snapshot while a fresh copy downloads
+            self._refreshing = True
+            threading.Thread(target=self._background_refresh, daemon=True).start()
+        return self._snapshot
+
+    def search(self, company_name: str, limit: int = 5) -> List[Dict]:
+        """Search by ticker or company name, scored like the original linear scan."""
+        snapshot = self._get_snapshot()
+        search_term = company_name.strip().lower()
+        query_tokens = tokenize(search_term)
+        scores = {}
+
+        ticker_id = snapshot.by_ticker.get(_CLASS_SEPARATOR_RE.sub('-', search_term))
+        if ticker_id is not None:
+            scores[ticker_id] = 100
+
+        # Whole-phrase matches: every query token must appear in the title, the
+        # last one possibly as a prefix of a title word ("appl" -> "apple")
+        if query_tokens:
+            candidates = snapshot.ids_with_prefix(query_tokens[-1])
+            for token in query_tokens[:-1]:
+                if not candidates:
+                    break
+                candidates = candidates.intersection(snapshot.postings.get(token, ()))
+
+            phrase = " ".join(query_tokens)
+            for entry_id in candidates:
+                if phrase in snapshot.titles[entry_id]:
+                    scores.setdefault(entry_id, 90)
+
+        # If no exact matches, fall back to titles sharing any significant word
+        if not scores:
+            for word in query_tokens:
+                if len(word) > 2:
+                    for entry_id in snapshot.ids_with_prefix(word):
+                        scores.setdefault(entry_id, 70)
+
+        # Ties keep the file order of company_tickers.json (largest filers first)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [
+            dict(snapshot.entries[entry_id], match_score=score)
+            for entry_id, score in ranked
+        ]
+
+
+_shared_index: Optional[TickerIndex] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_index(loader: Callable[[], Dict]) -> TickerIndex:
+    """Return the process-wide ticker index, creating it with loader on first use."""
+    global _shared_index
+    if _shared_index is None:
+        with _shared_lock:
+            if _shared_index is None:
+                _shared_index = TickerIndex(loader)
+    return _shared_index
@@ -0,0 +1,101 @@
+import math
+import re
+from functools import lru_cache
+from typing import List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to the approximate tokenizer below
+    tiktoken = None
+
+# BPE-style pre-tokenization: contractions, words and short digit groups with
+# their leading space, punctuation runs, then whitespace
+PIECE_RE = re.compile(r"'(?:[sdmt]|ll|ve|re)| ?[A-Za-z]+| ?[0-9]{1,3}| ?[^\sA-Za-z0-9]+|\s+(?!\S)|\s+")
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """Return a tiktoken encoding if one is installed and loadable, else None."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        if tiktoken is not None:
+            try:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                print(f"Error loading tiktoken encoding, using approximate token counts: {e}")
+    return _encoding
+
+
+@lru_cache(maxsize=65536)
+def _piece_tokens(piece: str) -> int:
+    """Approximate how many BPE tokens one pre-tokenized piece becomes."""
+    word = piece.strip()
+    if not word:
+        return 1
+    if word.isalpha():
+        # Common words are a single token; long or rare words split every few letters
+        return max(1, math.ceil(len(word) / 6))
+    if word.isdigit():
+        return 1
+    return max(1, math.ceil(len(word) / 3))
+
+
+def count_tokens(text: str) -> int:
+    """Count the tokens in text, exactly with tiktoken when available, else approximately."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return sum(_piece_tokens(piece) for piece in PIECE_RE.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Return the longest prefix of text that fits in max_tokens tokens."""
+    if max_tokens <= 0:
+        return ""
+
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+    # Approximate pieces never cost more tokens than characters, so short texts fit
+    if len(text) <= max_tokens:
+        return text
+    used = 0
+    for match in PIECE_RE.finditer(text):
+        used += _piece_tokens(match.group())
+        if used > max_tokens:
+            return text[:match.start()]
+    return text
+
+
+def pack_sections(sections: List[str], budget: int, separator: str = "\n\n",
+                  min_tokens: Optional[int] = 100) -> str:
+    """Pack sections, most valuable first, into at most budget tokens.
+
+    Short sections are included whole and the budget they leave unused is
+    shared among the longer ones, which are truncated to fit. If the budget
+    cannot give every section at least min_tokens, the least valuable
+    sections (the end of the list) are dropped.
+    """
+    chosen = [section for section in sections if section]
+    while len(chosen) > 1 and budget // len(chosen) < (min_tokens or 0):
+        chosen.pop()
+    if not chosen:
+        return ""
+
+    # Reserve a token per join in case pieces merge differently across the boundary
+    remaining = budget - (count_tokens(separator) + 1) * (len(chosen) - 1)
+    counts = [count_tokens(section) for section in chosen]
+    allotted = [0] * len(chosen)
+    # Fill the smallest sections first so spare budget flows to the larger ones
+    by_size = sorted(range(len(chosen)), key=lambda i: counts[i])
+    for position, i in enumerate(by_size):
+        allotted[i] = max(0, min(counts[i], remaining // (len(chosen) - position)))
+        remaining -= allotted[i]
+
+    parts = [truncate_to_tokens(section, tokens) for section, tokens in zip(chosen, allotted)]
+    return separator.join(part for part in parts if part)
@@ -0,0 +1,224 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+import config
+
+# The span that new spans nest under; unset outside a traced request
+_current_span: contextvars.ContextVar = contextvars.ContextVar('current_span', default=None)
+
+_export_lock = threading.Lock()
+
+
+class Span:
+    """One timed operation within a trace, with attributes and child spans.
+
+    Start and end are time.monotonic_ns() readings, so durations are immune
+    to clock changes; the trace's wall-clock anchor converts them to Unix
+    time on export.
+    """
+
+    def __init__(self, name: str, trace: 'Trace', parent: Optional['Span'] = None,
+                 attributes: Optional[Dict] = None):
+        self.name = name
+        self.trace = trace
+        self.parent = parent
+        self.span_id = os.urandom(8).hex()
+        self.attributes = dict(attributes or {})
+        self.children: List['Span'] = []
+        self.start_ns = time.monotonic_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def set(self, **attributes):
+        """Add attributes to the span, e.g. an HTTP status code once known."""
+        self.attributes.update(attributes)
+
+    def fail(self, error):
+        """Mark the span as failed, e.g. when an error is handled rather than raised."""
+        self.error = str(error)
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.monotonic_ns()
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return None if self.end_ns is None else (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict:
+        """Return the span and its children as nested plain data."""
+        return {
+            'name': self.name,
+            'span_id': self.span_id,
+            'start_ms': (self.start_ns - self.trace.root.start_ns) / 1e6,
+            'duration_ms': self.duration_ms,
+            'attributes': self.attributes,
+            'error': self.error,
+            'children': [child.to_dict() for child in self.children]
+        }
+
+    def walk(self) -> Iterator['Span']:
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+
+class Trace:
+    """A request's tree of spans, rooted at the span that started it."""
+
+    def __init__(self, name: str, attributes: Optional[Dict] = None):
+        self.trace_id = os.urandom(16).hex()
+        # Wall-clock time matching the root's monotonic start, for Unix timestamps on export
+        self.wall_start_ns = time.time_ns()
+        self.root = Span(name, self, attributes=attributes)
+
+    def finish(self) -> Dict:
+        """End the root span, export the trace if config.TRACE_EXPORT_PATH is set, and return it as a dict."""
+        if self.root.end_ns is None:
+            self.root.end()
+            if config.TRACE_EXPORT_PATH:
+                export_trace(self, config.TRACE_EXPORT_PATH, config.TRACE_EXPORT_FORMAT)
+        return self.to_dict()
+
+    def to_dict(self) -> Dict:
+        return {'trace_id': self.trace_id, 'start_time': self.wall_start_ns / 1e9, 'root': self.root.to_dict()}
+
+    def _unix_ns(self, monotonic_ns: int) -> int:
+        return self.wall_start_ns + monotonic_ns - self.root.start_ns
+
+    def to_otel(self) -> List[Dict]:
+        """Return the spans as OpenTelemetry (OTLP JSON) span records."""
+        records = []
+        for span in self.root.walk():
+            records.append({
+                'traceId': self.trace_id,
+                'spanId': span.span_id,
+                'parentSpanId': span.parent.span_id if span.parent else '',
+                'name': span.name,
+                'kind': 1,  # SPAN_KIND_INTERNAL
+                'startTimeUnixNano': str(self._unix_ns(span.start_ns)),
+                'endTimeUnixNano': str(self._unix_ns(span.end_ns if span.end_ns is not None else span.start_ns)),
+                'attributes': [{'key': key, 'value': _otel_value(value)} for key, value in span.attributes.items()],
+                # STATUS_CODE_ERROR = 2, STATUS_CODE_UNSET = 0
+                'status': {'code': 2, 'message': span.error} if span.error else {'code': 0}
+            })
+        return records
+
+
+def _otel_value(value) -> Dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+@contextmanager
+def start_trace(name: str, **attributes) -> Iterator[Trace]:
+    """Start a new trace for a request and make its root the current span.
+
+    Exceptions are recorded on the root span and re-raised. The root stays
+    open until trace.finish(), so work that outlives the block, such as a
+    streamed reply consumed later, is still part of the request.
+    """
+    trace = Trace(name, attributes)
+    token = _current_span.set(trace.root)
+    try:
+        yield trace
+    except Exception as e:
+        trace.root.fail(e)
+        raise
+    finally:
+        _current_span.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """Time a block as a child of the current span.
+
+    Outside a trace this does nothing and yields None, so instrumented code
+    costs next to nothing when no request is being traced. Exceptions are
+    recorded on the span and re-raised.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    current = Span(name, parent.trace, parent, attributes)
+    parent.children.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.fail(e)
+        raise
+    finally:
+        current.end()
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # A generator closed outside the context it ran in (e.g. an abandoned stream)
+            _current_span.set(parent)
+
+
+def traced(name: str) -> Callable:
+    """Decorator that runs every call of a function in a span, e.g. @traced("llm.build_prompt")."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, function=func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_span() -> Optional[Span]:
+    """Return the innermost active span, or None outside a trace."""
+    return _current_span.get()
+
+
+def propagate(func: Callable) -> Callable:
+    """Bind func to the caller's trace context so spans opened in a worker thread nest correctly.
+
+    Thread pools do not carry context variables over to their workers, so
+    wrap callables before submitting them to an executor.
+    """
+    context = contextvars.copy_context()
+    # A context can only be entered by one thread at a time, so each call runs in its own copy
+    return lambda *args, **kwargs: context.copy().run(func, *args, **kwargs)
+
+
+def propagate_iter(items: Iterable) -> Iterator:
+    """Iterate in the caller's trace context, e.g. a reply stream consumed after the request returned."""
+    context = contextvars.copy_context()
+    iterator = iter(items)
+
+    def generate():
+        while True:
+            try:
+                item = context.run(next, iterator)
+            except StopIteration:
+                return
+            yield item
+
+    return generate()
+
+
+def export_trace(trace: Trace, path: str, format: str = 'json'):
+    """Append a trace to a JSON lines file, as one nested record or as OTel span records."""
+    records = trace.to_otel() if format == 'otel' else [trace.to_dict()]
+    lines = ''.join(json.dumps(record, default=str) + '\n' for record in records)
+    try:
+        with _export_lock:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+    except OSError as e:
+        print(f"Error exporting trace: {e}")
@@ -0,0 +1,420 @@
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Union
+import numpy as np
+import config
+
+# Question keywords mapped to a label, the us-gaap concepts that report the
+# metric (most preferred first) and the unit the value is reported in
+METRIC_CONCEPTS = [
+    (('earnings per share', 'eps'), 'Diluted EPS',
+     ['EarningsPerShareDiluted', 'EarningsPerShareBasic'], 'USD/shares'),
+    (('net income', 'net loss', 'profit', 'earnings'), 'Net Income',
+     ['NetIncomeLoss', 'ProfitLoss'], 'USD'),
+    (('operating income', 'operating profit'), 'Operating Income',
+     ['OperatingIncomeLoss'], 'USD'),
+    (('gross profit', 'gross margin'), 'Gross Profit',
+     ['GrossProfit'], 'USD'),
+    (('research and development', 'r&d'), 'Research and Development',
+     ['ResearchAndDevelopmentExpense'], 'USD'),
+    (('revenue', 'net sales', 'sales', 'turnover'), 'Revenue',
+     ['Revenues', 'RevenueFromContractWithCustomerExcludingAssessedTax', 'SalesRevenueNet'], 'USD'),
+    (('total assets', 'assets'), 'Total Assets',
+     ['Assets'], 'USD'),
+    (('total liabilities', 'liabilities'), 'Total Liabilities',
+     ['Liabilities'], 'USD'),
+    (('cash and cash equivalents', 'cash balance', 'cash position'), 'Cash and Cash Equivalents',
+     ['CashAndCashEquivalentsAtCarryingValue'], 'USD'),
+]
+
+HISTORY_WORDS = ('by year', 'each year', 'per year', 'over time', 'history', 'trend', 'over the last few years')
+
+# Direct figure questions: "what was the net income", "what was Apple's revenue in
+# 2022", "what were total assets by year". Anything phrased otherwise, such as
+# "how is revenue broken down by segment", is left to the filing and the LLM.
+FIGURE_QUESTION_RE = re.compile(
+    r"^\s*(?:what(?:'s|\s+(?:was|were|is|are))|how\s+much\s+(?:was|were|is|are))\s+"
+    r"(?:the\s+)?(?:(?P<subject>[\w.&,' -]+?)(?:'s|\u2019s|s')\s+)?(?:(?:its|their|the\s+company's)\s+)?"
+    r"(?P<metric>[a-z&' ]+?)"
+    r"(?:\s+(?:in|for)\s+(?:(?:fiscal|the\s+fiscal)\s+(?:year\s+)?|fy\s*)?(?P<year>(?:19|20)\d{2}))?"
+    r"(?:\s+(?P<history>" + "|".join(re.escape(word) for word in HISTORY_WORDS) + r"))?"
+    r"\s*\??\s*$",
+    re.IGNORECASE
+)
+# Columns of a side-by-side company comparison, in display order
+COMPARISON_METRICS = ('Revenue', 'Net Income', 'Operating Income', 'Diluted EPS',
+                      'Total Assets', 'Total Liabilities', 'Cash and Cash Equivalents')
+COMPARISON_RATIOS = ('Revenue Growth', 'Net Margin', 'Operating Margin', 'Liabilities to Assets')
+
+# Fiscal-year duration facts span roughly 52 or 53 weeks
+ANNUAL_DAYS = (350, 380)
+
+COLUMNS = ('taxonomy', 'concept', 'unit', 'start', 'end', 'fy', 'fp', 'form', 'value', 'accession', 'filed')
+CATEGORIES = ('taxonomy', 'concept', 'unit', 'fp', 'form', 'accession')
+
+
+def match_metric(question: str) -> Optional[Dict]:
+    """Parse a direct question for one reported figure, e.g. "What was revenue in 2022?".
+
+    Returns the metric's label, concepts and unit along with the fiscal year
+    asked for, whether a yearly history was asked for, and the company named
+    in the question ("Apple" in "What was Apple's revenue?"), else None.
+    """
+    match = FIGURE_QUESTION_RE.match(question)
+    if not match:
+        return None
+    metric = ' '.join(match.group('metric').lower().split())
+    if metric.startswith('total ') and metric not in ('total assets', 'total liabilities'):
+        metric = metric[len('total '):]
+    subject = (match.group('subject') or '').strip()
+    if subject.lower() in ('company', 'the company'):
+        subject = ''
+    for keywords, label, concepts, unit in METRIC_CONCEPTS:
+        if metric in keywords:
+            return {
+                'label': label,
+                'concepts': concepts,
+                'unit': unit,
+                'year': int(match.group('year')) if match.group('year') else None,
+                'history': bool(match.group('history')),
+                'subject': subject or None
+            }
+    return None
+
+
+def format_value(value: float, unit: str) -> str:
+    """Format a fact value for display, e.g. $394.3 billion or $6.11 per share."""
+    if unit == 'USD/shares':
+        return f"${value:,.2f} per share"
+    if unit == 'USD':
+        sign = '-' if value < 0 else ''
+        magnitude = abs(value)
+        for scale, name in ((1e12, 'trillion'), (1e9, 'billion'), (1e6, 'million')):
+            if magnitude >= scale:
+                return f"{sign}${magnitude / scale:,.1f} {name}"
+        return f"{sign}${magnitude:,.0f}"
+    return f"{value:,.2f} {unit}"
+
+
+def format_ratio(value: float) -> str:
+    """Format a ratio as a percentage, e.g. 25.3%."""
+    return f"{value * 100:.1f}%"
+
+
+def _metric_series(table: 'FactsTable') -> Dict[str, Dict[int, float]]:
+    return {label: table.by_fiscal_year(concepts, unit) for _, label, concepts, unit in METRIC_CONCEPTS}
+
+
+def reported_years(table: 'FactsTable') -> List[int]:
+    """Return the fiscal years for which a company reports revenue (or, failing that, net income)."""
+    series = _metric_series(table)
+    return sorted(series['Revenue'] or series['Net Income'])
+
+
+def common_fiscal_year(tables: Sequence['FactsTable']) -> Optional[int]:
+    """Return the latest fiscal year that every company reports, or None if they share none."""
+    years = None
+    for table in tables:
+        years = set(reported_years(table)) if years is None else years & set(reported_years(table))
+    return max(years) if years else None
+
+
+def company_metrics(table: 'FactsTable', year: Optional[int] = None) -> Dict:
+    """Compute comparable figures for one fiscal year of a company.
+
+    Every metric is taken from the given fiscal year (see common_fiscal_year),
+    so companies can be compared side by side, along with revenue growth,
+    net and operating margins and leverage. If the company does not report
+    that year, its latest year is used and 'year_differs' is set.
+    """
+    series = _metric_series(table)
+    years = sorted(series['Revenue'] or series['Net Income'])
+    if not years:
+        return {'company': table.entity_name, 'fiscal_year': None, 'year_differs': year is not None,
+                'values': {}, 'ratios': {}}
+
+    chosen = year if year in years else years[-1]
+    values = {label: by_year[chosen] for label, by_year in series.items() if chosen in by_year}
+    ratios = {}
+    revenue = values.get('Revenue')
+    previous = series['Revenue'].get(chosen - 1)
+    if revenue and previous:
+        ratios['Revenue Growth'] = revenue / previous - 1
+    if revenue and 'Net Income' in values:
+        ratios['Net Margin'] = values['Net Income'] / revenue
+    if revenue and 'Operating Income' in values:
+        ratios['Operating Margin'] = values['Operating Income'] / revenue
+    if values.get('Total Assets') and 'Total Liabilities' in values:
+        ratios['Liabilities to Assets'] = values['Total Liabilities'] / values['Total Assets']
+    return {'company': table.entity_name, 'fiscal_year': chosen, 'year_differs': year is not None and chosen != year,
+            'values': values, 'ratios': ratios}
+
+
+def format_metrics_table(metrics: Sequence[Dict]) -> str:
+    """Render company_metrics results as a markdown table, one row per company."""
+    units = {label: unit for _, label, _, unit in METRIC_CONCEPTS}
+    value_labels = [label for label in COMPARISON_METRICS if any(label in m['values'] for m in metrics)]
+    ratio_labels = [label for label in COMPARISON_RATIOS if any(label in m['ratios'] for m in metrics)]
+
+    lines = [
+        "| " + " | ".join(['Company', 'FY'] + value_labels + ratio_labels) + " |",
+        "|" + "---|" * (2 + len(value_labels) + len(ratio_labels))
+    ]
+    for m in metrics:
+        fiscal_year = str(m['fiscal_year'] or 'n/a') + ('*' if m.get('year_differs') else '')
+        cells = [m['company'], fiscal_year]
+        cells += [format_value(m['values'][label], units[label]) if label in m['values'] else 'n/a'
+                  for label in value_labels]
+        cells += [format_ratio(m['ratios'][label]) if label in m['ratios'] else 'n/a'
+                  for label in ratio_labels]
+        lines.append("| " + " | ".join(cells) + " |")
+    if any(m.get('year_differs') for m in metrics):
+        lines.append("\n\\* Not reported for the common fiscal year; latest available year shown.")
+    return "\n".join(lines)
+
+
+class FactsTable:
+    """Columnar table of a company's XBRL facts from the companyfacts API.
+
+    Each fact is one row across flat NumPy columns. Repeated strings
+    (concept, unit, fiscal period, form, accession) are stored as integer
+    codes into small vocabularies, and periods as datetime64 days, so queries
+    are vectorized masks rather than walks over the nested JSON.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], vocabularies: Dict[str, List[str]],
+                 entity_name: str = "", fetched_at: Optional[float] = None):
+        self.columns = columns
+        self.vocabularies = vocabularies
+        self.entity_name = entity_name
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+        self._codes = {name: {value: code for code, value in enumerate(values)}
+                       for name, values in vocabularies.items()}
+
+    @classmethod
+    def from_companyfacts(cls, data: Dict) -> 'FactsTable':
+        """Flatten a companyfacts JSON document into columns."""
+        rows = {name: [] for name in COLUMNS}
+        codes = {name: {} for name in CATEGORIES}
+
+        def code(name, value):
+            return codes[name].setdefault(value or '', len(codes[name]))
+
+        for taxonomy, concepts in data.get('facts', {}).items():
+            for concept, fact in concepts.items():
+                for unit, values in fact.get('units', {}).items():
+                    for item in values:
+                        rows['taxonomy'].append(code('taxonomy', taxonomy))
+                        rows['concept'].append(code('concept', concept))
+                        rows['unit'].append(code('unit', unit))
+                        rows['start'].append(item.get('start', 'NaT'))
+                        rows['end'].append(item.get('end', 'NaT'))
+                        rows['fy'].append(item.get('fy') or 0)
+                        rows['fp'].append(code('fp', item.get('fp')))
+                        rows['form'].append(code('form', item.get('form')))
+                        rows['value'].append(item.get('val', np.nan))
+                        rows['accession'].append(code('accession', item.get('accn')))
+                        rows['filed'].append(item.get('filed', 'NaT'))
+
+        columns = {name: np.array(rows[name], dtype=np.int32) for name in CATEGORIES}
+        for name in ('start', 'end', 'filed'):
+            columns[name] = np.array(rows[name], dtype='datetime64[D]')
+        columns['fy'] = np.array(rows['fy'], dtype=np.int16)
+        columns['value'] = np.array(rows['value'], dtype=np.float64)
+
+        vocabularies = {name: list(codes[name]) for name in CATEGORIES}
+        return cls(columns, vocabularies, data.get('entityName', ''))
+
+    def save(self, path: str):
+        """Write the table to a single uncompressed .npz file."""
+        arrays = dict(self.columns)
+        for name, values in self.vocabularies.items():
+            arrays[f'vocabulary_{name}'] = np.array(values, dtype=str)
+        arrays['entity_name'] = np.array(self.entity_name)
+        arrays['fetched_at'] = np.array(self.fetched_at)
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['FactsTable']:
+        """Load a table written by save(), or return None if it is missing or unreadable."""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                columns = {name: data[name] for name in COLUMNS}
+                vocabularies = {name: data[f'vocabulary_{name}'].tolist() for name in CATEGORIES}
+                return cls(columns, vocabularies, str(data['entity_name']), float(data['fetched_at']))
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def __len__(self) -> int:
+        return len(self.columns['value'])
+
+    def _mask(self, name: str, values: Sequence[str]) -> np.ndarray:
+        codes = [self._codes[name][value] for value in values if value in self._codes[name]]
+        return np.isin(self.columns[name], codes)
+
+    def _row(self, row: int) -> Dict:
+        columns = self.columns
+        start = columns['start'][row]
+        return {
+            'concept': self.vocabularies['concept'][columns['concept'][row]],
+            'unit': self.vocabularies['unit'][columns['unit'][row]],
+            'value': float(columns['value'][row]),
+            'start': None if np.isnat(start) else str(start),
+            'end': str(columns['end'][row]),
+            'fy': int(columns['fy'][row]) or None,
+            'fp': self.vocabularies['fp'][columns['fp'][row]] or None,
+            'form': self.vocabularies['form'][columns['form'][row]] or None,
+            'accession': self.vocabularies['accession'][columns['accession'][row]] or None,
+            'filed': str(columns['filed'][row])
+        }
+
+    def query(self, concepts: Union[str, Sequence[str]], unit: Optional[str] = None,
+              forms: Optional[Sequence[str]] = None, annual: bool = False) -> np.ndarray:
+        """Return the row ids of facts matching the filters.
+
+        With annual=True only fiscal-year values are kept: durations of about
+        a year, and point-in-time values reported in an annual (FY) filing.
+        """
+        if isinstance(concepts, str):
+            concepts = [concepts]
+        mask = self._mask('concept', concepts) & ~np.isnan(self.columns['value'])
+        if unit:
+            mask &= self._mask('unit', [unit])
+        if forms:
+            mask &= self._mask('form', forms)
+        if annual:
+            days = (self.columns['end'] - self.columns['start']).astype(np.float64)
+            duration = (days >= ANNUAL_DAYS[0]) & (days <= ANNUAL_DAYS[1])
+            instant = np.isnat(self.columns['start']) & self._mask('fp', ['FY'])
+            mask &= duration | instant
+        return np.flatnonzero(mask)
+
+    def _preference(self, rows: np.ndarray, concepts: Sequence[str]) -> np.ndarray:
+        # Lower is better: the position of each row's concept in the caller's list
+        rank = np.full(len(self.vocabularies['concept']), len(concepts), dtype=np.int32)
+        for position, concept in enumerate(concepts):
+            if concept in self._codes['concept']:
+                rank[self._codes['concept'][concept]] = min(rank[self._codes['concept'][concept]], position)
+        return rank[self.columns['concept'][rows]]
+
+    def latest(self, concepts: Union[str, Sequence[str]], unit: Optional[str] = None,
+               annual: bool = False) -> Optional[Dict]:
+        """Return the most recent fact for any of the concepts (e.g. latest NetIncomeLoss).
+
+        Ties on period end go to the earlier concept in the list, then to the
+        most recently filed value.
+        """
+        if isinstance(concepts, str):
+            concepts = [concepts]
+        rows = self.query(concepts, unit, annual=annual)
+        if not len(rows):
+            return None
+        order = np.lexsort((
+            self.columns['filed'][rows],
+            -self._preference(rows, concepts),
+            self.columns['end'][rows]
+        ))
+        return self._row(rows[order[-1]])
+
+    def by_fiscal_year(self, concepts: Union[str, Sequence[str]], unit: Optional[str] = None) -> Dict[int, float]:
+        """Return annual values keyed by fiscal year, oldest first (e.g. Revenues by fiscal year).
+
+        Fiscal years are labelled by the calendar year in which they end. The
+        companyfacts "fy" field is the year of the filing that reported a
+        value, so comparatives from later filings would be mislabelled by it.
+        When several facts cover a year, the earlier concept in the list wins,
+        then the most recently filed value (capturing restatements).
+        """
+        if isinstance(concepts, str):
+            concepts = [concepts]
+        rows = self.query(concepts, unit, annual=True)
+        if not len(rows):
+            return {}
+
+        years = self.columns['end'][rows].astype('datetime64[Y]').astype(np.int64) + 1970
+        order = np.lexsort((
+            self.columns['filed'][rows],
+            -self._preference(rows, concepts),
+            years
+        ))
+        years = years[order]
+        # The last row of each run of equal years is the preferred value for that year
+        last = np.flatnonzero(np.append(years[1:] != years[:-1], True))
+        values = self.columns['value'][rows[order[last]]]
+        return {int(year): float(value) for year, value in zip(years[last], values)}
+
+
+class FactsStore:
+    """On-disk store of company facts tables keyed by CIK.
+
+    Tables are rebuilt from the companyfacts API once older than max_age,
+    since facts grow with each new filing. Recently used tables are kept in
+    memory.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_age: int = config.EDGAR_CACHE_MAX_AGE,
+                 memory_entries: int = 8):
+        self.path = path or os.path.join(config.CACHE_DIR, 'facts')
+        self.max_age = max_age
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        os.makedirs(self.path, exist_ok=True)
+
+    def _file(self, cik: str) -> str:
+        return os.path.join(self.path, f"CIK{str(cik).lstrip('0')}.npz")
+
+    def _remember(self, path: str, table: FactsTable):
+        self._memory[path] = table
+        self._memory.move_to_end(path)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, cik: str) -> Optional[FactsTable]:
+        """Return the facts table for a company, or None if missing or stale."""
+        path = self._file(cik)
+        with self._lock:
+            # FactsTable defines __len__, so an empty table must not be mistaken for a miss
+            table = self._memory.get(path)
+            if table is None:
+                table = FactsTable.load(path)
+            if table is None or time.time() - table.fetched_at > self.max_age:
+                self._memory.pop(path, None)
+                return None
+            self._remember(path, table)
+            return table
+
+    def put(self, cik: str, table: FactsTable):
+        """Store a company's facts table."""
+        path = self._file(cik)
+        handle, staging = tempfile.mkstemp(dir=self.path, suffix='.npz')
+        os.close(handle)
+        try:
+            table.save(staging)
+            os.replace(staging, path)
+        except OSError as e:
+            print(f"Error saving facts table: {e}")
+            if os.path.exists(staging):
+                os.remove(staging)
+        with self._lock:
+            self._remember(path, table)
+
+
+_shared_store: Optional[FactsStore] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_facts_store() -> FactsStore:
+    """Return the process-wide company facts store under config.CACHE_DIR."""
+    global _shared_store
+    if _shared_store is None:
+        with _shared_lock:
+            if _shared_store is None:
+                _shared_store = FactsStore()
+    return _shared_store